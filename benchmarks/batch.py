@@ -0,0 +1,70 @@
+"""Compare answering a replayed query log one prompt at a time with answering it in batches.
+
+Prompts are drawn with a skewed distribution from phrases of a synthetic corpus, or read one per line from
+a file. The result cache is disabled so both modes do the full work for every distinct prompt.
+
+Usage:
+    python -m benchmarks.batch [num_lines] [batch_size] [query_log]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List
+from benchmarks.corpus import generate_lines
+from benchmarks.engines import generate_queries
+from completion_coordinator import CompletionCoordinator
+
+
+def skewed_log(phrases: List[str], count: int = 20000, seed: int = 0) -> List[str]:
+    """Replay a pool of phrases with Zipf-like popularity."""
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(phrases) + 1)]
+    return rng.choices(phrases, weights, k=count)
+
+
+def percentile(latencies: List[float], fraction: float) -> float:
+    return sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def report(mode: str, queries: int, seconds: float, latencies: List[float], unit: str) -> None:
+    print(f"{mode:8} {queries / seconds:12,.0f} {percentile(latencies, 0.5) * 1e6:10.0f} "
+          f"{percentile(latencies, 0.99) * 1e6:10.0f}  per {unit}")
+
+
+def main(num_lines: int = 20000, batch_size: int = 256, query_log: str = None) -> None:
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        with open(os.path.join(dataset_dir, 'corpus.txt'), 'w', encoding='utf-8') as file:
+            file.write("\n".join(generate_lines(num_lines)) + "\n")
+        if query_log:
+            with open(query_log, encoding='utf-8') as file:
+                log = [line.strip() for line in file if line.strip()]
+        else:
+            log = skewed_log(generate_queries(generate_lines(num_lines), count=2000))
+
+        coordinator = CompletionCoordinator(dataset_dir, cache_size=0)
+        coordinator.build_trie()
+        print(f"{len(log)} queries, {len(set(log))} distinct, batches of {batch_size}")
+        print(f"{'mode':8} {'queries/s':>12} {'p50 (us)':>10} {'p99 (us)':>10}")
+
+        latencies = []
+        start = time.perf_counter()
+        for prompt in log:
+            query_start = time.perf_counter()
+            coordinator.get_suggestions(prompt)
+            latencies.append(time.perf_counter() - query_start)
+        report("single", len(log), time.perf_counter() - start, latencies, "query")
+
+        latencies = []
+        start = time.perf_counter()
+        for i in range(0, len(log), batch_size):
+            batch_start = time.perf_counter()
+            coordinator.get_suggestions_batch(log[i:i + batch_size])
+            latencies.append(time.perf_counter() - batch_start)
+        report("batch", len(log), time.perf_counter() - start, latencies, "batch")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(*(int(arg) for arg in args[:2]), *args[2:3])
@@ -0,0 +1,66 @@
+"""Measure serving lines of a gzip-compressed file against serving them from the plain file.
+
+The corpus is written once as plain text and once gzipped. Random lines are read through `LineIndex.get_line`
+from both, and through a fresh gzip stream per read, which seeks by decompressing from the start of the file.
+
+Usage:
+    python -m benchmarks.compressed_lines [num_lines] [num_reads]
+"""
+import gzip
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, List
+from benchmarks.corpus import generate_lines
+from data_structure.word_trie import WordTrie
+from text_processor.ingest import open_binary
+from text_processor.text_processor import TextDatasetProcessor
+
+
+def measure(name: str, read: Callable[[int], object], line_numbers: List[int]) -> None:
+    start = time.perf_counter()
+    for line_number in line_numbers:
+        read(line_number)
+    print(f"{name:32} {(time.perf_counter() - start) * 1e6 / len(line_numbers):10.1f} us/line")
+
+
+def main(num_lines: int = 200000, num_reads: int = 200) -> None:
+    rng = random.Random(0)
+    text = "".join(line + "\n" for line in generate_lines(num_lines))
+    with tempfile.TemporaryDirectory() as directory:
+        plain_dir, compressed_dir = os.path.join(directory, 'plain'), os.path.join(directory, 'compressed')
+        os.mkdir(plain_dir)
+        os.mkdir(compressed_dir)
+        plain_path = os.path.join(plain_dir, 'corpus.txt')
+        compressed_path = os.path.join(compressed_dir, 'corpus.txt.gz')
+        with open(plain_path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        with gzip.open(compressed_path, 'wt', encoding='utf-8') as file:
+            file.write(text)
+        plain = TextDatasetProcessor(plain_dir)
+        plain.process_files(WordTrie())
+        compressed = TextDatasetProcessor(compressed_dir)
+        compressed.process_files(WordTrie())
+        offsets = compressed.line_index.offsets[compressed_path]
+        line_numbers = [rng.randrange(1, num_lines + 1) for _ in range(num_reads)]
+
+        def seek_in_stream(line_number: int) -> bytes:
+            with open_binary(compressed_path) as file:
+                file.seek(offsets[line_number - 1])
+                return file.read(offsets[line_number] - offsets[line_number - 1])
+
+        size = len(text.encode('utf-8')) / 2 ** 20
+        print(f"{num_lines} lines, {size:.1f} MiB decompressed, {num_reads} random reads")
+        start = time.perf_counter()
+        compressed.line_index.get_line(compressed_path, 1)
+        print(f"{'gzip, first read (decompresses)':32} {(time.perf_counter() - start) * 1e3:10.1f} ms")
+        measure("plain file", lambda line_number: plain.line_index.get_line(plain_path, line_number), line_numbers)
+        measure("gzip, decompressed copy",
+                lambda line_number: compressed.line_index.get_line(compressed_path, line_number), line_numbers)
+        measure("gzip, seek in a fresh stream", seek_in_stream, line_numbers[:max(num_reads // 10, 1)])
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000, int(sys.argv[2]) if len(sys.argv) > 2 else 200)
@@ -0,0 +1,100 @@
+import os
+import random
+import string
+from typing import Dict, List
+
+
+QUERY_KINDS = ('exact', 'typo_first', 'typo_middle', 'typo_last')
+
+
+def generate_lines(num_lines: int, words_per_line: int = 10, vocabulary_size: int = 5000, seed: int = 0,
+                   skew: float = 1.0) -> List[str]:
+    """Generate a reproducible synthetic corpus of lines drawn from a Zipf-like vocabulary.
+
+    Args:
+        num_lines (int): The number of lines to generate.
+        words_per_line (int, optional): The number of words in each line. Defaults to 10.
+        vocabulary_size (int, optional): The number of distinct words. Defaults to 5000.
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+        skew (float, optional): The Zipf exponent; word `r` is drawn with weight `1 / r ** skew`, so 0 is
+            uniform and larger values concentrate the corpus on fewer words. Defaults to 1.0.
+
+    Returns:
+        List[str]: The generated lines.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f"w{i}" for i in range(vocabulary_size)]
+    weights = [1 / rank ** skew for rank in range(1, vocabulary_size + 1)]
+    return [" ".join(rng.choices(vocabulary, weights, k=words_per_line)) for _ in range(num_lines)]
+
+
+def write_corpus(directory: str, num_files: int, lines_per_file: int, words_per_line: int = 10,
+                 vocabulary_size: int = 5000, seed: int = 0, skew: float = 1.0) -> List[str]:
+    """Write a synthetic corpus as a directory of text files.
+
+    Args:
+        directory (str): The directory to write the files to.
+        num_files (int): The number of files.
+        lines_per_file (int): The number of lines in every file.
+        words_per_line (int, optional): The number of words in each line. Defaults to 10.
+        vocabulary_size (int, optional): The number of distinct words. Defaults to 5000.
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+        skew (float, optional): The Zipf exponent of the word distribution. Defaults to 1.0.
+
+    Returns:
+        List[str]: All generated lines, in file order.
+    """
+    lines = generate_lines(num_files * lines_per_file, words_per_line, vocabulary_size, seed, skew)
+    for i in range(num_files):
+        with open(os.path.join(directory, f'file{i:04}.txt'), 'w', encoding='utf-8') as file:
+            file.write("\n".join(lines[i * lines_per_file:(i + 1) * lines_per_file]) + "\n")
+    return lines
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    """Apply one random substitution, deletion or insertion to a word, never returning it unchanged."""
+    while True:
+        position = rng.randrange(len(word))
+        edit = rng.randrange(3)
+        if edit == 0:
+            typo = word[:position] + rng.choice(string.ascii_lowercase + string.digits) + word[position + 1:]
+        elif edit == 1 and len(word) > 1:
+            typo = word[:position] + word[position + 1:]
+        else:
+            typo = word[:position] + rng.choice(string.ascii_lowercase + string.digits) + word[position:]
+        if typo != word:
+            return typo
+
+
+def generate_query_mix(lines: List[str], count: int = 1000, seed: int = 0, min_words: int = 2,
+                       max_words: int = 4) -> Dict[str, List[str]]:
+    """Pick phrases out of the corpus lines, unchanged and with one typo in their first, a middle or last word.
+
+    Args:
+        lines (List[str]): The corpus lines.
+        count (int, optional): The number of queries of every kind. Defaults to 1000.
+        seed (int, optional): The seed of the random generator. Defaults to 0.
+        min_words (int, optional): The minimum number of words in a query. Defaults to 2.
+        max_words (int, optional): The maximum number of words in a query. Defaults to 4.
+
+    Returns:
+        Dict[str, List[str]]: The queries of every kind in `QUERY_KINDS`.
+    """
+    rng = random.Random(seed)
+    mix = {kind: [] for kind in QUERY_KINDS}
+    for _ in range(count):
+        words = rng.choice(lines).split()
+        length = min(rng.randint(min_words, max_words), len(words))
+        start = rng.randrange(len(words) - length + 1)
+        phrase = words[start:start + length]
+        for kind in QUERY_KINDS:
+            query = list(phrase)
+            if kind == 'typo_first':
+                query[0] = misspell(query[0], rng)
+            elif kind == 'typo_middle':
+                middle = len(query) // 2
+                query[middle] = misspell(query[middle], rng)
+            elif kind == 'typo_last':
+                query[-1] = misspell(query[-1], rng)
+            mix[kind].append(" ".join(query))
+    return mix
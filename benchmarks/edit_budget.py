@@ -0,0 +1,85 @@
+"""Measure recall and latency of the edit budget search on prompts with several typos.
+
+Prompts are runs of words taken from corpus lines, with one or two random edits applied to one or two of
+their words. For each search mode the share of prompts whose source line is found and the p50/p99/max
+latency are reported: `search` allows one typo per word, `search_edits` spends a budget across the prompt.
+
+Usage:
+    python -m benchmarks.edit_budget [num_lines] [num_prompts]
+"""
+import random
+import string
+import sys
+import time
+from typing import Callable, List, Tuple
+from benchmarks.corpus import generate_lines
+from data_structure.word_trie import WordTrie
+
+
+def misspell(word: str, edits: int, rng: random.Random) -> str:
+    """Apply random substitutions, insertions and deletions to a word."""
+    for _ in range(edits):
+        position = rng.randrange(len(word) + 1)
+        kind = rng.choice(("substitute", "insert", "delete") if len(word) > 1 else ("substitute", "insert"))
+        if kind == "insert":
+            word = word[:position] + rng.choice(string.ascii_lowercase) + word[position:]
+        elif kind == "delete":
+            position = min(position, len(word) - 1)
+            word = word[:position] + word[position + 1:]
+        else:
+            position = min(position, len(word) - 1)
+            word = word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+    return word
+
+
+def make_prompts(lines: List[str], count: int, rng: random.Random) -> List[Tuple[str, int]]:
+    prompts = []
+    for _ in range(count):
+        line_number = rng.randrange(len(lines))
+        words = lines[line_number].split()
+        start = rng.randrange(len(words) - 2)
+        words = words[start:start + 3]
+        for i in rng.sample(range(len(words)), rng.choice((1, 2))):
+            words[i] = misspell(words[i], rng.choice((1, 2)), rng)
+        prompts.append((" ".join(words), line_number + 1))
+    return prompts
+
+
+def measure(search: Callable[[str], List[int]], prompts: List[Tuple[str, int]]) -> None:
+    found = 0
+    latencies = []
+    for prompt, line_number in prompts:
+        start = time.perf_counter()
+        line_numbers = search(prompt)
+        latencies.append(time.perf_counter() - start)
+        found += line_number in line_numbers
+    latencies.sort()
+    percentile = lambda share: latencies[min(int(share * len(latencies)), len(latencies) - 1)] * 1e6
+    print(f"recall {found / len(prompts):6.1%}   p50 {percentile(0.5):8.0f} us   p99 {percentile(0.99):8.0f} us"
+          f"   max {latencies[-1] * 1e6:8.0f} us")
+
+
+def main(num_lines: int = 20000, num_prompts: int = 500) -> None:
+    rng = random.Random(0)
+    lines = generate_lines(num_lines)
+    trie = WordTrie(max_matches=10)
+    for line_number, line in enumerate(lines, 1):
+        trie.insert_sentence(line, "corpus.txt", line_number)
+    prompts = make_prompts(lines, num_prompts, rng)
+    trie.search_edits("warm up the typo index")
+
+    print(f"{num_lines} lines, {num_prompts} prompts with 1-2 misspelled words of 1-2 edits each")
+    cases = [
+        ("search", lambda prompt: [line for _, line in trie.search(prompt)]),
+        ("search_edits, budget 2", lambda prompt: [match[2] for match in trie.search_edits(prompt, max_edits=2)]),
+        ("search_edits, budget 4", lambda prompt: [match[2] for match in trie.search_edits(prompt, max_edits=4)]),
+        ("search_edits, budget 4, 1024 expansions",
+         lambda prompt: [match[2] for match in trie.search_edits(prompt, max_edits=4, max_expansions=1024)]),
+    ]
+    for name, search in cases:
+        print(f"{name:40}", end=" ")
+        measure(search, prompts)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
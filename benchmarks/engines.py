@@ -0,0 +1,65 @@
+"""Compare build time, query latency and memory of the WordTrie and SuffixArrayIndex search engines.
+
+Usage:
+    python -m benchmarks.engines [num_lines ...]
+"""
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import List
+from benchmarks.corpus import generate_lines
+from data_structure.suffix_array_index import SuffixArrayIndex
+from data_structure.word_trie import WordTrie
+
+
+ENGINES = {
+    'trie': WordTrie,
+    'suffix_array': SuffixArrayIndex,
+}
+
+
+def generate_queries(lines: List[str], count: int = 1000, seed: int = 0) -> List[str]:
+    """Pick 1-4 word phrases out of the corpus lines."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(lines).split()
+        start = rng.randrange(len(words))
+        queries.append(" ".join(words[start:start + rng.randint(1, 4)]))
+    return queries
+
+
+def run(engine_name: str, lines: List[str], queries: List[str]) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = ENGINES[engine_name]()
+    for line_number, line in enumerate(lines, start=1):
+        index.insert_sentence(line, "file1.txt", line_number)
+    index.search(queries[0])  # the suffix array is sorted on the first search
+    build_seconds = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        index.search(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"{engine_name:13} {len(lines):8} {build_seconds:9.2f} {memory / 2 ** 20:10.1f} "
+          f"{statistics.median(latencies) * 1e6:9.0f} {latencies[int(len(latencies) * 0.99)] * 1e6:9.0f}")
+
+
+def main(*sizes: int) -> None:
+    print(f"{'engine':13} {'lines':>8} {'build (s)':>9} {'memory MiB':>10} {'p50 (us)':>9} {'p99 (us)':>9}")
+    for num_lines in sizes or (5000, 20000):
+        lines = generate_lines(num_lines)
+        queries = generate_queries(lines)
+        for engine_name in ENGINES:
+            run(engine_name, lines, queries)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,114 @@
+"""Load generator for the HTTP completion server.
+
+Opens `connections` keep-alive connections and sends `requests` queries over each, drawn with a skewed
+distribution from phrases of a synthetic corpus, then reports throughput, latency percentiles and errors.
+Without --port, a server is started as a subprocess on a synthetic corpus and stopped afterwards; with
+--workers it is a prefork server, and the resident memory of every worker is reported (Linux only), split
+into private memory and pages shared through the mapped snapshot.
+
+Usage:
+    python -m benchmarks.load [--host HOST --port PORT] [--connections N] [--requests N] [--lines N] [--workers N]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import List, Tuple
+from urllib.parse import quote
+from benchmarks.batch import percentile, skewed_log
+from benchmarks.corpus import generate_lines
+from benchmarks.engines import generate_queries
+from completion_server import read_response
+
+
+async def run_connection(host: str, port: int, prompts: List[str]) -> List[Tuple[int, float]]:
+    """Send prompts one after another over a single connection, timing each response."""
+    reader, writer = await asyncio.open_connection(host, port)
+    results = []
+    try:
+        for prompt in prompts:
+            start = time.perf_counter()
+            writer.write(f"GET /suggest?q={quote(prompt)} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode('ascii'))
+            await writer.drain()
+            status, _ = await read_response(reader)
+            results.append((status, time.perf_counter() - start))
+    finally:
+        writer.close()
+    return results
+
+
+async def generate_load(host: str, port: int, log: List[str], connections: int) -> None:
+    per_connection = len(log) // connections
+    start = time.perf_counter()
+    batches = await asyncio.gather(*(run_connection(host, port, log[i * per_connection:(i + 1) * per_connection])
+                                     for i in range(connections)))
+    seconds = time.perf_counter() - start
+
+    results = [result for batch in batches for result in batch]
+    latencies = [latency for _, latency in results]
+    statuses = Counter(status for status, _ in results)
+    print(f"{len(results)} requests over {connections} connections in {seconds:.2f}s: "
+          f"{len(results) / seconds:,.0f} requests/s")
+    print(f"latency p50 {percentile(latencies, 0.5) * 1e3:.2f}ms  p99 {percentile(latencies, 0.99) * 1e3:.2f}ms  "
+          f"statuses {dict(statuses)}")
+
+
+def start_server(num_lines: int, dataset_dir: str, workers: int = 1) -> Tuple[subprocess.Popen, int]:
+    """Start a server on a synthetic corpus and wait until it listens."""
+    corpus_dir = os.path.join(dataset_dir, 'corpus')
+    os.mkdir(corpus_dir)
+    with open(os.path.join(corpus_dir, 'corpus.txt'), 'w', encoding='utf-8') as file:
+        file.write("\n".join(generate_lines(num_lines)) + "\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, os.path.join(root, 'completion_server.py'), corpus_dir, '--port', '0',
+                                '--workers', str(workers), '--snapshot', os.path.join(dataset_dir, 'trie.snapshot')],
+                               stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline()
+    return process, int(banner.split(':')[2].split('/')[0])
+
+
+def report_memory(pid: int) -> None:
+    """Print the resident memory of a server process, or of each of its workers if it forked any."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as file:
+            pids = [int(child) for child in file.read().split()] or [pid]
+    except OSError:
+        return
+    for worker in pids:
+        with open(f"/proc/{worker}/status") as file:
+            status = dict(line.split(':', 1) for line in file)
+        print(f"pid {worker}: rss {status['VmRSS'].strip():>10}  anon {status['RssAnon'].strip():>10}  "
+              f"file {status['RssFile'].strip():>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200, help="requests per connection")
+    parser.add_argument('--lines', type=int, default=20000, help="corpus size of a self-started server")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes of a self-started server")
+    args = parser.parse_args()
+
+    log = skewed_log(generate_queries(generate_lines(args.lines), count=2000), count=args.connections * args.requests)
+    if args.port is not None:
+        asyncio.run(generate_load(args.host, args.port, log, args.connections))
+        return
+
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        process, port = start_server(args.lines, dataset_dir, args.workers)
+        try:
+            asyncio.run(generate_load(args.host, port, log, args.connections))
+            report_memory(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
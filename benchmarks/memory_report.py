@@ -0,0 +1,66 @@
+"""Compare the memory footprint of the compact trie layout against the original `defaultdict` layout.
+
+Usage:
+    python -m benchmarks.memory_report [num_lines]
+"""
+import sys
+import tracemalloc
+from collections import defaultdict
+from typing import Callable, Dict, List
+from benchmarks.corpus import generate_lines
+from data_structure.word_trie import WordTrie
+from utils.functions import normalize_text
+
+
+class LegacyNode:
+    """The original node layout: `defaultdict` children and `file_name -> [line ints]` postings."""
+    def __init__(self, word: str = None) -> None:
+        self.word: str = word
+        self.children: Dict[str, LegacyNode] = defaultdict(LegacyNode)
+        self.file_data: Dict[str, List[int]] = defaultdict(list)
+
+
+def build_legacy(lines: List[str], file_name: str) -> LegacyNode:
+    root = LegacyNode()
+    for line_number, line in enumerate(lines, start=1):
+        words = normalize_text(line).split()
+        for i in range(len(words)):
+            node = root
+            for word in words[i:]:
+                if word not in node.children:
+                    node.children[word] = LegacyNode(word)
+                node = node.children[word]
+                node.file_data[file_name].append(line_number)
+    return root
+
+
+def build_compact(lines: List[str], file_name: str) -> WordTrie:
+    trie = WordTrie()
+    for line_number, line in enumerate(lines, start=1):
+        trie.insert_sentence(line, file_name, line_number)
+    return trie
+
+
+def measure(build: Callable[[], object]) -> int:
+    """Return the number of bytes still allocated by the object that `build` returns."""
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+
+def main(num_lines: int = 20000) -> None:
+    lines = generate_lines(num_lines)
+    legacy = measure(lambda: build_legacy(lines, "file1.txt"))
+    compact = measure(lambda: build_compact(lines, "file1.txt"))
+
+    print(f"lines indexed:  {num_lines}")
+    print(f"legacy layout:  {legacy / 2 ** 20:8.1f} MiB")
+    print(f"compact layout: {compact / 2 ** 20:8.1f} MiB")
+    print(f"reduction:      {legacy / compact:8.2f}x")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
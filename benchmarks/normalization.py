@@ -0,0 +1,82 @@
+"""Compare `TextNormalizer` with the previous per-call regex normalization on a synthetic corpus.
+
+The corpus mixes case and punctuation into the lines, and a share of them are non-ASCII, so both the
+translate fast path and the regex path are exercised. Ingest normalizes every line into words with offsets,
+which is what the `split` cases measure; the `normalize` cases measure the prompt side.
+
+Usage:
+    python -m benchmarks.normalization [num_lines] [non_ascii_share]
+"""
+import random
+import re
+import sys
+import timeit
+from typing import List, Tuple
+from benchmarks.corpus import generate_lines
+from text_processor.normalization import TextNormalizer
+
+_WORD_TOKEN_RE = re.compile(r'\S*\w\S*')
+
+
+def legacy_normalize_text(text: str) -> str:
+    """The previous implementation, with two substitutions looked up in the pattern cache on every call."""
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def legacy_split_words_with_offsets(sentence: str) -> Tuple[List[str], List[int]]:
+    words = legacy_normalize_text(sentence).split()
+    offsets = [token.start() for token in _WORD_TOKEN_RE.finditer(sentence)]
+    if len(offsets) == len(words):
+        return words, offsets
+    words, offsets = [], []
+    for token in _WORD_TOKEN_RE.finditer(sentence):
+        for word in legacy_normalize_text(token.group()).split():
+            words.append(word)
+            offsets.append(token.start())
+    return words, offsets
+
+
+def decorate(lines: List[str], non_ascii_share: float, seed: int = 0) -> List[str]:
+    """Capitalize, punctuate and accent the words of corpus lines the way prose would."""
+    rng = random.Random(seed)
+    decorated = []
+    for line in lines:
+        words = line.split()
+        words[0] = words[0].capitalize()
+        for i in rng.sample(range(len(words)), 2):
+            words[i] += rng.choice(",.;:!?")
+        if rng.random() < non_ascii_share:
+            words[rng.randrange(len(words))] += rng.choice("éüñçå")
+        decorated.append(" ".join(words))
+    return decorated
+
+
+def main(num_lines: int = 200000, non_ascii_share: float = 0.05) -> None:
+    lines = decorate(generate_lines(num_lines), non_ascii_share)
+    normalizer = TextNormalizer()
+    folding = TextNormalizer(unicode_form='NFKC', strip_accents=True)
+    assert normalizer.split_lines(lines) == [legacy_split_words_with_offsets(line) for line in lines]
+
+    batch_size = 1024
+    batches = [lines[start:start + batch_size] for start in range(0, len(lines), batch_size)]
+    cases = [
+        ("normalize, legacy", lambda: [legacy_normalize_text(line) for line in lines]),
+        ("normalize", lambda: [normalizer.normalize(line) for line in lines]),
+        ("normalize_lines", lambda: [normalizer.normalize_lines(batch) for batch in batches]),
+        ("normalize_lines, folding", lambda: [folding.normalize_lines(batch) for batch in batches]),
+        ("split, legacy", lambda: [legacy_split_words_with_offsets(line) for line in lines]),
+        ("split_words", lambda: [normalizer.split_words(line) for line in lines]),
+        ("split_lines", lambda: [normalizer.split_lines(batch) for batch in batches]),
+        ("split_lines, folding", lambda: [folding.split_lines(batch) for batch in batches]),
+    ]
+    print(f"{num_lines} lines, {non_ascii_share:.0%} with non-ASCII words, batches of {batch_size}")
+    for name, run in cases:
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print(f"{name:26} {seconds * 1e9 / num_lines:8.0f} ns/line {seconds:8.2f} s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000, float(sys.argv[2]) if len(sys.argv) > 2 else 0.05)
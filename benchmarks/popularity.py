@@ -0,0 +1,55 @@
+"""Measure popularity-ranked search on a corpus where lines repeat and some were clicked.
+
+The corpus draws its lines from a smaller pool with a Zipf-like skew, so common lines occur many times, and
+a share of the lines get clicks. Prompts are the most common first words and word pairs, whose nodes hold the
+most postings. The `cold` case ranks the postings of every prompt again; the `kept` case answers from the
+selections `WordTrie.precompute_top_completions` keeps.
+
+Usage:
+    python -m benchmarks.popularity [num_lines] [num_clicks]
+"""
+import random
+import sys
+import time
+import timeit
+from collections import Counter
+from benchmarks.corpus import generate_lines
+from data_structure.word_trie import WordTrie
+
+
+def main(num_lines: int = 50000, num_clicks: int = 2000) -> None:
+    rng = random.Random(0)
+    pool = generate_lines(num_lines // 4)
+    lines = rng.choices(pool, [1 / rank for rank in range(1, len(pool) + 1)], k=num_lines)
+    trie = WordTrie()
+    start = time.perf_counter()
+    for line_number, line in enumerate(lines, 1):
+        trie.insert_sentence(line, "corpus.txt", line_number)
+    build_seconds = time.perf_counter() - start
+    for _ in range(num_clicks):
+        trie.record_click("corpus.txt", rng.randrange(1, num_lines + 1), time.time() - rng.uniform(0, 30 * 86400))
+
+    prefixes = Counter(" ".join(line.split()[:length]) for line in lines for length in (1, 2))
+    prompts = [prompt for prompt, _ in prefixes.most_common(200)]
+    start = time.perf_counter()
+    kept = trie.precompute_top_completions()
+    precompute_seconds = time.perf_counter() - start
+
+    def cold() -> None:
+        for prompt in prompts:
+            trie._top_completions.clear()
+            trie.search(prompt)
+
+    def warm() -> None:
+        for prompt in prompts:
+            trie.search(prompt)
+
+    print(f"{num_lines} lines ({len(pool)} distinct), {num_clicks} clicks, built in {build_seconds:.1f} s")
+    print(f"precomputed {kept} nodes in {precompute_seconds:.2f} s")
+    for name, run in (("cold", cold), ("kept", warm)):
+        seconds = min(timeit.repeat(run, number=1, repeat=5))
+        print(f"{name:6} {seconds * 1e6 / len(prompts):10.1f} us/search")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000, int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
@@ -0,0 +1,101 @@
+"""Compare the single-pass `StringMatcher.check_typo` and memoized `calculate_score` with the previous implementation.
+
+Usage:
+    python -m benchmarks.string_matcher [num_pairs]
+"""
+import random
+import string
+import sys
+import timeit
+from typing import List, Tuple
+from text_processor.string_matcher import StringMatcher
+from utils.consts import Typo
+
+
+def legacy_check_typo(str_before: str, str_after: str) -> Tuple[Typo, int | None]:
+    """The previous implementation, which builds a new string for every candidate position."""
+    if str_before == str_after:
+        return Typo.MATCH, None
+    if len(str_before) == len(str_after):
+        idx = 0
+        found_one = False
+        for i in range(len(str_before)):
+            if str_before[i] != str_after[i]:
+                if not found_one:
+                    found_one = True
+                    idx = i
+                else:
+                    return Typo.INVALID, None
+        return Typo.SWITCH, idx
+    if len(str_before) == len(str_after) + 1:
+        for i in range(len(str_before)):
+            if str_before[:i] + str_before[i+1:] == str_after:
+                return Typo.ADD, i
+        return Typo.INVALID, None
+    if len(str_before) + 1 == len(str_after):
+        for i in range(len(str_after)):
+            if str_after[:i] + str_after[i+1:] == str_before:
+                return Typo.MISS, i
+        return Typo.INVALID, None
+    return Typo.INVALID, None
+
+
+def legacy_calculate_score(str_before: str, str_after: str) -> int:
+    typo, idx = legacy_check_typo(str_before, str_after)
+    if typo == Typo.MATCH:
+        return 2 * len(str_before)
+    elif typo == Typo.SWITCH:
+        return 2 * (len(str_before) - 1) - StringMatcher.penalty_for_mismatch(idx)
+    elif typo == Typo.ADD or typo == Typo.MISS:
+        return 2 * (len(str_before) - 1) - StringMatcher.penalty_for_extra_or_missing(idx)
+    return -100
+
+
+def generate_pairs(num_pairs: int, vocabulary_size: int = 2000, seed: int = 0) -> List[Tuple[str, str]]:
+    """Generate (query word, vocabulary word) pairs the way a trie search produces them.
+
+    Word lengths follow English-like frequencies, and queries are either exact, one edit away or unrelated.
+    """
+    rng = random.Random(seed)
+    lengths = [2, 3, 3, 4, 4, 4, 5, 5, 5, 6, 6, 7, 7, 8, 9, 10, 12]
+    vocabulary = ["".join(rng.choices(string.ascii_lowercase, k=rng.choice(lengths))) for _ in range(vocabulary_size)]
+    pairs = []
+    for _ in range(num_pairs):
+        word = rng.choice(vocabulary)
+        query = word
+        edit = rng.random()
+        position = rng.randrange(len(word))
+        if edit < 0.25:
+            query = word[:position] + rng.choice(string.ascii_lowercase) + word[position + 1:]
+        elif edit < 0.5:
+            query = word[:position] + word[position + 1:]
+        elif edit < 0.75:
+            query = word[:position] + rng.choice(string.ascii_lowercase) + word[position:]
+        elif edit < 0.9:
+            query = rng.choice(vocabulary)
+        pairs.append((query, rng.choice(vocabulary) if rng.random() < 0.5 else word))
+    return pairs
+
+
+def main(num_pairs: int = 200000) -> None:
+    # Searches score the same word pairs again and again, so draw the workload from a smaller pool.
+    pool = generate_pairs(num_pairs // 10)
+    rng = random.Random(1)
+    pairs = [rng.choice(pool) for _ in range(num_pairs)]
+    matcher = StringMatcher()
+    assert all(matcher.check_typo(*pair) == legacy_check_typo(*pair) for pair in pairs)
+
+    cases = [
+        ("check_typo, legacy", lambda: [legacy_check_typo(*pair) for pair in pairs]),
+        ("check_typo, single pass", lambda: [matcher.check_typo(*pair) for pair in pairs]),
+        ("calculate_score, legacy", lambda: [legacy_calculate_score(*pair) for pair in pairs]),
+        ("calculate_score, memoized", lambda: [matcher.calculate_score(*pair) for pair in pairs]),
+    ]
+    print(f"{num_pairs} word pairs drawn from {len(pool)} distinct pairs")
+    for name, run in cases:
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print(f"{name:28} {seconds * 1e9 / num_pairs:8.0f} ns/pair")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
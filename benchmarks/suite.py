@@ -0,0 +1,208 @@
+"""Reproducible benchmark suite for index build, search and suggestion latency, and memory.
+
+Every corpus size runs in a fresh interpreter so peak RSS is measured per case. For every case the suite
+reports the build throughput of `TextDatasetProcessor.process_files`, the p50/p99 latency of `WordTrie.search`
+and `CompletionCoordinator.get_suggestions` for exact queries and queries with a typo in their first, a
+middle or last word, the cost of `StringMatcher.check_typo`, and the peak resident memory. The results are
+printed as a table and written as JSON; with --compare, metrics that regressed beyond --tolerance against a
+previous JSON file are listed and the exit status is 1.
+
+Usage:
+    python -m benchmarks.suite [--sizes N ...] [--files N] [--skew S] [--output FILE] [--compare FILE]
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional
+from benchmarks.corpus import QUERY_KINDS, generate_query_mix, write_corpus
+from completion_coordinator import CompletionCoordinator
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+HIGHER_IS_BETTER = ('lines_per_second',)
+
+
+def time_calls(function: Callable[[str], object], queries: List[str]) -> Dict[str, float]:
+    """Time a function on every query and summarize the latencies in microseconds."""
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {'p50_us': latencies[len(latencies) // 2] * 1e6,
+            'p99_us': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6}
+
+
+def peak_rss_mib() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, KiB elsewhere
+
+
+def run_case(config: Dict) -> Dict:
+    """Build an index over a synthetic corpus and measure it.
+
+    Args:
+        config (Dict): The corpus and workload parameters: `lines`, `files`, `words_per_line`,
+            `vocabulary_size`, `skew`, `queries` and `seed`.
+
+    Returns:
+        Dict: The measurements of the case, together with its config.
+    """
+    with tempfile.TemporaryDirectory() as dataset_dir:
+        lines = write_corpus(dataset_dir, config['files'], config['lines'] // config['files'],
+                             config['words_per_line'], config['vocabulary_size'], config['seed'], config['skew'])
+        coordinator = CompletionCoordinator(dataset_dir, cache_size=0)
+        stats = coordinator.build_trie()
+        mix = generate_query_mix(lines, config['queries'], config['seed'])
+
+        search = {kind: time_calls(coordinator.trie.search, queries) for kind, queries in mix.items()}
+        suggestions = {kind: time_calls(coordinator.get_suggestions, queries) for kind, queries in mix.items()}
+
+        # Pair every misspelled word with the word it came from and with an unrelated word.
+        pairs = []
+        for typo_query, exact_query in zip(mix['typo_last'], mix['exact']):
+            typo, word = typo_query.split()[-1], exact_query.split()[-1]
+            pairs += [(typo, word), (typo, exact_query.split()[0])]
+        matcher = coordinator.trie.matcher
+        start = time.perf_counter()
+        for pair in pairs:
+            matcher.check_typo(*pair)
+        check_typo_ns = (time.perf_counter() - start) * 1e9 / len(pairs)
+
+    return {'config': config,
+            'build': {'lines': stats.lines, 'seconds': stats.seconds, 'lines_per_second': stats.lines_per_second},
+            'search': search,
+            'suggestions': suggestions,
+            'check_typo_ns': check_typo_ns,
+            'peak_rss_mib': peak_rss_mib()}
+
+
+def run_isolated(config: Dict) -> Dict:
+    """Run a case in a freshly spawned interpreter, so its peak RSS is not inflated by earlier cases."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(run_case, config).result()
+
+
+def flatten(result: Dict) -> Dict[str, float]:
+    """Flatten the numeric metrics of a suite result into `case/metric/path` keys."""
+    metrics = {}
+
+    def walk(prefix: str, value) -> None:
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}/{key}", item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[prefix] = value
+
+    for case in result['cases']:
+        config = case['config']
+        name = (f"lines={config['lines']},files={config['files']},words={config['words_per_line']},"
+                f"vocabulary={config['vocabulary_size']},skew={config['skew']}")
+        for key, value in case.items():
+            if key not in ('config', 'build'):
+                walk(f"{name}/{key}", value)
+        walk(f"{name}/build/lines_per_second", case['build']['lines_per_second'])
+    return metrics
+
+
+def compare(baseline: Dict, current: Dict, tolerance: float = 0.2) -> List[str]:
+    """List the metrics of `current` that are worse than in `baseline` by more than `tolerance`.
+
+    Args:
+        baseline (Dict): A previous suite result.
+        current (Dict): The new suite result.
+        tolerance (float, optional): The allowed relative slowdown. Defaults to 0.2.
+
+    Returns:
+        List[str]: A description of every regressed metric; metrics of cases missing from either side are skipped.
+    """
+    before, after = flatten(baseline), flatten(current)
+    regressions = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if not old:
+            continue
+        if key.endswith(HIGHER_IS_BETTER):
+            change = (old - new) / old
+        else:
+            change = (new - old) / old
+        if change > tolerance:
+            regressions.append(f"{key}: {old:.1f} -> {new:.1f} ({change:+.0%})")
+    return regressions
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+def print_table(result: Dict) -> None:
+    print(f"{'lines':>8} {'skew':>5} {'build l/s':>10} {'rss MiB':>8} {'typo ns':>8}  "
+          + "  ".join(f"{kind + ' p50/p99 us':>26}" for kind in QUERY_KINDS), file=sys.stderr)
+    for case in result['cases']:
+        for stage in ('search', 'suggestions'):
+            latencies = "  ".join(f"{case[stage][kind]['p50_us']:12.0f}/{case[stage][kind]['p99_us']:<13.0f}"
+                                  for kind in QUERY_KINDS)
+            print(f"{case['config']['lines']:8} {case['config']['skew']:5} {case['build']['lines_per_second']:10,.0f} "
+                  f"{case['peak_rss_mib'] or 0:8.1f} {case['check_typo_ns']:8.0f}  {latencies}  {stage}",
+                  file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5000, 20000], help="corpus sizes in lines")
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--words-per-line', type=int, default=10)
+    parser.add_argument('--vocabulary-size', type=int, default=5000)
+    parser.add_argument('--skew', type=float, default=1.0, help="Zipf exponent of the word distribution")
+    parser.add_argument('--queries', type=int, default=500, help="queries of every kind")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help="write the JSON result here instead of stdout")
+    parser.add_argument('--compare', default=None, help="a previous JSON result to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+
+    cases = []
+    for lines in args.sizes:
+        config = {'lines': lines, 'files': args.files, 'words_per_line': args.words_per_line,
+                  'vocabulary_size': args.vocabulary_size, 'skew': args.skew, 'queries': args.queries,
+                  'seed': args.seed}
+        cases.append(run_isolated(config))
+    result = {'meta': metadata(), 'cases': cases}
+    print_table(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            regressions = compare(json.load(file), result, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,34 +1,319 @@
+from data_structure.line_index import LineIndex
+from data_structure.result_cache import ResultCache
+from data_structure.search_session import SearchSession
+from data_structure.suffix_array_index import SuffixArrayIndex
+from data_structure.trie_snapshot import SnapshotError, load_snapshot, save_snapshot, snapshot_file_states
 from data_structure.word_trie import WordTrie
 from data_structure.auto_complete_data import AutoCompleteData
+from data_structure.popularity import read_click_log
+from text_processor.build_stats import BuildStats
+from text_processor.normalization import DEFAULT_NORMALIZER, TextNormalizer
 from text_processor.text_processor import TextDatasetProcessor
-from utils.consts import MAX_SUGGESTIONS
-from utils.functions import get_line_at_index, find_match_indices_by_words
-from typing import List
+from utils.consts import MAX_SUGGESTIONS, MAX_WORD_EDITS, RESULT_CACHE_SIZE
+from utils.functions import find_span_end
+from utils.metrics import Metrics
+import threading
+from collections import defaultdict
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+ENGINES = {
+    'trie': lambda max_matches, normalizer: WordTrie(root=None, max_matches=max_matches, normalizer=normalizer),
+    'suffix_array': lambda max_matches, normalizer: SuffixArrayIndex(max_matches=max_matches, normalizer=normalizer),
+}
 
 
 class CompletionCoordinator:
 
-    def __init__(self, dataset_dir: str, max_matches: int = MAX_SUGGESTIONS) -> None:
-        self.trie = WordTrie(root=None, max_matches=max_matches)
-        self.processor = TextDatasetProcessor(dataset_dir)
-    
-    def build_trie(self) -> None:
-        self.processor.process_files(self.trie)
-    
-    def get_suggestions(self, prompt: str) -> List[AutoCompleteData]:
-        suggestions = self.trie.search(prompt)
+    def __init__(self, dataset_dir: str, max_matches: int = MAX_SUGGESTIONS, engine: str = 'trie',
+                 cache_size: int = RESULT_CACHE_SIZE, cache_ttl: Optional[float] = None,
+                 shard: Optional[Tuple[int, int]] = None, metrics: Optional[Metrics] = None,
+                 normalizer: TextNormalizer = DEFAULT_NORMALIZER, click_log: Optional[str] = None,
+                 edit_budget: int = 0) -> None:
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown search engine {engine!r}, expected one of {sorted(ENGINES)}")
+        self.engine = engine
+        # Stage timings and counters of the suggestion path; None keeps the hot path free of bookkeeping.
+        self.metrics = metrics
+        self.normalizer = normalizer
+        # A query log of picked suggestions, replayed into every trie that is built or loaded.
+        self.click_log = click_log
+        # Prompts without a match one typo at a time are searched again with this many edits across the prompt.
+        self.edit_budget = edit_budget
+        self.trie = ENGINES[engine](max_matches, normalizer)
+        self.processor = TextDatasetProcessor(dataset_dir, shard)
+        # Suggestions keyed by (normalized prompt, ranked, partial); dropped whenever the index changes.
+        self.cache: ResultCache[List[AutoCompleteData]] = ResultCache(cache_size, cache_ttl)
+        # Held by every search and by every change to the index, so a watcher never mutates the trie under a
+        # query, and a query never caches results of an index that changed while it ran.
+        self._lock = threading.RLock()
+
+    @property
+    def trie(self):
+        return self._trie
+
+    @trie.setter
+    def trie(self, trie) -> None:
+        # Builds and snapshot loads replace the index; it keeps reporting to the same metrics.
+        trie.metrics = self.metrics
+        self._trie = trie
+
+    def build_trie(self, snapshot_path: Optional[str] = None, workers: int = 1) -> Optional[BuildStats]:
+        with self._lock:
+            return self._build_trie(snapshot_path, workers)
+
+    def _build_trie(self, snapshot_path: Optional[str], workers: int) -> Optional[BuildStats]:
+        self.cache.clear()
+        if self.engine != 'trie':
+            # Snapshots and parallel builds are specific to the trie layout.
+            stats = self.processor.process_files(self.trie)
+            self._prepare_ranking()
+            return stats
+
+        if snapshot_path:
+            try:
+                trie, line_index = load_snapshot(snapshot_path, self.processor.list_files(), self.trie.max_matches)
+                # A snapshot normalized under another policy would not match the prompts.
+                if trie.normalizer == self.normalizer:
+                    self._use_snapshot(trie, line_index)
+                    self._prepare_ranking()
+                    return None
+            except (OSError, SnapshotError):
+                pass
+
+        if workers > 1:
+            self.trie, stats = self.processor.process_files_parallel(workers, self.trie.max_matches, self.normalizer)
+        else:
+            stats = self.processor.process_files(self.trie)
+
+        if snapshot_path:
+            save_snapshot(self.trie, self.processor.line_index, snapshot_path)
+            if workers > 1:
+                # Serve from the single flattened index rather than from the per-shard tries.
+                self.trie, self.processor.line_index = load_snapshot(snapshot_path, max_matches=self.trie.max_matches)
+        self._prepare_ranking()
+        return stats
+
+    def load_trie(self, snapshot_path: str) -> None:
+        # Map a snapshot known to be current, without checking it against the dataset or rebuilding it.
+        with self._lock:
+            self.cache.clear()
+            self._use_snapshot(*load_snapshot(snapshot_path, max_matches=self.trie.max_matches))
+            self._prepare_ranking()
+
+    def _use_snapshot(self, trie: WordTrie, line_index: LineIndex) -> None:
+        # Files are synced against the states they had when the snapshot was saved.
+        self.trie, self.processor.line_index = trie, line_index
+        self.processor.file_states = snapshot_file_states(trie)
+        self.processor.invalid_lines = {}
+
+    def load_click_log(self, path: str) -> int:
+        # Clicks on files that are no longer indexed are skipped; the count of those applied is returned.
+        with self._lock:
+            applied = sum(self.trie.record_click(file_name, line_number, timestamp)
+                          for timestamp, file_name, line_number in read_click_log(path))
+            self.cache.clear()
+        return applied
+
+    def record_click(self, suggestion: AutoCompleteData) -> None:
+        # The picked suggestion ranks higher for every prompt it matches from now on.
+        with self._lock:
+            if self.trie.record_click(suggestion.source_text, suggestion.offset):
+                self.cache.clear()
+
+    def _prepare_ranking(self) -> None:
+        if self.click_log:
+            self.load_click_log(self.click_log)
+        if self.engine == 'trie':
+            self.trie.precompute_top_completions()
+
+    def sync_files(self) -> Tuple[List[str], List[str], List[str]]:
+        with self._lock:
+            changes = self.processor.sync(self.trie)
+            if any(changes):
+                self.cache.clear()
+        return changes
+
+    def watch(self, interval: float = 1.0, stop_event: Optional[threading.Event] = None,
+              on_change: Optional[Callable[[List[str], List[str], List[str]], None]] = None) -> None:
+        # Poll the dataset and apply its changes until `stop_event` is set. This call blocks; run it in a
+        # background thread while queries are served, which wait for each sync that changes the index.
+        stop_event = stop_event or threading.Event()
+        while not stop_event.wait(interval):
+            changes = self.sync_files()
+            if on_change and any(changes):
+                on_change(*changes)
+
+    def new_session(self) -> Optional[SearchSession]:
+        # Incremental sessions walk trie nodes; other engines search every prompt from scratch.
+        return SearchSession(self.trie) if self.engine == 'trie' else None
+
+    def get_suggestions(self, prompt: str, ranked: bool = False, session: Optional[SearchSession] = None,
+                        prefix: bool = False) -> List[AutoCompleteData]:
+        # With `prefix`, a last word still being typed (no whitespace after it) is completed rather than
+        # matched whole. Ranked searches always match whole words.
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+        normalized_prompt = self.trie.normalizer.normalize(prompt)
+        partial = prefix and not ranked and bool(prompt) and not prompt[-1].isspace()
+        key = (normalized_prompt, ranked, partial)
+        cached = self.cache.get(key)
+        if cached is not None:
+            if metrics is not None:
+                metrics.count('suggest.cache_hits')
+                metrics.observe('suggest.total_seconds', perf_counter() - start)
+            return list(cached)
+
+        with self._lock:
+            if ranked:
+                results = self._get_ranked_suggestions(prompt)
+            else:
+                results = self._get_suggestions(prompt, normalized_prompt, session, partial)
+                if not results:
+                    results = self._get_edit_suggestions(prompt)
+            self.cache.put(key, results)
+        if metrics is not None:
+            metrics.count('suggest.cache_misses')
+            metrics.observe('suggest.total_seconds', perf_counter() - start)
+        return list(results)
+
+    def _get_suggestions(self, prompt: str, normalized_prompt: str, session: Optional[SearchSession],
+                         partial: bool = False) -> List[AutoCompleteData]:
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+        if session is not None and session.trie is self.trie:
+            spans = session.update(prompt, partial)
+        else:
+            spans = self.trie.search_spans(prompt, partial)
+
+        if metrics is not None:
+            fetch_start = perf_counter()
+            metrics.observe('suggest.search_seconds', fetch_start - start)
+        lines = self._fetch_lines(spans)
+        if metrics is not None:
+            score_start = perf_counter()
+            metrics.observe('suggest.line_fetch_seconds', score_start - fetch_start)
+        results = self._build_suggestions(normalized_prompt, spans, lines, partial)
+        if metrics is not None:
+            metrics.observe('suggest.scoring_seconds', perf_counter() - score_start)
+            metrics.count('suggest.results', len(results))
+        return results
+
+    def _get_ranked_suggestions(self, prompt: str) -> List[AutoCompleteData]:
+        return self._get_scored_suggestions(prompt, self.trie.search_ranked(prompt), max_word_edits=1)
+
+    def _get_edit_suggestions(self, prompt: str) -> List[AutoCompleteData]:
+        if not self.edit_budget or self.engine != 'trie':
+            return []
+        if self.metrics is not None:
+            self.metrics.count('suggest.edit_budget_searches')
+        return self._get_scored_suggestions(prompt, self.trie.search_edits(prompt, self.edit_budget),
+                                            max_word_edits=min(self.edit_budget, MAX_WORD_EDITS))
+
+    def _get_scored_suggestions(self, prompt: str, matches: List[Tuple[int, str, int, int]],
+                                max_word_edits: int) -> List[AutoCompleteData]:
+        prompt_words = self.trie.normalizer.normalize(prompt).split()
+        lines = self._fetch_lines((file_name, line_number, start) for _, file_name, line_number, start in matches)
         results = []
-        for suggestion in suggestions:
-            line = get_line_at_index(*suggestion)
-            line_range = find_match_indices_by_words(line, prompt)
-            if line_range:
-                data = AutoCompleteData(completed_sentence=line[line_range[0]:],
-                                        source_text=suggestion[0],
-                                        offset=suggestion[1],
-                                        score=self.trie.matcher.calculate_score(prompt, line[line_range[0]:line_range[1]]))
-                results.append(data)
-        
+        for score, file_name, line_number, start in matches:
+            line = lines.get((file_name, line_number))
+            if not self._still_matches(prompt_words, line, start, max_word_edits):
+                continue  # the file changed on disk since it was indexed
+            results.append(AutoCompleteData(completed_sentence=line[start:],
+                                            source_text=file_name,
+                                            offset=line_number,
+                                            score=score,
+                                            popularity=self.trie.popularity_of(file_name, line_number)))
+
         return results
-    
 
+    def get_suggestions_batch(self, prompts: List[str]) -> List[List[AutoCompleteData]]:
+        with self._lock:
+            return self._get_suggestions_batch(prompts)
 
+    def _get_suggestions_batch(self, prompts: List[str]) -> List[List[AutoCompleteData]]:
+        # Each distinct normalized prompt is searched once. Sorting by words puts prompts that share leading
+        # words next to each other, so one session walks every shared prefix only once.
+        normalized_prompts = self.trie.normalizer.normalize_lines(prompts)
+        suggestions: Dict[str, List[AutoCompleteData]] = {}
+        pending = []
+        for normalized_prompt in dict.fromkeys(normalized_prompts):
+            cached = self.cache.get((normalized_prompt, False, False))
+            if cached is not None:
+                suggestions[normalized_prompt] = cached
+            else:
+                pending.append(normalized_prompt)
+
+        session = self.new_session()
+        spans = {}
+        for normalized_prompt in sorted(pending, key=str.split):
+            spans[normalized_prompt] = (session.update(normalized_prompt) if session is not None
+                                        else self.trie.search_spans(normalized_prompt))
+
+        lines = self._fetch_lines(span for prompt_spans in spans.values() for span in prompt_spans)
+        for normalized_prompt, prompt_spans in spans.items():
+            results = self._build_suggestions(normalized_prompt, prompt_spans, lines)
+            if not results:
+                results = self._get_edit_suggestions(normalized_prompt)
+            self.cache.put((normalized_prompt, False, False), results)
+            suggestions[normalized_prompt] = results
+
+        return [list(suggestions[normalized_prompt]) for normalized_prompt in normalized_prompts]
+
+    def _fetch_lines(self, spans: Iterable[Tuple[str, int, int]]) -> Dict[Tuple[str, int], Optional[str]]:
+        # One sorted pass per file, however many matches land in it.
+        line_numbers = defaultdict(set)
+        for file_name, line_number, _ in spans:
+            line_numbers[file_name].add(line_number)
+        lines = {}
+        for file_name, numbers in line_numbers.items():
+            try:
+                file_lines = self.processor.line_index.get_lines(file_name, numbers)
+            except OSError:
+                continue  # the file was deleted or cannot be read since it was indexed
+            for line_number, line in file_lines.items():
+                lines[file_name, line_number] = line
+        return lines
+
+    def _still_matches(self, prompt_words: List[str], line: Optional[str], start: int, max_word_edits: int,
+                       partial: bool = False) -> bool:
+        # Offsets index the file as it was when indexed; once it changes on disk they may point past its end
+        # or at other words, and the line no longer holds the words the index matched.
+        if not line:
+            return False
+        normalizer = self.trie.normalizer
+        end = find_span_end(line, start, len(prompt_words), normalizer)
+        span_words = normalizer.normalize(line[start:end]).split()
+        if len(span_words) < len(prompt_words):
+            return False
+        within_edits = self.trie.matcher.within_edits
+        return all(within_edits(prompt_word, span_word, max_word_edits)
+                   or (partial and index == len(prompt_words) - 1 and span_word.startswith(prompt_word))
+                   for index, (prompt_word, span_word) in enumerate(zip(prompt_words, span_words)))
+
+    def _build_suggestions(self, normalized_prompt: str, spans: List[Tuple[str, int, int]],
+                           lines: Dict[Tuple[str, int], Optional[str]],
+                           partial: bool = False) -> List[AutoCompleteData]:
+        prompt_words = normalized_prompt.split()
+        normalizer = self.trie.normalizer
+        results = []
+        for file_name, line_number, start in spans:
+            line = lines.get((file_name, line_number))
+            if not self._still_matches(prompt_words, line, start, max_word_edits=1, partial=partial):
+                continue  # the file changed on disk since it was indexed
+            end = find_span_end(line, start, len(prompt_words), normalizer)
+            span_words = normalizer.normalize(line[start:end]).split()
+            if partial and span_words[len(prompt_words) - 1].startswith(prompt_words[-1]):
+                # A completed word is as good a match as the prefix typed so far.
+                span_words[len(prompt_words) - 1] = prompt_words[-1]
+            results.append(AutoCompleteData(completed_sentence=line[start:],
+                                            source_text=file_name,
+                                            offset=line_number,
+                                            score=self.trie.matcher.calculate_score(normalized_prompt, ' '.join(span_words)),
+                                            popularity=self.trie.popularity_of(file_name, line_number)))
+        # Better matches first; of two equally good ones, the more popular.
+        results.sort(key=lambda suggestion: (-suggestion.score, -suggestion.popularity))
+        return results
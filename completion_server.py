@@ -0,0 +1,433 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import socket
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict
+from http import HTTPStatus
+from typing import Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from completion_coordinator import CompletionCoordinator
+from utils.metrics import Metrics
+
+
+DEFAULT_PORT = 8080
+MAX_CONCURRENCY = 64        # queries searched at the same time; further ones wait for a slot
+REQUEST_TIMEOUT = 1.0       # seconds a query may wait for a slot and run before the client gets a 504
+MAX_HEADER_BYTES = 16384
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionServer:
+    """An asyncio HTTP/1.1 front end answering auto-complete queries from many concurrent clients.
+
+    The index is loaded once by the caller and shared by every connection. Searching and reading the matched
+    lines block, so each query runs on a thread pool while the event loop keeps serving other connections.
+    A semaphore caps the number of queries in flight; a query that cannot get a slot and finish within the
+    timeout is answered with 504 Gateway Timeout, and keeps its slot until its thread is done. A request that
+    fails is logged and answered with 500 Internal Server Error. Connections are kept alive between requests.
+
+    Endpoints:
+        GET /suggest?q=<prompt>[&ranked=1][&prefix=1]: The suggestions for a prompt, as a JSON list; with
+            `prefix`, its last word is completed unless the prompt ends in whitespace.
+        GET /stats: The counters of the coordinator's result cache, as a JSON object.
+        GET /metrics[?format=json]: The coordinator's metrics in Prometheus text format, or as JSON.
+        GET /health: The id of the serving process, as a JSON object.
+
+    Attributes:
+        coordinator (CompletionCoordinator): The coordinator whose index answers the queries.
+        host (str): The address to listen on.
+        port (int): The port to listen on; 0 picks a free port, which `start` then stores here.
+        timeout (float): The number of seconds a query may take, including the wait for a slot.
+    """
+    def __init__(self, coordinator: CompletionCoordinator, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 max_concurrency: int = MAX_CONCURRENCY, timeout: float = REQUEST_TIMEOUT,
+                 workers: Optional[int] = None) -> None:
+        """Initialize a server around a coordinator whose index is already built.
+
+        Args:
+            coordinator (CompletionCoordinator): The coordinator to serve.
+            host (str, optional): The address to listen on. Defaults to '127.0.0.1'.
+            port (int, optional): The port to listen on. Defaults to DEFAULT_PORT.
+            max_concurrency (int, optional): The maximum number of queries in flight. Defaults to MAX_CONCURRENCY.
+            timeout (float, optional): The number of seconds a query may take. Defaults to REQUEST_TIMEOUT.
+            workers (Optional[int], optional): The size of the thread pool. Defaults to the executor's default.
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.coordinator: CompletionCoordinator = coordinator
+        self.host: str = host
+        self.port: int = port
+        self.timeout: float = timeout
+        self._max_concurrency: int = max_concurrency
+        self._workers: Optional[int] = workers
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, sock=None) -> None:
+        """Start listening, on the configured address or on an already bound socket.
+
+        Args:
+            sock (socket.socket, optional): A bound listening socket to serve instead. Defaults to None.
+        """
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        self._executor = ThreadPoolExecutor(self._workers, thread_name_prefix='completion')
+        if sock is not None:
+            self._server = await asyncio.start_server(self._handle_connection, sock=sock)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        """Serve until the task is cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """Stop accepting connections and release the thread pool."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the requests of one connection until the client closes it or asks to."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {}, keep_alive=False)
+                    return
+                except asyncio.IncompleteReadError:
+                    return
+                if len(head) > MAX_HEADER_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {}, keep_alive=False)
+                    return
+
+                method, target, keep_alive = _parse_head(head)
+                if method is None:
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST, {}, keep_alive=False)
+                    return
+                try:
+                    status, body = await self._dispatch(method, target)
+                except Exception:
+                    logger.exception("Request %s %s failed", method, target)
+                    status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': 'internal error'}
+                await self._respond(writer, status, body, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str) -> Tuple[HTTPStatus, object]:
+        """Route a request to its endpoint.
+
+        Returns:
+            Tuple[HTTPStatus, object]: The status and the JSON-serializable body of the response.
+        """
+        if method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'only GET is supported'}
+        url = urlsplit(target)
+        if url.path == '/health':
+            return HTTPStatus.OK, {'pid': os.getpid()}
+        if url.path == '/stats':
+            return HTTPStatus.OK, self.coordinator.cache.stats()
+        if url.path == '/metrics':
+            metrics = getattr(self.coordinator, 'metrics', None)
+            if metrics is None:
+                return HTTPStatus.NOT_FOUND, {'error': 'metrics are disabled'}
+            if parse_qs(url.query).get('format') == ['json']:
+                return HTTPStatus.OK, metrics.snapshot()
+            return HTTPStatus.OK, metrics.to_prometheus()
+        if url.path != '/suggest':
+            return HTTPStatus.NOT_FOUND, {'error': f'unknown path {url.path}'}
+
+        query = parse_qs(url.query)
+        prompt = query.get('q', [''])[0]
+        ranked = query.get('ranked', ['0'])[0] not in ('', '0', 'false')
+        prefix = query.get('prefix', ['0'])[0] not in ('', '0', 'false')
+        try:
+            suggestions = await asyncio.wait_for(self._suggest(prompt, ranked, prefix), self.timeout)
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {'error': 'query timed out'}
+        return HTTPStatus.OK, [asdict(suggestion) for suggestion in suggestions]
+
+    async def _suggest(self, prompt: str, ranked: bool, prefix: bool = False) -> list:
+        """Run a query on the thread pool once a concurrency slot is free.
+
+        The slot is released when the thread finishes rather than when the caller stops waiting, so queries that
+        timed out but still run count against the limit.
+        """
+        await self._semaphore.acquire()
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(self.coordinator.get_suggestions, prompt, ranked, prefix=prefix)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        future.add_done_callback(lambda _: self._release_slot(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release_slot(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Release a concurrency slot from the thread that finished a query."""
+        try:
+            loop.call_soon_threadsafe(self._semaphore.release)
+        except RuntimeError:
+            pass  # the event loop was closed while the query ran
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: HTTPStatus, body: object, keep_alive: bool) -> None:
+        """Write a response: text bodies as Prometheus exposition text, anything else as JSON."""
+        if isinstance(body, str):
+            payload, content_type = body.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            payload, content_type = json.dumps(body).encode('utf-8'), 'application/json'
+        writer.write((f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                      f"Content-Type: {content_type}\r\n"
+                      f"Content-Length: {len(payload)}\r\n"
+                      f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode('ascii') + payload)
+        await writer.drain()
+
+
+def _parse_head(head: bytes) -> Tuple[Optional[str], str, bool]:
+    """Parse the request line and the Connection header of an HTTP/1.x request.
+
+    Args:
+        head (bytes): The request line and headers, up to and including the blank line.
+
+    Returns:
+        Tuple[Optional[str], str, bool]: The method (`None` if the request is malformed), the target and whether
+            the connection stays open after the response.
+    """
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        return None, '', False
+    method, target, version = parts
+    keep_alive = version != 'HTTP/1.0'
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'connection':
+            keep_alive = value.strip().lower() != 'close' if keep_alive else value.strip().lower() == 'keep-alive'
+    return method, target, keep_alive
+
+
+async def request(host: str, port: int, target: str) -> Tuple[int, object]:
+    """Send a single GET request on a new connection and decode the JSON response.
+
+    Args:
+        host (str): The server address.
+        port (int): The server port.
+        target (str): The path and query string to request.
+
+    Returns:
+        Tuple[int, object]: The status code and the decoded body.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode('ascii'))
+        await writer.drain()
+        status, body = await read_response(reader)
+        return status, body
+    finally:
+        writer.close()
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, object]:
+    """Read one response written by `CompletionServer` from a stream.
+
+    Args:
+        reader (asyncio.StreamReader): The stream to read from.
+
+    Returns:
+        Tuple[int, object]: The status code and the decoded body.
+    """
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    status = int(head[0].split()[1])
+    length = 0
+    for line in head[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    payload = await reader.readexactly(length)
+    if any(line.lower().startswith('content-type: text/plain') for line in head):
+        return status, payload.decode('utf-8')
+    return status, json.loads(payload)
+
+
+def serve_prefork(dataset_dir: str, snapshot_path: Optional[str], host: str, port: int, workers: int,
+                  reuse_port: bool = False, max_concurrency: int = MAX_CONCURRENCY,
+                  timeout: float = REQUEST_TIMEOUT, shard: Optional[Tuple[int, int]] = None,
+                  metrics: bool = False) -> None:
+    """Serve from several forked worker processes that all map the same trie snapshot.
+
+    The snapshot is built once, or checked to be current, by a short-lived child; the parent then only supervises:
+    every worker maps the snapshot read-only, so the trie and line offsets live once in the page cache however
+    many workers there are, and restarts workers that die. The workers either accept on one listening socket
+    inherited from the parent or, with `reuse_port`, bind their own sockets with SO_REUSEPORT so the kernel
+    balances connections between them. SIGTERM or SIGINT stops the workers and returns.
+
+    Args:
+        dataset_dir (str): The directory of the dataset.
+        snapshot_path (Optional[str]): The snapshot to load or write; a temporary file if `None`.
+        host (str): The address to listen on.
+        port (int): The port to listen on; 0 picks a free port, unless `reuse_port` is set.
+        workers (int): The number of worker processes.
+        reuse_port (bool, optional): Whether every worker binds its own SO_REUSEPORT socket. Defaults to False.
+        max_concurrency (int, optional): The maximum number of queries in flight per worker. Defaults to MAX_CONCURRENCY.
+        timeout (float, optional): The number of seconds a query may take. Defaults to REQUEST_TIMEOUT.
+        shard (Optional[Tuple[int, int]], optional): The index and the number of shards, to serve only the files
+            of that shard. Defaults to None.
+        metrics (bool, optional): Whether every worker collects metrics; each serves its own on /metrics.
+            Defaults to False.
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("Prefork serving needs os.fork")
+    if reuse_port and port == 0:
+        raise ValueError("SO_REUSEPORT workers need a fixed port")
+
+    temporary_snapshot = None
+    if snapshot_path is None:
+        descriptor, temporary_snapshot = tempfile.mkstemp(suffix='.snapshot')
+        os.close(descriptor)
+        os.unlink(temporary_snapshot)
+        snapshot_path = temporary_snapshot
+    # Build in a child, so the workers fork from a parent that never held the in-memory trie.
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            CompletionCoordinator(dataset_dir, shard=shard).build_trie(snapshot_path)
+            status = 0
+        finally:
+            os._exit(status)
+    if os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) != 0:
+        raise RuntimeError(f"Building the snapshot of {dataset_dir} failed")
+
+    sock = None if reuse_port else socket.create_server((host, port))
+    if sock is not None:
+        port = sock.getsockname()[1]
+    print(f"Serving suggestions on http://{host}:{port}/suggest?q=... with {workers} workers", flush=True)
+
+    children = set()
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.default_int_handler)
+                worker_sock = sock or socket.create_server((host, port), reuse_port=True)
+                _serve_worker(dataset_dir, snapshot_path, worker_sock, max_concurrency, timeout, shard, metrics)
+                status = 0
+            except KeyboardInterrupt:
+                status = 0
+            finally:
+                os._exit(status)
+        children.add(pid)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+
+    previous_handlers = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        for _ in range(workers):
+            spawn()
+        while children:
+            pid, _ = os.wait()
+            children.discard(pid)
+            if not stopping:
+                spawn()
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        if sock is not None:
+            sock.close()
+        if temporary_snapshot is not None and os.path.exists(temporary_snapshot):
+            os.unlink(temporary_snapshot)
+
+
+def _serve_worker(dataset_dir: str, snapshot_path: str, sock: socket.socket, max_concurrency: int,
+                  timeout: float, shard: Optional[Tuple[int, int]], metrics: bool) -> None:
+    """Map the snapshot and serve on a listening socket until the process is stopped."""
+    coordinator = CompletionCoordinator(dataset_dir, shard=shard, metrics=Metrics() if metrics else None)
+    coordinator.load_trie(snapshot_path)
+    server = CompletionServer(coordinator, max_concurrency=max_concurrency, timeout=timeout)
+
+    async def serve() -> None:
+        await server.start(sock=sock)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    asyncio.run(serve())
+
+
+def _parse_shard(value: str) -> Tuple[int, int]:
+    index, _, count = value.partition('/')
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected INDEX/COUNT, got {value!r}")
+    if not 0 <= shard[0] < shard[1]:
+        raise argparse.ArgumentTypeError(f"shard index must be in [0, {shard[1]})")
+    return shard
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve auto-complete suggestions over HTTP.")
+    parser.add_argument('dataset_dir', nargs='?', default='Dataset')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--snapshot', default=None, help="trie snapshot to load, or to write after building")
+    parser.add_argument('--max-concurrency', type=int, default=MAX_CONCURRENCY)
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT)
+    parser.add_argument('--workers', type=int, default=1, help="serve from this many forked processes")
+    parser.add_argument('--reuse-port', action='store_true', help="let the kernel balance workers with SO_REUSEPORT")
+    parser.add_argument('--metrics', action='store_true', help="collect metrics and serve them on /metrics")
+    parser.add_argument('--shard', type=_parse_shard, default=None, metavar='INDEX/COUNT',
+                        help="serve only the files of one shard of the dataset")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        serve_prefork(args.dataset_dir, args.snapshot, args.host, args.port, args.workers, args.reuse_port,
+                      args.max_concurrency, args.timeout, args.shard, args.metrics)
+        return
+
+    coordinator = CompletionCoordinator(args.dataset_dir, shard=args.shard,
+                                        metrics=Metrics() if args.metrics else None)
+    coordinator.build_trie(args.snapshot)
+    server = CompletionServer(coordinator, args.host, args.port, args.max_concurrency, args.timeout)
+
+    async def serve() -> None:
+        await server.start()
+        print(f"Serving suggestions on http://{server.host}:{server.port}/suggest?q=...", flush=True)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,11 @@ class AutoCompleteData:
         source_text (str): The source text from which the suggestion was derived.
         offset (int): The index offset in the source text where the suggestion starts.
         score (int): The score of the suggestion based on relevance.
+        popularity (float): How common the suggested line is in the dataset and how often it was picked,
+            which orders suggestions of equal score.
     """
     completed_sentence: str
     source_text: str
     offset: int
-    score: int
\ No newline at end of file
+    score: int
+    popularity: float = 0.0
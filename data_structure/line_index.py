@@ -0,0 +1,161 @@
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from array import array
+from typing import IO, Dict, Iterable, Optional
+from text_processor.ingest import READ_BUFFER_SIZE, is_compressed, open_binary
+from utils.functions import get_line_at_index
+
+
+class LineIndex:
+    """Maps the lines of indexed files to their byte offsets, so a line can be served by a single seek.
+
+    Offsets of compressed files count decompressed bytes. A compressed stream can only seek by decompressing
+    from its start, so the first line read from a compressed file decompresses it once into a temporary file,
+    and every later read seeks in that copy like in a plain file. The copies are deleted when their file is
+    re-registered or removed, and when the index is garbage collected. Invalid UTF-8 is served as U+FFFD, the
+    way ingestion indexes it.
+
+    Attributes:
+        offsets (Dict[str, array]): A dictionary mapping file names to arrays of line start offsets.
+            Entry `n - 1` holds the start of line `n` and the last entry holds the end of the file,
+            so the length of every line is known without scanning for its terminator.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty line index."""
+        self.offsets: Dict[str, array] = {}
+        self._decompressed: Dict[str, str] = {}     # compressed files mapped to their decompressed copies
+        self._decompress_lock: threading.Lock = threading.Lock()
+        weakref.finalize(self, _delete_copies, self._decompressed)
+
+    def add_file(self, file_path: str, offsets: array) -> None:
+        """Register the line offsets of a file.
+
+        Args:
+            file_path (str): The path of the indexed file.
+            offsets (array): An `array('Q')` of line start offsets followed by the end-of-file offset.
+        """
+        self.offsets[file_path] = offsets
+        self._forget_copy(file_path)
+
+    def remove_file(self, file_path: str) -> None:
+        """Forget the line offsets of a file, if it was indexed.
+
+        Args:
+            file_path (str): The path of the file to forget.
+        """
+        self.offsets.pop(file_path, None)
+        self._forget_copy(file_path)
+
+    def get_line(self, file_path: str, line_number: int) -> Optional[str]:
+        """Read a single line of a file by seeking directly to its offset.
+
+        Files that were not registered fall back to a sequential scan.
+
+        Args:
+            file_path (str): The path of the file.
+            line_number (int): The 1-based number of the line to read.
+
+        Returns:
+            Optional[str]: The stripped line, or `None` if the file has no such line.
+        """
+        offsets = self.offsets.get(file_path)
+        if offsets is None:
+            return get_line_at_index(file_path, line_number)
+        if not 0 < line_number < len(offsets):
+            return None
+
+        start = offsets[line_number - 1]
+        with self._open(file_path) as file:
+            file.seek(start)
+            data = file.read(offsets[line_number] - start)
+        return data.decode('utf-8', 'replace').strip()
+
+    def get_lines(self, file_path: str, line_numbers: Iterable[int]) -> Dict[int, Optional[str]]:
+        """Read several lines of a file in one pass, in ascending order of their offsets.
+
+        Runs of adjacent lines are read with a single read, and files that were not registered are scanned
+        once for all requested lines.
+
+        Args:
+            file_path (str): The path of the file.
+            line_numbers (Iterable[int]): The 1-based numbers of the lines to read.
+
+        Returns:
+            Dict[int, Optional[str]]: A dictionary mapping each line number to the stripped line, or `None` if
+                the file has no such line.
+        """
+        wanted = sorted(set(line_numbers))
+        lines: Dict[int, Optional[str]] = dict.fromkeys(wanted)
+        offsets = self.offsets.get(file_path)
+        if offsets is None:
+            return self._scan_lines(file_path, lines)
+
+        wanted = [line_number for line_number in wanted if 0 < line_number < len(offsets)]
+        if not wanted:
+            return lines
+        with self._open(file_path) as file:
+            i = 0
+            while i < len(wanted):
+                first = last = wanted[i]
+                while i + 1 < len(wanted) and wanted[i + 1] == last + 1:
+                    i += 1
+                    last = wanted[i]
+                i += 1
+                start = offsets[first - 1]
+                file.seek(start)
+                data = file.read(offsets[last] - start)
+                for line_number in range(first, last + 1):
+                    line = data[offsets[line_number - 1] - start:offsets[line_number] - start]
+                    lines[line_number] = line.decode('utf-8', 'replace').strip()
+        return lines
+
+    def _open(self, file_path: str) -> IO[bytes]:
+        """Open a registered file for seeking, through its decompressed copy if it is compressed."""
+        if not is_compressed(file_path):
+            return open(file_path, 'rb')
+        copy_path = self._decompressed.get(file_path)
+        if copy_path is None:
+            with self._decompress_lock:  # concurrent reads must not decompress the same file twice
+                copy_path = self._decompressed.get(file_path)
+                if copy_path is None:
+                    descriptor, copy_path = tempfile.mkstemp(suffix='.lines')
+                    try:
+                        with os.fdopen(descriptor, 'wb') as copy, open_binary(file_path) as source:
+                            shutil.copyfileobj(source, copy, READ_BUFFER_SIZE)
+                    except BaseException:
+                        os.unlink(copy_path)
+                        raise
+                    self._decompressed[file_path] = copy_path
+        return open(copy_path, 'rb')
+
+    def _forget_copy(self, file_path: str) -> None:
+        """Delete the decompressed copy of a file, if there is one."""
+        copy_path = self._decompressed.pop(file_path, None)
+        if copy_path is not None:
+            _delete_copies({file_path: copy_path})
+
+    @staticmethod
+    def _scan_lines(file_path: str, lines: Dict[int, Optional[str]]) -> Dict[int, Optional[str]]:
+        """Fill in requested lines of an unregistered file with one sequential scan."""
+        if not lines:
+            return lines
+        last = max(lines)
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, start=1):
+                if line_number in lines:
+                    lines[line_number] = line.strip()
+                if line_number == last:
+                    break
+        return lines
+
+
+def _delete_copies(copies: Dict[str, str]) -> None:
+    """Delete decompressed copies of compressed files, ignoring those already gone."""
+    for copy_path in copies.values():
+        try:
+            os.unlink(copy_path)
+        except OSError:
+            pass
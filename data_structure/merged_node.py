@@ -0,0 +1,98 @@
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+
+class MergedNode:
+    """Presents the nodes found at the same path in several tries as a single read-only node.
+
+    The tries must index disjoint files whose ids ascend from one trie to the next, so the union of their
+    postings is simply their concatenation in trie order, and their nodes must share one vocabulary. Lookups
+    that reach a path present in only one trie return that trie's node itself, so the rest of the walk runs at
+    the speed of a single trie.
+    """
+    __slots__ = ('nodes',)
+
+    def __init__(self, nodes: List) -> None:
+        """Initialize a merged view over nodes sharing the same path.
+
+        Args:
+            nodes (List): The nodes to merge, ordered by the file ids they cover.
+        """
+        self.nodes: List = nodes
+
+    @property
+    def word_id(self) -> Optional[int]:
+        """Optional[int]: The id of the word associated with this node, or `None` for the root."""
+        return self.nodes[0].word_id
+
+    def get_child(self, word_id: int) -> Optional[object]:
+        """Return the merged child node for a word.
+
+        Args:
+            word_id (int): The id of the word of the child node.
+
+        Returns:
+            Optional[object]: The child node, or `None` if none of the tries has a child for the word.
+        """
+        children = [child for child in (node.get_child(word_id) for node in self.nodes) if child is not None]
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else MergedNode(children)
+
+    def children_with_prefix(self, prefix: str, vocabulary: object) -> List[object]:
+        """Return the merged child nodes whose word starts with a prefix.
+
+        Args:
+            prefix (str): The prefix of the words.
+            vocabulary (object): The vocabulary shared by the merged tries.
+
+        Returns:
+            List[object]: The matching child nodes in word order.
+        """
+        children: Dict[int, List] = {}
+        for node in self.nodes:
+            for child in node.children_with_prefix(prefix, vocabulary):
+                children.setdefault(child.word_id, []).append(child)
+        return [same_word[0] if len(same_word) == 1 else MergedNode(same_word)
+                for _, same_word in sorted(children.items(), key=lambda item: vocabulary.word(item[0]))]
+
+    def iter_children(self) -> Iterator[object]:
+        """Iterate over the merged child nodes.
+
+        Returns:
+            Iterator[object]: An iterator over the child nodes.
+        """
+        children: Dict[int, List] = {}
+        for node in self.nodes:
+            for child in node.iter_children():
+                children.setdefault(child.word_id, []).append(child)
+        for same_word in children.values():
+            yield same_word[0] if len(same_word) == 1 else MergedNode(same_word)
+
+    @property
+    def postings(self) -> array:
+        """array: The sorted posting keys of all merged nodes."""
+        postings = array('Q')
+        for node in self.nodes:
+            postings.extend(node.postings)
+        return postings
+
+    @property
+    def offsets(self) -> array:
+        """array: The character offsets parallel to `postings`."""
+        offsets = array('I')
+        for node in self.nodes:
+            offsets.extend(node.offsets)
+        return offsets
+
+    def add_child(self, word_id: int) -> object:
+        raise TypeError("A merged trie is read-only")
+
+    def add_posting(self, key: int, offset: int = 0) -> None:
+        raise TypeError("A merged trie is read-only")
+
+    def remove_child(self, word_id: int) -> None:
+        raise TypeError("A merged trie is read-only")
+
+    def remove_postings(self, low: int, high: int) -> bool:
+        raise TypeError("A merged trie is read-only")
@@ -1,21 +1,217 @@
-from typing import Dict, List
-from collections import defaultdict
+from array import array
+from bisect import bisect_left
+from itertools import islice
+from typing import Iterator, List, Optional, Union
+from data_structure.postings import add_posting
+from data_structure.vocabulary import Vocabulary
+
+
+class Children(dict):
+    """The children of a node with more than one child, by word id.
+
+    Attributes:
+        sorted_words (Optional[List[str]]): The words of the children in sorted order, built on the first
+            prefix lookup and dropped whenever a child is added or removed.
+    """
+    __slots__ = ('sorted_words',)
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.sorted_words: Optional[List[str]] = None
 
 
 class Node:
     """Represents a node in a trie data structure.
 
+    Most nodes of the suffix trie have a single child and a single posting, so both are stored
+    unboxed until a second entry arrives: children go from `None` to the child node itself to a
+    dictionary, and postings go from `None` to a plain key to a sorted `array('Q')`. Every posting
+    carries the character offset in its line where the suffix that reached this node starts; the
+    offsets are kept the same way, in an `array('I')` parallel to the keys.
+
+    Edges are keyed by the integer ids a `Vocabulary` assigns to the words, not by the words themselves.
+
     Attributes:
-        word (str): The word associated with this node. `None` if this node does not represent a complete word.
-        children (Dict[str, Node]): A dictionary mapping characters to child nodes.
-        file_data (Dict[str, List[int]]): A dictionary mapping file names to lists of line indices where the word occurs.
+        word_id (Optional[int]): The id of the word associated with this node, or `None` for the root.
     """
-    def __init__(self, word: str = None) -> None:
+    __slots__ = ('word_id', '_children', '_postings', '_offsets')
+
+    def __init__(self, word_id: Optional[int] = None) -> None:
         """Initialize a new node in the trie.
 
         Args:
-            word (str, optional): The word associated with this node. Defaults to None.
+            word_id (Optional[int], optional): The id of the word associated with this node. Defaults to None.
+        """
+        self.word_id: Optional[int] = word_id
+        self._children: Union[None, Node, Children] = None
+        self._postings: Union[None, int, array] = None
+        self._offsets: Union[None, int, array] = None
+
+    def get_child(self, word_id: int) -> Optional['Node']:
+        """Return the child node for a word.
+
+        Args:
+            word_id (int): The id of the word of the child node.
+
+        Returns:
+            Optional[Node]: The child node, or `None` if there is no child for the word.
+        """
+        children = self._children
+        if children is None:
+            return None
+        if isinstance(children, Node):
+            return children if children.word_id == word_id else None
+        return children.get(word_id)
+
+    def add_child(self, word_id: int) -> 'Node':
+        """Return the child node for a word, creating it if it does not exist yet.
+
+        Args:
+            word_id (int): The id of the word of the child node.
+
+        Returns:
+            Node: The existing or newly created child node.
+        """
+        children = self._children
+        if children is None:
+            child = self._children = Node(word_id)
+        elif isinstance(children, Node):
+            if children.word_id == word_id:
+                return children
+            child = Node(word_id)
+            self._children = Children({children.word_id: children, word_id: child})
+        else:
+            child = children.get(word_id)
+            if child is None:
+                child = children[word_id] = Node(word_id)
+                children.sorted_words = None
+        return child
+
+    def remove_child(self, word_id: int) -> None:
+        """Remove the child node for a word, if there is one.
+
+        Args:
+            word_id (int): The id of the word of the child node.
+        """
+        children = self._children
+        if isinstance(children, Node):
+            if children.word_id == word_id:
+                self._children = None
+        elif children is not None:
+            children.pop(word_id, None)
+            children.sorted_words = None
+            if len(children) == 1:
+                self._children = next(iter(children.values()))
+
+    def iter_children(self) -> Iterator['Node']:
+        """Iterate over the child nodes in insertion order.
+
+        Returns:
+            Iterator[Node]: An iterator over the child nodes.
+        """
+        children = self._children
+        if children is None:
+            return iter(())
+        if isinstance(children, Node):
+            return iter((children,))
+        return iter(children.values())
+
+    def children_with_prefix(self, prefix: str, vocabulary: Vocabulary) -> List['Node']:
+        """Return the child nodes whose word starts with a prefix, found by binary search over the sorted words.
+
+        Args:
+            prefix (str): The prefix of the words.
+            vocabulary (Vocabulary): The vocabulary that assigned the word ids.
+
+        Returns:
+            List[Node]: The matching child nodes in word order.
+        """
+        children = self._children
+        if children is None:
+            return []
+        if isinstance(children, Node):
+            return [children] if vocabulary.word(children.word_id).startswith(prefix) else []
+        words = children.sorted_words
+        if words is None:
+            words = children.sorted_words = sorted(map(vocabulary.word, children))
+        matches = []
+        for word in islice(words, bisect_left(words, prefix), None):
+            if not word.startswith(prefix):
+                break
+            matches.append(children[vocabulary.id_of(word)])
+        return matches
+
+    @property
+    def postings(self) -> array:
+        """array: The sorted `array('Q')` of posting keys (see `data_structure.postings`) of this node."""
+        postings = self._postings
+        if postings is None:
+            return array('Q')
+        if isinstance(postings, int):
+            return array('Q', (postings,))
+        return postings
+
+    @property
+    def offsets(self) -> array:
+        """array: The `array('I')` of character offsets parallel to `postings`."""
+        offsets = self._offsets
+        if offsets is None:
+            return array('I')
+        if isinstance(offsets, int):
+            return array('I', (offsets,))
+        return offsets
+
+    def add_posting(self, key: int, offset: int = 0) -> None:
+        """Add a posting key to this node, keeping the postings sorted and free of duplicates.
+
+        When a line reaches this node more than once, the offset of its first occurrence is kept.
+
+        Args:
+            key (int): The posting key to add.
+            offset (int, optional): The character offset in the line where the matched suffix starts. Defaults to 0.
         """
-        self.word: str = word
-        self.children: Dict[str, Node] = defaultdict(Node)
-        self.file_data: Dict[str, List[int]] = defaultdict(list)
\ No newline at end of file
+        postings = self._postings
+        if postings is None:
+            self._postings = key
+            self._offsets = offset
+        elif isinstance(postings, int):
+            if postings < key:
+                self._postings = array('Q', (postings, key))
+                self._offsets = array('I', (self._offsets, offset))
+            elif postings > key:
+                self._postings = array('Q', (key, postings))
+                self._offsets = array('I', (offset, self._offsets))
+        else:
+            add_posting(postings, self._offsets, key, offset)
+
+    def remove_postings(self, low: int, high: int) -> bool:
+        """Remove the posting keys in the range `[low, high)`, such as all keys of one file.
+
+        Args:
+            low (int): The smallest key to remove.
+            high (int): The key after the largest key to remove.
+
+        Returns:
+            bool: Whether any key was removed.
+        """
+        postings = self._postings
+        if postings is None:
+            return False
+        if isinstance(postings, int):
+            if low <= postings < high:
+                self._postings = self._offsets = None
+                return True
+            return False
+
+        offsets = self._offsets
+        start = bisect_left(postings, low)
+        end = bisect_left(postings, high, start)
+        if start == end:
+            return False
+        del postings[start:end]
+        del offsets[start:end]
+        if len(postings) == 1:
+            self._postings, self._offsets = postings[0], offsets[0]
+        elif not postings:
+            self._postings = self._offsets = None
+        return True
@@ -0,0 +1,287 @@
+import hashlib
+import heapq
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from data_structure.postings import LINE_BITS
+from utils.consts import CLICK_HALF_LIFE, CLICK_LOG_SIZE
+
+
+def hash_text(words: Sequence[str]) -> int:
+    """Hash the normalized words of a line into a 64-bit integer that is stable across processes.
+
+    Args:
+        words (Sequence[str]): The normalized words of the line.
+
+    Returns:
+        int: The hash of the line text.
+    """
+    text = ' '.join(words).encode('utf-8', 'surrogatepass')
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'little')
+
+
+def read_click_log(path: str) -> Iterator[Tuple[float, str, int]]:
+    """Read a query log of picked suggestions.
+
+    Every line of the log holds a Unix timestamp, the file name and the line number of the picked suggestion,
+    separated by tabs. Blank lines and lines starting with `#` are ignored.
+
+    Args:
+        path (str): The path of the log.
+
+    Returns:
+        Iterator[Tuple[float, str, int]]: An iterator over the timestamp, file name and line number of every click.
+
+    Raises:
+        ValueError: If a line of the log is malformed.
+    """
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            if len(fields) != 3:
+                raise ValueError(f"{path}:{number}: expected timestamp, file name and line number separated by tabs")
+            yield float(fields[0]), fields[1], int(fields[2])
+
+
+class Popularity:
+    """Weighs indexed lines by how common their text is in the corpus and how often, and how recently, they were picked.
+
+    The frequency of a line is the number of indexed lines with the same normalized text, counted through a
+    stable hash of the text as lines are inserted. Clicks from a query log add to it, every click counting
+    half as much once `half_life` seconds have passed. Lines are identified by their posting keys.
+
+    Attributes:
+        half_life (Optional[float]): The seconds after which a click counts half, or `None` for clicks that never fade.
+        click_weight (float): How many occurrences in the corpus a fresh click is worth.
+        version (int): A counter bumped on every click, so lists ranked by the weights can tell they are stale.
+            `changed_since` tells which lines the recent bumps were about.
+    """
+    def __init__(self, half_life: Optional[float] = CLICK_HALF_LIFE, click_weight: float = 1.0) -> None:
+        """Initialize an empty popularity table.
+
+        Args:
+            half_life (Optional[float], optional): The half-life of clicks in seconds, or `None` for no decay.
+                Defaults to CLICK_HALF_LIFE.
+            click_weight (float, optional): The weight of a fresh click. Defaults to 1.0.
+        """
+        self.half_life: Optional[float] = half_life
+        self.click_weight: float = click_weight
+        self.version: int = 0
+        self._line_hashes: Dict[int, int] = {}
+        self._text_counts: Dict[int, int] = {}
+        self._duplicates: int = 0                                   # texts occurring on more than one line
+        self._stored: List[Tuple[Sequence[int], Sequence[int]]] = []  # read-only lines from snapshots
+        self._frequencies: Dict[int, int] = {}                      # stored lines whose text is not unique
+        self._clicks: Dict[int, Tuple[float, float]] = {}           # decayed click count and when it was last updated
+        self._file_lines: Dict[int, Set[int]] = {}                  # the keys of `_line_hashes` by file id
+        self._file_clicks: Dict[int, Set[int]] = {}                 # the keys of `_clicks` by file id
+        self._changes: List[Optional[int]] = []     # the line of every recent version bump, `None` for several lines
+        self._changes_start: int = 0                # the version before the first of `_changes`
+
+    def add_line(self, key: int, words: Sequence[str]) -> None:
+        """Count an inserted line. Lines without words are never matched, so they are not counted.
+
+        Args:
+            key (int): The posting key of the line.
+            words (Sequence[str]): The normalized words of the line.
+        """
+        if words and key not in self._line_hashes:
+            self._count_line(key, hash_text(words))
+
+    def remove_range(self, low: int, high: int) -> None:
+        """Forget the inserted lines and the clicks whose posting keys lie in a range.
+
+        Args:
+            low (int): The smallest posting key to remove.
+            high (int): The posting key after the largest one to remove.
+        """
+        for key in _take_range(self._file_lines, low, high):
+            text_hash = self._line_hashes.pop(key)
+            count = self._text_counts.pop(text_hash) - 1
+            if count:
+                self._text_counts[text_hash] = count
+            if count == 1:
+                self._duplicates -= 1
+        clicked = _take_range(self._file_clicks, low, high)
+        for key in clicked:
+            del self._clicks[key]
+        if clicked:
+            self._log_change(None)
+
+    def add_stored(self, keys: Sequence[int], hashes: Sequence[int],
+                   frequencies: Optional[Dict[int, int]] = None) -> None:
+        """Add read-only lines, as exported by `export`.
+
+        Args:
+            keys (Sequence[int]): The posting keys of the lines.
+            hashes (Sequence[int]): The text hash of every line.
+            frequencies (Optional[Dict[int, int]], optional): The frequencies of the lines whose text is not
+                unique, when they are known to cover every stored line. If not provided, they are counted again
+                over all stored lines. Defaults to None.
+        """
+        self._stored.append((keys, hashes))
+        if frequencies is not None:
+            self._frequencies = frequencies
+            return
+        counts = Counter(text_hash for _, stored_hashes in self._stored for text_hash in stored_hashes)
+        self._frequencies = {key: counts[text_hash] for stored_keys, stored_hashes in self._stored
+                             for key, text_hash in zip(stored_keys, stored_hashes) if counts[text_hash] > 1}
+
+    def absorb_stored(self) -> None:
+        """Count the read-only lines added by `add_stored` like inserted ones, so they can be removed again."""
+        for stored_keys, stored_hashes in self._stored:
+            for key, text_hash in zip(stored_keys, stored_hashes):
+                if key not in self._line_hashes:
+                    self._count_line(key, text_hash)
+        self._stored = []
+        self._frequencies = {}
+
+    def export(self) -> Tuple[array, array, array, array]:
+        """Export every line for saving.
+
+        Returns:
+            Tuple[array, array, array, array]: The sorted posting keys of the lines and their text hashes, as
+                `array('Q')`, and the keys and frequencies of the lines whose text is not unique.
+        """
+        rows = list(self._line_hashes.items())
+        for stored_keys, stored_hashes in self._stored:
+            rows.extend(zip(stored_keys, stored_hashes))
+        rows.sort()
+        frequent = [(key, self.frequency(key)) for key, _ in rows]
+        frequent = [(key, count) for key, count in frequent if count > 1]
+        return (array('Q', [key for key, _ in rows]), array('Q', [text_hash for _, text_hash in rows]),
+                array('Q', [key for key, _ in frequent]), array('Q', [count for _, count in frequent]))
+
+    def frequency(self, key: int) -> int:
+        """Return the number of indexed lines with the same text as a line, the line itself included."""
+        text_hash = self._line_hashes.get(key)
+        if text_hash is not None:
+            return self._text_counts[text_hash]
+        return self._frequencies.get(key, 1)
+
+    def record_click(self, key: int, timestamp: Optional[float] = None) -> None:
+        """Record that a line was picked as a suggestion.
+
+        Args:
+            key (int): The posting key of the line.
+            timestamp (Optional[float], optional): The Unix time of the click. Defaults to now.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        clicks, updated = self._clicks.get(key, (0.0, timestamp))
+        if timestamp >= updated:
+            clicks, updated = clicks * self._decay(timestamp - updated) + 1.0, timestamp
+        else:
+            clicks += self._decay(updated - timestamp)
+        self._clicks[key] = (clicks, updated)
+        self._file_clicks.setdefault(key >> LINE_BITS, set()).add(key)
+        self._log_change(key)
+
+    def changed_since(self, version: int) -> Optional[List[int]]:
+        """Return the lines whose weight changed after a version.
+
+        Args:
+            version (int): A past value of `version`.
+
+        Returns:
+            Optional[List[int]]: The posting keys of the changed lines, possibly repeated, or `None` if the
+                changes are too old to be remembered or were not about single lines.
+        """
+        if version < self._changes_start:
+            return None
+        changes = self._changes[version - self._changes_start:]
+        return None if None in changes else changes
+
+    def clicks(self, key: int, now: Optional[float] = None) -> float:
+        """Return the number of clicks on a line, each one decayed by its age.
+
+        Args:
+            key (int): The posting key of the line.
+            now (Optional[float], optional): The Unix time to decay the clicks to. Defaults to now.
+
+        Returns:
+            float: The decayed click count.
+        """
+        entry = self._clicks.get(key)
+        if entry is None:
+            return 0.0
+        clicks, updated = entry
+        now = time.time() if now is None else now
+        return clicks * self._decay(max(now - updated, 0.0))
+
+    def weight(self, key: int, now: Optional[float] = None) -> float:
+        """Return the popularity of a line: its frequency plus its weighted, decayed clicks.
+
+        Args:
+            key (int): The posting key of the line.
+            now (Optional[float], optional): The Unix time to decay the clicks to. Defaults to now.
+
+        Returns:
+            float: The popularity, at least 1 for an indexed line.
+        """
+        weight = float(self.frequency(key))
+        if key in self._clicks:
+            weight += self.click_weight * self.clicks(key, now)
+        return weight
+
+    def is_uniform(self) -> bool:
+        """Check whether every line weighs the same, because no text repeats and nothing was clicked."""
+        return not self._duplicates and not self._frequencies and not self._clicks
+
+    def top(self, keys: Sequence[int], offsets: Sequence[int], limit: int,
+            now: Optional[float] = None) -> Tuple[List[int], List[int]]:
+        """Select the most popular of the lines of a posting list.
+
+        Args:
+            keys (Sequence[int]): The sorted posting keys.
+            offsets (Sequence[int]): The offsets parallel to `keys`.
+            limit (int): The number of lines to select.
+            now (Optional[float], optional): The Unix time to decay the clicks to. Defaults to now.
+
+        Returns:
+            Tuple[List[int], List[int]]: The selected keys, by descending popularity and then in key order,
+                and their offsets.
+        """
+        if self.is_uniform():
+            return list(keys[:limit]), list(offsets[:limit])
+        now = time.time() if now is None else now
+        weight = self.weight
+        # nsmallest is stable, so lines of equal popularity stay in key order.
+        chosen = heapq.nsmallest(limit, range(len(keys)), key=lambda i: -weight(keys[i], now))
+        return [keys[i] for i in chosen], [offsets[i] for i in chosen]
+
+    def _count_line(self, key: int, text_hash: int) -> None:
+        self._line_hashes[key] = text_hash
+        self._file_lines.setdefault(key >> LINE_BITS, set()).add(key)
+        count = self._text_counts[text_hash] = self._text_counts.get(text_hash, 0) + 1
+        if count == 2:
+            self._duplicates += 1
+
+    def _log_change(self, key: Optional[int]) -> None:
+        self._changes.append(key)
+        self.version += 1
+        if len(self._changes) > CLICK_LOG_SIZE:
+            dropped = len(self._changes) // 2
+            del self._changes[:dropped]
+            self._changes_start += dropped
+
+    def _decay(self, seconds: float) -> float:
+        return 1.0 if self.half_life is None else 0.5 ** (seconds / self.half_life)
+
+
+def _take_range(keys_by_file: Dict[int, Set[int]], low: int, high: int) -> List[int]:
+    """Remove the keys in the range `[low, high)` from sets of keys grouped by file id, and return them."""
+    taken = []
+    for file_id in range(low >> LINE_BITS, ((high - 1) >> LINE_BITS) + 1):
+        keys = keys_by_file.get(file_id)
+        if not keys:
+            continue
+        in_range = [key for key in keys if low <= key < high]
+        keys.difference_update(in_range)
+        if not keys:
+            del keys_by_file[file_id]
+        taken.extend(in_range)
+    return taken
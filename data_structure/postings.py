@@ -0,0 +1,108 @@
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import List, Optional, Sequence, Tuple
+
+
+LINE_BITS: int = 32
+LINE_MASK: int = (1 << LINE_BITS) - 1
+
+
+def pack_posting(file_id: int, line_number: int) -> int:
+    """Pack a file id and a line number into a single sortable posting key.
+
+    Args:
+        file_id (int): The interned id of the file.
+        line_number (int): The line number within the file.
+
+    Returns:
+        int: The posting key, ordered by file id first and line number second.
+    """
+    return (file_id << LINE_BITS) | line_number
+
+
+def unpack_posting(key: int) -> Tuple[int, int]:
+    """Split a posting key back into its file id and line number.
+
+    Args:
+        key (int): The posting key.
+
+    Returns:
+        Tuple[int, int]: The file id and the line number.
+    """
+    return key >> LINE_BITS, key & LINE_MASK
+
+
+def add_posting(postings: array, offsets: array, key: int, offset: int) -> None:
+    """Add a key to a sorted posting array, keeping it sorted and free of duplicates.
+
+    Lines are usually inserted in increasing order, so the common case is a plain append. The offset is
+    stored at the same position in the parallel offsets array; a duplicate key keeps its first offset.
+
+    Args:
+        postings (array): The sorted `array('Q')` of posting keys.
+        offsets (array): The `array('I')` of offsets parallel to `postings`.
+        key (int): The posting key to add.
+        offset (int): The offset that goes with the key.
+    """
+    if not postings or postings[-1] < key:
+        postings.append(key)
+        offsets.append(offset)
+        return
+
+    index = bisect_left(postings, key)
+    if postings[index] != key:
+        postings.insert(index, key)
+        offsets.insert(index, offset)
+
+
+def contains_posting(postings: Sequence[int], key: int) -> bool:
+    """Check whether a sorted posting array holds a key.
+
+    Args:
+        postings (Sequence[int]): The sorted posting keys.
+        key (int): The posting key to look for.
+
+    Returns:
+        bool: Whether `key` is one of the postings.
+    """
+    index = bisect_left(postings, key)
+    return index < len(postings) and postings[index] == key
+
+
+def union_postings(posting_lists: List[Sequence[int]], offset_lists: List[Sequence[int]],
+                   limit: Optional[int] = None) -> Tuple[List[int], List[int]]:
+    """Merge sorted posting lists into their sorted union, consuming only as much of them as needed.
+
+    With a limit, only the smallest `limit` keys seen so far are kept, in a heap, and every list is read only
+    until its keys are larger than all of them, so prefixes with many completions stay cheap.
+    A key present in several lists keeps the smallest of its offsets, the earliest match in its line.
+
+    Args:
+        posting_lists (List[Sequence[int]]): The sorted posting key sequences to merge.
+        offset_lists (List[Sequence[int]]): The offsets parallel to every posting key sequence.
+        limit (Optional[int], optional): Stop once this many distinct keys were found. Defaults to None.
+
+    Returns:
+        Tuple[List[int], List[int]]: The distinct keys in ascending order and their offsets.
+    """
+    if len(posting_lists) == 1:
+        return list(posting_lists[0][:limit]), list(offset_lists[0][:limit])
+
+    chosen = {}
+    largest = []    # the chosen keys, negated so the largest one is on top
+    for postings, offsets in zip(posting_lists, offset_lists):
+        for key, offset in zip(postings[:limit], offsets[:limit]):
+            if key in chosen:
+                chosen[key] = min(chosen[key], offset)
+                continue
+            if limit is None or len(largest) < limit:
+                if limit is not None:
+                    heapq.heappush(largest, -key)
+            elif key < -largest[0]:
+                del chosen[-heapq.heapreplace(largest, -key)]
+            else:
+                break
+            chosen[key] = offset
+    keys = sorted(chosen)
+    return keys, [chosen[key] for key in keys]
@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+
+V = TypeVar('V')
+
+
+class ResultCache(Generic[V]):
+    """A bounded least-recently-used cache with optional time-to-live expiry.
+
+    Memory is bounded by the number of entries: once `max_entries` are stored, every insertion evicts the
+    least recently used one. With a `ttl`, entries older than that many seconds are treated as missing and
+    dropped when they are next looked up. All methods are safe to call from several threads.
+
+    Attributes:
+        max_entries (int): The maximum number of entries kept. Zero disables the cache.
+        ttl (Optional[float]): The number of seconds an entry stays valid, or `None` to keep entries until evicted.
+        hits (int): The number of lookups answered from the cache.
+        misses (int): The number of lookups that found no valid entry.
+        evictions (int): The number of entries dropped to make room for new ones.
+        expirations (int): The number of entries dropped because their time-to-live ran out.
+    """
+    def __init__(self, max_entries: int, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_entries (int): The maximum number of entries kept. Zero disables the cache.
+            ttl (Optional[float], optional): The number of seconds an entry stays valid. Defaults to None.
+            clock (Callable[[], float], optional): The time source for expiry. Defaults to time.monotonic.
+        """
+        if max_entries < 0:
+            raise ValueError("max_entries must not be negative")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.max_entries: int = max_entries
+        self.ttl: Optional[float] = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.expirations: int = 0
+        self._clock: Callable[[], float] = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[float, V]]' = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Look up a key, marking it as the most recently used.
+
+        Args:
+            key (Hashable): The key to look up.
+
+        Returns:
+            Optional[V]: The cached value, or `None` if the key is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl is not None and self._clock() >= expires_at:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        """Store a value, evicting the least recently used entries beyond `max_entries`.
+
+        Args:
+            key (Hashable): The key to store the value under.
+            value (V): The value to store.
+        """
+        if self.max_entries == 0:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl is not None else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the counters and the current size of the cache.
+
+        Returns:
+            dict: The `hits`, `misses`, `evictions`, `expirations` and `size` of the cache.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'expirations': self.expirations, 'size': len(self._entries)}
@@ -0,0 +1,122 @@
+from data_structure.word_trie import WordTrie
+from typing import List, Optional, Tuple
+
+
+class _Step:
+    """The cached outcome of following one prompt word down the trie."""
+    __slots__ = ('word', 'node', 'typo', 'lookahead')
+
+    def __init__(self, word: str, node: object, typo: bool, lookahead: Optional[str]) -> None:
+        self.word: str = word
+        self.node: object = node
+        self.typo: bool = typo
+        self.lookahead: Optional[str] = lookahead
+
+
+class SearchSession:
+    """Incremental search state for a prompt that is typed a few words at a time.
+
+    The session remembers, for every word of the prompt so far, the trie node it led to and whether it was
+    taken as a typo. Every suffix that reaches a node also passed through its parent, so the postings of the
+    last node are already the matches of the whole prompt. When the prompt grows, only the new words are
+    followed down the trie. The one exception is a last word that was taken as a typo: which typo child fits
+    depends on the word after it, so that step is redone once the next word arrives.
+
+    Attributes:
+        trie (WordTrie): The trie being searched.
+        prompt (str): The prompt typed so far.
+    """
+    def __init__(self, trie: WordTrie) -> None:
+        """Initialize an empty session over a trie.
+
+        Args:
+            trie (WordTrie): The trie to search.
+        """
+        self.trie: WordTrie = trie
+        self.prompt: str = ""
+        self._steps: List[_Step] = []
+        self._generation: int = trie.generation
+
+    def reset(self) -> None:
+        """Forget the prompt and every cached step."""
+        self.prompt = ""
+        self._steps = []
+
+    def extend(self, text: str, prefix: bool = False) -> List[Tuple[str, int, int]]:
+        """Append text to the prompt and search for the result.
+
+        Args:
+            text (str): The text to append.
+            prefix (bool, optional): Whether the last word may be incomplete, as in `WordTrie.search`.
+                Defaults to False.
+
+        Returns:
+            List[Tuple[str, int, int]]: The matches of the whole prompt, as returned by `WordTrie.search_spans`.
+        """
+        return self.update(self.prompt + text, prefix)
+
+    def update(self, prompt: str, prefix: bool = False) -> List[Tuple[str, int, int]]:
+        """Replace the prompt and search for it, reusing the steps of the words it shares with the previous one.
+
+        Args:
+            prompt (str): The new prompt.
+            prefix (bool, optional): Whether the last word may be incomplete, as in `WordTrie.search`. It is
+                then completed afresh on every update, since its completions change with every character.
+                Defaults to False.
+
+        Returns:
+            List[Tuple[str, int, int]]: The matches of the prompt, as returned by `WordTrie.search_spans`.
+        """
+        self.prompt = prompt
+        words = self.trie.normalizer.normalize(prompt).split()
+        partial = words.pop() if prefix and words and not prompt[-1].isspace() else None
+        if self._generation != self.trie.generation:
+            # Nodes and posting lists may have changed underneath the cached steps.
+            self._generation = self.trie.generation
+            self._steps = []
+
+        steps = self._steps
+        kept = 0
+        while kept < len(steps) and kept < len(words) and self._is_valid(steps[kept], words, kept):
+            kept += 1
+        del steps[kept:]
+
+        while len(steps) < len(words):
+            depth = len(steps)
+            next_word = words[depth + 1] if depth + 1 < len(words) else None
+            node, typo = self.trie.step(steps[-1].node if steps else self.trie.root, words[depth], next_word)
+            if node is None:
+                return []
+            steps.append(_Step(words[depth], node, typo, next_word if typo else None))
+
+        node = steps[-1].node if steps else self.trie.root
+        path = tuple(step.node.word_id for step in steps)
+        if partial is not None:
+            completions = node.children_with_prefix(partial, self.trie.vocabulary)
+            if completions:
+                return self.trie.get_spans(*self.trie.top_of_completions(path, completions))
+            node, _ = self.trie.step(node, partial)
+            if node is None:
+                return []
+            path += (node.word_id,)
+        if not path:
+            return []
+        keys, offsets = self.trie.top_completions(node, path)
+        return self.trie.get_spans(keys, offsets)
+
+    @staticmethod
+    def _is_valid(step: _Step, words: List[str], depth: int) -> bool:
+        """Check whether a cached step still applies to the word at the same depth of a new prompt.
+
+        Args:
+            step (_Step): The cached step.
+            words (List[str]): The words of the new prompt.
+            depth (int): The depth of the step.
+
+        Returns:
+            bool: Whether the step can be reused.
+        """
+        if step.word != words[depth]:
+            return False
+        next_word = words[depth + 1] if depth + 1 < len(words) else None
+        return not step.typo or step.lookahead == next_word
@@ -0,0 +1,484 @@
+import heapq
+import time
+from array import array
+from itertools import chain, islice
+from bisect import bisect_left, bisect_right
+from data_structure.popularity import Popularity
+from data_structure.postings import pack_posting, unpack_posting
+from text_processor.normalization import DEFAULT_NORMALIZER, TextNormalizer
+from text_processor.string_matcher import StringMatcher
+from text_processor.typo_index import TypoIndex
+from utils.consts import INVALID_SCORE, MAX_SUGGESTIONS
+from utils.metrics import Metrics
+from typing import Dict, List, Optional, Tuple
+
+
+SENTINEL: int = 0           # token id that ends every line
+SCAN_THRESHOLD: int = 64    # ranges up to this size are narrowed with the LCP array instead of binary search
+
+
+class SuffixArrayIndex:
+    """A word-level suffix array over the whole corpus, searchable through the same interface as `WordTrie`.
+
+    Every line is stored once as a run of integer token ids followed by a sentinel, so memory grows linearly
+    with the corpus instead of with the square of the line length. The suffix array sorts all word positions
+    by the token sequence that starts there, and the LCP array holds the number of leading tokens each suffix
+    shares with the one before it. A prompt of `m` words selects a contiguous range of the suffix array after
+    narrowing it once per word. The arrays are (re)built lazily on the first search after an insertion or a
+    removal.
+
+    Attributes:
+        max_matches (int): The maximum number of matches to return.
+        matcher (StringMatcher): An instance of StringMatcher for handling typos.
+        files (List[Optional[str]]): The interned file names, indexed by file id. Removed files leave `None` behind.
+        file_ids (Dict[str, int]): A dictionary mapping file names to their interned ids.
+        typo_index (TypoIndex): The deletion-neighborhood index of the vocabulary.
+        word_ids (Dict[str, int]): A dictionary mapping every word to its token id.
+        tokens (array): The token ids of the corpus, one sentinel after every line.
+        token_offsets (array): The character offset of every token in its line.
+        token_lines (array): The line id of every token.
+        line_keys (array): The posting key of every line id.
+        suffix_array (array): The word positions sorted by the token sequence starting there.
+        lcp (array): The number of leading tokens each suffix shares with the previous one in `suffix_array`.
+        metrics (Optional[Metrics]): Accepted for interface parity with `WordTrie`; the index records nothing.
+        normalizer (TextNormalizer): The normalization policy of both the inserted sentences and the prompts.
+        popularity (Popularity): How common every line is and how often it was picked, which orders the matches.
+    """
+    def __init__(self, max_matches: int = MAX_SUGGESTIONS, normalizer: TextNormalizer = DEFAULT_NORMALIZER) -> None:
+        """Initialize an empty suffix array index.
+
+        Args:
+            max_matches (int, optional): The maximum number of matches to return. Defaults to MAX_SUGGESTIONS.
+            normalizer (TextNormalizer, optional): The normalization policy. Defaults to DEFAULT_NORMALIZER.
+        """
+        self.max_matches: int = max_matches
+        self.matcher: StringMatcher = StringMatcher()
+        self.files: List[Optional[str]] = []
+        self.file_ids: Dict[str, int] = {}
+        self.typo_index: TypoIndex = TypoIndex()
+        self.word_ids: Dict[str, int] = {}
+        self.tokens: array = array('I')
+        self.token_offsets: array = array('I')
+        self.token_lines: array = array('I')
+        self.line_keys: array = array('Q')
+        self.suffix_array: array = array('I')
+        self.lcp: array = array('I')
+        self.metrics: Optional[Metrics] = None
+        self.normalizer: TextNormalizer = normalizer
+        self.popularity: Popularity = Popularity()
+        self._dirty: bool = False
+        self._keys_ascending: bool = True
+        self._sorted_words: Optional[List[str]] = None
+
+    def intern_file(self, file_name: str) -> int:
+        """Return the id of a file name, assigning the next free id on first use.
+
+        Args:
+            file_name (str): The name of the file.
+
+        Returns:
+            int: The interned id of the file.
+        """
+        file_id = self.file_ids.get(file_name)
+        if file_id is None:
+            file_id = len(self.files)
+            self.files.append(file_name)
+            self.file_ids[file_name] = file_id
+        return file_id
+
+    def insert_sentence(self, sentence: str, file_name: str, line_number: int) -> None:
+        """Append a sentence to the corpus, associating it with a file name and line number.
+
+        Args:
+            sentence (str): The sentence to insert.
+            file_name (str): The name of the file where the sentence is located.
+            line_number (int): The line number where the sentence is located in the file.
+        """
+        self.insert_words(*self.normalizer.split_words(sentence), file_name, line_number)
+
+    def insert_words(self, words: List[str], offsets: List[int], file_name: str, line_number: int) -> None:
+        """Append an already normalized sentence, as returned by `TextNormalizer.split_words`.
+
+        Args:
+            words (List[str]): The normalized words of the sentence.
+            offsets (List[int]): The character offset in the line where each word starts.
+            file_name (str): The name of the file where the sentence is located.
+            line_number (int): The line number where the sentence is located in the file.
+        """
+        line_id = len(self.line_keys)
+        key = pack_posting(self.intern_file(file_name), line_number)
+        if self.line_keys and key <= self.line_keys[-1]:
+            self._keys_ascending = False
+        self.line_keys.append(key)
+        self.popularity.add_line(key, words)
+        for word in words:
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                word_id = self.word_ids[word] = len(self.word_ids) + 1
+                self.typo_index.add(word)
+                self._sorted_words = None
+            self.tokens.append(word_id)
+            self.token_lines.append(line_id)
+        self.token_offsets.extend(offsets)
+        self.tokens.append(SENTINEL)
+        self.token_lines.append(line_id)
+        self.token_offsets.append(0)  # never read: suffixes starting at a sentinel are dropped from the suffix array
+        self._dirty = True
+
+    def search(self, sentence: str, prefix: bool = False) -> List[Tuple[str, int]]:
+        """Search for a sentence in the corpus, allowing for one character typo per word.
+
+        Args:
+            sentence (str): The sentence to search for.
+            prefix (bool, optional): Whether the last word may be incomplete, as in `WordTrie.search`.
+                Defaults to False.
+
+        Returns:
+            List[Tuple[str, int]]: A list of tuples where each tuple contains the file name and line number of matching sentences,
+                the most popular first and ordered by file and line among equally popular ones.
+        """
+        return [(file_name, line_number) for file_name, line_number, _ in self.search_spans(sentence, prefix)]
+
+    def search_spans(self, sentence: str, prefix: bool = False) -> List[Tuple[str, int, int]]:
+        """Search for a sentence in the corpus like `search`, and report where each match starts in its line.
+
+        A word that is not in the vocabulary, or that would leave no match, is replaced by its best typo
+        candidate that keeps the next word matchable, as `WordTrie.search` does. An incomplete last word
+        selects one range of the suffix array per indexed word it is a prefix of.
+
+        Args:
+            sentence (str): The sentence to search for.
+            prefix (bool, optional): Whether the last word may be incomplete, as in `WordTrie.search`.
+                Defaults to False.
+
+        Returns:
+            List[Tuple[str, int, int]]: A list of tuples of file name, line number and the character offset in the
+                line where the match starts, in the order of `search`.
+        """
+        self._build()
+        words = self.normalizer.normalize(sentence).split()
+        partial = words.pop() if prefix and words and not sentence[-1].isspace() else None
+        if not words and partial is None:
+            return []
+        walked = self._narrow_words(words, 0, len(self.suffix_array))
+        if walked is None:
+            return []
+        ranges = [walked]
+        if partial is not None:
+            ranges = [(low, high) for low, high in (self._narrow(*walked, len(words), self.word_ids[word])
+                                                    for word in self._words_with_prefix(partial)) if low < high]
+            if not ranges:
+                # No word starts with it, so it is matched as a whole word.
+                narrowed = self._narrow_words([partial], *walked, len(words))
+                if narrowed is None:
+                    return []
+                ranges = [narrowed]
+
+        if self._keys_ascending and self.popularity.is_uniform():
+            # Lines were appended in key order, so positions in text order visit lines in result order too.
+            first_positions: Dict[int, int] = {}
+            for position in sorted(chain.from_iterable(self.suffix_array[low:high] for low, high in ranges)):
+                line_id = self.token_lines[position]
+                if line_id not in first_positions:
+                    if len(first_positions) == self.max_matches:
+                        break
+                    first_positions[line_id] = position
+        else:
+            first_positions = self._first_positions(ranges)
+
+        line_ids = sorted(first_positions, key=self.line_keys.__getitem__)
+        keys, positions = self.popularity.top([self.line_keys[line_id] for line_id in line_ids],
+                                              [first_positions[line_id] for line_id in line_ids], self.max_matches)
+        results = []
+        for key, position in zip(keys, positions):
+            file_id, line_number = unpack_posting(key)
+            results.append((self.files[file_id], line_number, self.token_offsets[position]))
+        return results
+
+    def record_click(self, file_name: str, line_number: int, timestamp: Optional[float] = None) -> bool:
+        """Record that a line was picked as a suggestion, as `WordTrie.record_click` does."""
+        file_id = self.file_ids.get(file_name)
+        if file_id is None:
+            return False
+        self.popularity.record_click(pack_posting(file_id, line_number), timestamp)
+        return True
+
+    def popularity_of(self, file_name: str, line_number: int) -> float:
+        """Return the popularity of a line, as `WordTrie.popularity_of` does."""
+        file_id = self.file_ids.get(file_name)
+        return 0.0 if file_id is None else self.popularity.weight(pack_posting(file_id, line_number))
+
+    def materialize(self) -> bool:
+        """Match `WordTrie.materialize`; the index is always mutable, so there is nothing to copy."""
+        return False
+
+    def search_ranked(self, sentence: str) -> List[Tuple[int, str, int, int]]:
+        """Search for the best scoring matches of a sentence, allowing for one character typo across the sentence.
+
+        The sentence itself and every variant with one word replaced by an indexed word one typo away are
+        scored as `WordTrie.search_ranked` scores its paths, and each variant that can still match selects its
+        range of the suffix array. A line matched by several variants keeps its best score.
+
+        Args:
+            sentence (str): The sentence to search for.
+
+        Returns:
+            List[Tuple[int, str, int, int]]: Up to `max_matches` tuples of score, file name, line number and the
+                character offset in the line where the match starts, ordered by descending score, then by
+                descending popularity and then by file and line.
+        """
+        self._build()
+        words = self.normalizer.normalize(sentence).split()
+        if not words:
+            return []
+
+        prompt = " ".join(words)
+        variants = {tuple(words)}
+        for i, word in enumerate(words):
+            for candidate in self.typo_index.candidates(word):
+                variants.add(tuple(words[:i]) + (candidate,) + tuple(words[i + 1:]))
+
+        best: Dict[int, Tuple[int, int]] = {}  # the best score and the first position of every matched line
+        for variant in variants:
+            score = self.matcher.calculate_score(prompt, " ".join(variant))
+            word_ids = [self.word_ids.get(word) for word in variant]
+            if score <= INVALID_SCORE or None in word_ids:
+                continue
+            low, high = 0, len(self.suffix_array)
+            for depth, word_id in enumerate(word_ids):
+                low, high = self._narrow(low, high, depth, word_id)
+                if low == high:
+                    break
+            for line_id, position in self._first_positions([(low, high)]).items():
+                if line_id not in best or score > best[line_id][0]:
+                    best[line_id] = (score, position)
+
+        now = time.time()
+        weight = self.popularity.weight
+        line_keys = self.line_keys
+        chosen = heapq.nsmallest(self.max_matches, best, key=lambda line_id: (
+            -best[line_id][0], -weight(line_keys[line_id], now), line_keys[line_id]))
+        results = []
+        for line_id in chosen:
+            score, position = best[line_id]
+            file_id, line_number = unpack_posting(line_keys[line_id])
+            results.append((score, self.files[file_id], line_number, self.token_offsets[position]))
+        return results
+
+    def remove_file(self, file_name: str) -> None:
+        """Remove every line of a file.
+
+        The token arrays are compacted without the lines of the file, and the suffix array is rebuilt on the
+        next search. The id of the file is retired and never reused.
+
+        Args:
+            file_name (str): The name of the file to remove.
+        """
+        file_id = self.file_ids.pop(file_name, None)
+        if file_id is None:
+            return
+        self.files[file_id] = None
+        low, high = pack_posting(file_id, 0), pack_posting(file_id + 1, 0)
+        self.popularity.remove_range(low, high)
+
+        new_line_ids = []
+        line_keys = array('Q')
+        for key in self.line_keys:
+            if low <= key < high:
+                new_line_ids.append(None)
+            else:
+                new_line_ids.append(len(line_keys))
+                line_keys.append(key)
+        tokens, token_offsets, token_lines = array('I'), array('I'), array('I')
+        for token, offset, line_id in zip(self.tokens, self.token_offsets, self.token_lines):
+            line_id = new_line_ids[line_id]
+            if line_id is not None:
+                tokens.append(token)
+                token_offsets.append(offset)
+                token_lines.append(line_id)
+        self.tokens, self.token_offsets, self.token_lines, self.line_keys = tokens, token_offsets, token_lines, line_keys
+        self._dirty = True
+
+    def _first_positions(self, ranges: List[Tuple[int, int]]) -> Dict[int, int]:
+        """Map every line with a suffix in some ranges of the suffix array to the first position of those suffixes.
+
+        Positions grow with the offset within a line, so the first occurrence of the match in every line is kept.
+
+        Args:
+            ranges (List[Tuple[int, int]]): The start and end of every range in the suffix array.
+
+        Returns:
+            Dict[int, int]: A dictionary mapping line ids to token positions.
+        """
+        first_positions: Dict[int, int] = {}
+        token_lines = self.token_lines
+        for low, high in ranges:
+            for position in self.suffix_array[low:high]:
+                line_id = token_lines[position]
+                if position < first_positions.get(line_id, len(self.tokens)):
+                    first_positions[line_id] = position
+        return first_positions
+
+    def _narrow_words(self, words: List[str], low: int, high: int, depth: int = 0) -> Optional[Tuple[int, int]]:
+        """Narrow a range of suffixes sharing `depth` leading tokens to those continuing with some words.
+
+        A word that is not in the vocabulary, or that would leave no match, is replaced by its best typo
+        candidate that keeps the next word matchable.
+
+        Args:
+            words (List[str]): The normalized words that must follow.
+            low (int): The start of the range in the suffix array.
+            high (int): The end of the range in the suffix array.
+            depth (int, optional): The number of leading tokens all suffixes of the range share. Defaults to 0.
+
+        Returns:
+            Optional[Tuple[int, int]]: The narrowed range, or `None` if no suffix continues with the words or
+                a typo of them.
+        """
+        for i, word in enumerate(words):
+            word_id = self.word_ids.get(word)
+            narrowed = self._narrow(low, high, depth, word_id) if word_id is not None else (0, 0)
+            if narrowed[0] == narrowed[1]:
+                next_id = self.word_ids.get(words[i + 1]) if i + 1 < len(words) else None
+                for candidate in self.typo_index.candidates(word):
+                    narrowed = self._narrow(low, high, depth, self.word_ids[candidate])
+                    if narrowed[0] == narrowed[1]:
+                        continue
+                    if i + 1 == len(words):
+                        break
+                    if next_id is not None:
+                        next_low, next_high = self._narrow(*narrowed, depth + 1, next_id)
+                        if next_low < next_high:
+                            break
+                else:
+                    return None
+            low, high = narrowed
+            depth += 1
+        return low, high
+
+    def _words_with_prefix(self, prefix: str) -> List[str]:
+        """Return the indexed words that start with a prefix, in sorted order."""
+        words = self._sorted_words
+        if words is None:
+            words = self._sorted_words = sorted(self.word_ids)
+        matches = []
+        for word in islice(words, bisect_left(words, prefix), None):
+            if not word.startswith(prefix):
+                break
+            matches.append(word)
+        return matches
+
+    def _narrow(self, low: int, high: int, depth: int, word_id: int) -> Tuple[int, int]:
+        """Narrow a range of suffixes sharing `depth` leading tokens to those followed by a given token.
+
+        Args:
+            low (int): The start of the range in the suffix array.
+            high (int): The end of the range in the suffix array.
+            depth (int): The number of leading tokens all suffixes of the range share.
+            word_id (int): The token that must follow.
+
+        Returns:
+            Tuple[int, int]: The narrowed range, empty if no suffix continues with the token.
+        """
+        tokens = self.tokens
+
+        def token_at(position: int) -> int:
+            return tokens[position + depth]
+
+        start = bisect_left(self.suffix_array, word_id, low, high, key=token_at)
+        if start == high or token_at(self.suffix_array[start]) != word_id:
+            return start, start
+        if high - start > SCAN_THRESHOLD:
+            return start, bisect_right(self.suffix_array, word_id, start, high, key=token_at)
+
+        # Suffixes keep the token as long as they share more than `depth` tokens with their predecessor.
+        end = start + 1
+        while end < high and self.lcp[end] > depth:
+            end += 1
+        return start, end
+
+    def _build(self) -> None:
+        """Sort the word positions and compute the LCP array, if anything was inserted since the last build."""
+        if not self._dirty:
+            return
+        self._dirty = False
+        suffix_array = _sort_suffixes(self.tokens)
+        lcp = _longest_common_prefixes(self.tokens, suffix_array)
+
+        # Suffixes starting at a sentinel never match a prompt; drop them and fold their LCPs into the next entry.
+        kept_positions = array('I')
+        kept_lcp = array('I')
+        shared: Optional[int] = None
+        for position, common in zip(suffix_array, lcp):
+            shared = common if shared is None else min(shared, common)
+            if self.tokens[position] != SENTINEL:
+                kept_positions.append(position)
+                kept_lcp.append(shared if len(kept_positions) > 1 else 0)
+                shared = None
+        self.suffix_array = kept_positions
+        self.lcp = kept_lcp
+
+
+def _sort_suffixes(tokens: array) -> List[int]:
+    """Sort all suffixes of a token sequence by prefix doubling.
+
+    Each round sorts by the rank pair of a position and the position `step` tokens later, which orders the
+    suffixes by their first `2 * step` tokens, until every rank is distinct.
+
+    Args:
+        tokens (array): The token sequence.
+
+    Returns:
+        List[int]: The start positions of the suffixes in sorted order.
+    """
+    size = len(tokens)
+    if size == 0:
+        return []
+    ranks = list(tokens)
+    suffix_array = list(range(size))
+    step = 1
+    while True:
+        base = max(ranks) + 2
+        keys = [ranks[i] * base + (ranks[i + step] + 1 if i + step < size else 0) for i in range(size)]
+        suffix_array.sort(key=keys.__getitem__)
+        rank = 0
+        previous = keys[suffix_array[0]]
+        for position in suffix_array:
+            if keys[position] != previous:
+                rank += 1
+                previous = keys[position]
+            ranks[position] = rank
+        if rank == size - 1:
+            return suffix_array
+        step <<= 1
+
+
+def _longest_common_prefixes(tokens: array, suffix_array: List[int]) -> List[int]:
+    """Compute the LCP array of a suffix array with Kasai's algorithm.
+
+    Args:
+        tokens (array): The token sequence.
+        suffix_array (List[int]): The sorted suffix start positions.
+
+    Returns:
+        List[int]: For every entry, the number of leading tokens shared with the previous entry (0 for the first).
+    """
+    size = len(tokens)
+    ranks = [0] * size
+    for rank, position in enumerate(suffix_array):
+        ranks[position] = rank
+    lcp = [0] * size
+    common = 0
+    for position in range(size):
+        rank = ranks[position]
+        if rank == 0:
+            common = 0
+            continue
+        previous = suffix_array[rank - 1]
+        while (position + common < size and previous + common < size and
+               tokens[position + common] == tokens[previous + common]):
+            common += 1
+        lcp[rank] = common
+        if common:
+            common -= 1
+    return lcp
@@ -0,0 +1,436 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from data_structure.line_index import LineIndex
+from data_structure.vocabulary import SortedVocabulary
+from data_structure.word_trie import WordTrie
+from text_processor.normalization import TextNormalizer
+from utils.consts import MAX_SUGGESTIONS
+
+
+SNAPSHOT_MAGIC: bytes = b'WTRI'
+SNAPSHOT_VERSION: int = 3
+HEADER = struct.Struct('<4sII')   # magic, version, metadata length
+NO_WORD: int = 0xFFFFFFFF         # word id of the root node
+ALIGNMENT: int = 8
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be used: it is corrupt, of another version, or out of date."""
+
+
+class TrieSnapshot:
+    """A read-only view over the flattened arrays of a saved trie, backed by a memory map.
+
+    Nodes are stored in breadth-first order, so the children of every node occupy a contiguous range of
+    node ids. Children are sorted by word id, and word ids follow the sorted order of the words themselves,
+    which lets both lookups run as binary searches directly on the mapped memory. The word table serves as
+    the sorted vocabulary of the loaded trie, with the interface of `SortedVocabulary`.
+
+    Attributes:
+        meta (dict): The metadata stored in the snapshot header.
+    """
+    def __init__(self, buffer: mmap.mmap, meta: dict) -> None:
+        """Initialize the snapshot view over a mapped snapshot file.
+
+        Args:
+            buffer (mmap.mmap): The memory map of the snapshot file.
+            meta (dict): The decoded snapshot metadata.
+        """
+        self._buffer = buffer
+        self.meta: dict = meta
+        view = memoryview(buffer)
+        sections = {}
+        for name, (offset, length, typecode) in meta['sections'].items():
+            sections[name] = view[offset:offset + length].cast(typecode)
+        self._word_base: int = meta['sections']['word_bytes'][0]
+        self._word_offsets = sections['word_offsets']
+        self.node_word = sections['node_word']
+        self.node_child_start = sections['node_child_start']
+        self.node_child_count = sections['node_child_count']
+        self.node_posting_start = sections['node_posting_start']
+        self.node_posting_count = sections['node_posting_count']
+        self.postings = sections['postings']
+        self.posting_offsets = sections['posting_offsets']
+        self.line_offsets = sections['line_offsets']
+        self.line_keys = sections['line_keys']
+        self.line_hashes = sections['line_hashes']
+        self.frequent_keys = sections['frequent_keys']
+        self.frequent_counts = sections['frequent_counts']
+
+    def word(self, word_id: int) -> str:
+        """Decode the word with the given id.
+
+        Args:
+            word_id (int): The id of the word.
+
+        Returns:
+            str: The word.
+        """
+        return self._word_bytes(word_id).decode('utf-8')
+
+    def iter_words(self) -> Iterator[str]:
+        """Iterate over all words of the snapshot in sorted order.
+
+        Returns:
+            Iterator[str]: An iterator over the words.
+        """
+        for word_id in range(len(self._word_offsets) - 1):
+            yield self.word(word_id)
+
+    def __len__(self) -> int:
+        return len(self._word_offsets) - 1
+
+    def add(self, word: str) -> int:
+        raise TypeError("A trie loaded from a snapshot is read-only")
+
+    def id_of(self, word: str) -> Optional[int]:
+        """Find the id of a word by binary search over the sorted word table.
+
+        Args:
+            word (str): The word to look up.
+
+        Returns:
+            Optional[int]: The id of the word, or `None` if the snapshot does not contain it.
+        """
+        encoded = word.encode('utf-8')
+        low = self._bisect_words(encoded)
+        if low < len(self._word_offsets) - 1 and self._word_bytes(low) == encoded:
+            return low
+        return None
+
+    def id_range(self, prefix: str) -> Tuple[int, int]:
+        """Find the ids of the words starting with a prefix, which are contiguous in the sorted word table.
+
+        Args:
+            prefix (str): The prefix of the words.
+
+        Returns:
+            Tuple[int, int]: The first id and the id after the last one of the matching words.
+        """
+        encoded = prefix.encode('utf-8')
+        low = self._bisect_words(encoded)
+        return low, self._bisect_words(encoded, low, prefix_length=len(encoded))
+
+    def _bisect_words(self, encoded: bytes, low: int = 0, prefix_length: Optional[int] = None) -> int:
+        """Binary search the word table from `low` for the first word not below `encoded`, or with `prefix_length`,
+        for the first word whose first `prefix_length` bytes sort after `encoded`."""
+        high = len(self._word_offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            word = self._word_bytes(middle)
+            if word < encoded if prefix_length is None else word[:prefix_length] <= encoded:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def remap_word_ids(self, mapping: Sequence[int]) -> None:
+        """Translate the word ids of all nodes into those of another vocabulary, in memory.
+
+        The mapping must preserve the order of the ids, as between two sorted vocabularies, so the children
+        of every node stay sorted. The word table keeps the old ids, so the snapshot can no longer serve
+        as the vocabulary of its trie.
+
+        Args:
+            mapping (Sequence[int]): The new id of every word id of the snapshot.
+        """
+        self.node_word = array('I', [word_id if word_id == NO_WORD else mapping[word_id] for word_id in self.node_word])
+
+    def _word_bytes(self, word_id: int) -> bytes:
+        start = self._word_base + self._word_offsets[word_id]
+        return self._buffer[start:self._word_base + self._word_offsets[word_id + 1]]
+
+
+class MappedNode:
+    """A lightweight, read-only handle on one node of a `TrieSnapshot`.
+
+    It offers the same lookup interface as `Node`, so `WordTrie` searches a snapshot without materializing it.
+    Handles are created on demand while searching and hold nothing but the node id.
+    """
+    __slots__ = ('snapshot', 'index')
+
+    def __init__(self, snapshot: TrieSnapshot, index: int) -> None:
+        """Initialize a handle on a snapshot node.
+
+        Args:
+            snapshot (TrieSnapshot): The snapshot that contains the node.
+            index (int): The id of the node.
+        """
+        self.snapshot = snapshot
+        self.index = index
+
+    @property
+    def word_id(self) -> Optional[int]:
+        """Optional[int]: The id of the word associated with this node, or `None` for the root."""
+        word_id = self.snapshot.node_word[self.index]
+        return None if word_id == NO_WORD else word_id
+
+    def get_child(self, word_id: int) -> Optional['MappedNode']:
+        """Return the child node for a word.
+
+        Args:
+            word_id (int): The id of the word of the child node.
+
+        Returns:
+            Optional[MappedNode]: The child node, or `None` if there is no child for the word.
+        """
+        snapshot = self.snapshot
+        start = snapshot.node_child_start[self.index]
+        end = start + snapshot.node_child_count[self.index]
+        position = bisect_left(snapshot.node_word, word_id, start, end)
+        if position < end and snapshot.node_word[position] == word_id:
+            return MappedNode(snapshot, position)
+        return None
+
+    def children_with_prefix(self, prefix: str, vocabulary: SortedVocabulary) -> List['MappedNode']:
+        """Return the child nodes whose word starts with a prefix.
+
+        Args:
+            prefix (str): The prefix of the words.
+            vocabulary (SortedVocabulary): The sorted vocabulary of the node ids, which gives the words with the
+                prefix a contiguous range of ids.
+
+        Returns:
+            List[MappedNode]: The matching child nodes in word order.
+        """
+        snapshot = self.snapshot
+        low, high = vocabulary.id_range(prefix)
+        start = snapshot.node_child_start[self.index]
+        end = start + snapshot.node_child_count[self.index]
+        first = bisect_left(snapshot.node_word, low, start, end)
+        last = bisect_left(snapshot.node_word, high, first, end)
+        return [MappedNode(snapshot, position) for position in range(first, last)]
+
+    def iter_children(self) -> Iterator['MappedNode']:
+        """Iterate over the child nodes in word order.
+
+        Returns:
+            Iterator[MappedNode]: An iterator over the child nodes.
+        """
+        start = self.snapshot.node_child_start[self.index]
+        for position in range(start, start + self.snapshot.node_child_count[self.index]):
+            yield MappedNode(self.snapshot, position)
+
+    @property
+    def postings(self) -> memoryview:
+        """memoryview: The sorted posting keys of this node, read directly from the mapped file."""
+        start = self.snapshot.node_posting_start[self.index]
+        return self.snapshot.postings[start:start + self.snapshot.node_posting_count[self.index]]
+
+    @property
+    def offsets(self) -> memoryview:
+        """memoryview: The character offsets parallel to `postings`, read directly from the mapped file."""
+        start = self.snapshot.node_posting_start[self.index]
+        return self.snapshot.posting_offsets[start:start + self.snapshot.node_posting_count[self.index]]
+
+    def add_child(self, word_id: int) -> 'MappedNode':
+        raise TypeError("A trie loaded from a snapshot is read-only")
+
+    def add_posting(self, key: int, offset: int = 0) -> None:
+        raise TypeError("A trie loaded from a snapshot is read-only")
+
+    def remove_child(self, word_id: int) -> None:
+        raise TypeError("A trie loaded from a snapshot is read-only")
+
+    def remove_postings(self, low: int, high: int) -> bool:
+        raise TypeError("A trie loaded from a snapshot is read-only")
+
+
+def save_snapshot(trie: WordTrie, line_index: LineIndex, path: str) -> None:
+    """Write a trie and the line offsets of its files to a snapshot file.
+
+    The snapshot is written to a temporary file first and moved into place, so readers never see a partial file.
+    Files deleted since they were indexed are saved without a size and modification time, so they count as
+    changed when the snapshot is loaded.
+
+    Args:
+        trie (WordTrie): The trie to save.
+        line_index (LineIndex): The line offsets of the files indexed in the trie.
+        path (str): The path of the snapshot file.
+    """
+    # Only the words still on some path are saved, renumbered in sorted order.
+    used_ids = set()
+    stack = [trie.root]
+    while stack:
+        for child in stack.pop().iter_children():
+            used_ids.add(child.word_id)
+            stack.append(child)
+    words = sorted(map(trie.vocabulary.word, used_ids))
+    word_ids = {trie.vocabulary.id_of(word): word_id for word_id, word in enumerate(words)}
+
+    word_bytes = bytearray()
+    word_offsets = array('Q', [0])
+    for word in words:
+        word_bytes += word.encode('utf-8')
+        word_offsets.append(len(word_bytes))
+
+    node_word = array('I', [NO_WORD])
+    node_child_start = array('I')
+    node_child_count = array('I')
+    node_posting_start = array('Q')
+    node_posting_count = array('I')
+    postings = array('Q')
+    posting_offsets = array('I')
+    queue = deque([trie.root])
+    while queue:
+        node = queue.popleft()
+        children = sorted(node.iter_children(), key=lambda child: word_ids[child.word_id])
+        node_child_start.append(len(node_word))
+        node_child_count.append(len(children))
+        for child in children:
+            node_word.append(word_ids[child.word_id])
+            queue.append(child)
+        node_postings = node.postings
+        node_posting_start.append(len(postings))
+        node_posting_count.append(len(node_postings))
+        postings.extend(node_postings)
+        posting_offsets.extend(node.offsets)
+
+    files = []
+    line_offsets = array('Q')
+    for file_name in trie.files:
+        if file_name is None:
+            files.append(None)
+            continue
+        try:
+            stat = os.stat(file_name)
+            mtime_ns, size = stat.st_mtime_ns, stat.st_size
+        except OSError:
+            mtime_ns = size = None    # gone since it was indexed, so the snapshot is stale on load
+        offsets = line_index.offsets.get(file_name, array('Q'))
+        files.append({'path': file_name, 'mtime_ns': mtime_ns, 'size': size,
+                      'line_offsets': [len(line_offsets), len(offsets)]})
+        line_offsets.extend(offsets)
+    line_keys, line_hashes, frequent_keys, frequent_counts = trie.popularity.export()
+
+    sections = [
+        ('word_bytes', bytes(word_bytes), 'B'),
+        ('word_offsets', word_offsets, 'Q'),
+        ('node_word', node_word, 'I'),
+        ('node_child_start', node_child_start, 'I'),
+        ('node_child_count', node_child_count, 'I'),
+        ('node_posting_start', node_posting_start, 'Q'),
+        ('node_posting_count', node_posting_count, 'I'),
+        ('postings', postings, 'Q'),
+        ('posting_offsets', posting_offsets, 'I'),
+        ('line_offsets', line_offsets, 'Q'),
+        ('line_keys', line_keys, 'Q'),
+        ('line_hashes', line_hashes, 'Q'),
+        ('frequent_keys', frequent_keys, 'Q'),
+        ('frequent_counts', frequent_counts, 'Q'),
+    ]
+    meta = {'byteorder': sys.byteorder, 'files': files, 'normalizer': trie.normalizer.policy(), 'sections': {}}
+    blobs = [bytes(data) for _, data, _ in sections]
+
+    # Section offsets depend on the metadata length, so lay the sections out once with a generous
+    # placeholder and then fix the header size.
+    meta_length = len(json.dumps(meta)) + 64 * len(sections) + 64
+    offset = _align(HEADER.size + meta_length)
+    for (name, _, typecode), blob in zip(sections, blobs):
+        meta['sections'][name] = [offset, len(blob), typecode]
+        offset = _align(offset + len(blob))
+    encoded_meta = json.dumps(meta).encode('utf-8').ljust(meta_length)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as file:
+        file.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, meta_length))
+        file.write(encoded_meta)
+        for name, blob in zip(meta['sections'], blobs):
+            file.seek(meta['sections'][name][0])
+            file.write(blob)
+    os.replace(temporary_path, path)
+
+
+def load_snapshot(path: str, expected_files: Optional[Iterable[str]] = None,
+                  max_matches: int = MAX_SUGGESTIONS) -> Tuple[WordTrie, LineIndex]:
+    """Map a snapshot file and wrap it in a read-only trie and line index.
+
+    Args:
+        path (str): The path of the snapshot file.
+        expected_files (Optional[Iterable[str]], optional): The files the index is expected to cover. When given,
+            the snapshot is rejected unless it covers exactly these files with unchanged sizes and modification
+            times. Defaults to None.
+        max_matches (int, optional): The maximum number of matches the trie returns. Defaults to MAX_SUGGESTIONS.
+
+    Returns:
+        Tuple[WordTrie, LineIndex]: The trie and the line index stored in the snapshot.
+
+    Raises:
+        OSError: If the snapshot file cannot be opened.
+        SnapshotError: If the snapshot is corrupt, of another version, or out of date.
+    """
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(buffer) < HEADER.size:
+        raise SnapshotError(f"{path} is not a trie snapshot")
+    magic, version, meta_length = HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError(f"{path} is not a trie snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"{path} has snapshot version {version}, expected {SNAPSHOT_VERSION}")
+    meta = json.loads(buffer[HEADER.size:HEADER.size + meta_length])
+    if meta['byteorder'] != sys.byteorder:
+        raise SnapshotError(f"{path} was written on a {meta['byteorder']}-endian machine")
+    if expected_files is not None:
+        _validate_files(meta['files'], expected_files)
+
+    snapshot = TrieSnapshot(buffer, meta)
+    # Snapshots written before the normalization policy was recorded used the default one.
+    trie = WordTrie(root=MappedNode(snapshot, 0), max_matches=max_matches,
+                    normalizer=TextNormalizer(**meta.get('normalizer', {})), vocabulary=snapshot)
+    trie.typo_index.add_source(snapshot.iter_words)
+    trie.popularity.add_stored(snapshot.line_keys, snapshot.line_hashes,
+                               dict(zip(snapshot.frequent_keys, snapshot.frequent_counts)))
+    line_index = LineIndex()
+    for file in meta['files']:
+        if file is None:
+            trie.files.append(None)
+            continue
+        trie.intern_file(file['path'])
+        start, count = file['line_offsets']
+        if count:
+            line_index.add_file(file['path'], snapshot.line_offsets[start:start + count])
+    return trie, line_index
+
+
+def snapshot_file_states(trie: WordTrie) -> Dict[str, Tuple[int, int]]:
+    """Return the size and modification time of every file of a loaded snapshot when the snapshot was saved.
+
+    The states have the form `TextDatasetProcessor.file_states` records, so a processor serving the snapshot
+    can sync the files that changed since.
+
+    Args:
+        trie (WordTrie): A trie returned by `load_snapshot`.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: A dictionary mapping every file name to its size and modification time.
+    """
+    return {file['path']: (file['size'], file['mtime_ns']) for file in trie.root.snapshot.meta['files']
+            if file is not None}
+
+
+def _validate_files(files: List[Dict], expected_files: Iterable[str]) -> None:
+    expected = set(expected_files)
+    files = [file for file in files if file is not None]
+    indexed = {file['path'] for file in files}
+    if indexed != expected:
+        raise SnapshotError(f"snapshot covers {len(indexed)} files, the dataset has {len(expected)} different ones")
+    for file in files:
+        try:
+            stat = os.stat(file['path'])
+        except OSError as error:
+            raise SnapshotError(f"{file['path']} cannot be read: {error}") from error
+        if stat.st_mtime_ns != file['mtime_ns'] or stat.st_size != file['size']:
+            raise SnapshotError(f"{file['path']} changed since the snapshot was taken")
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
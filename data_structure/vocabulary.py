@@ -0,0 +1,97 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+class Vocabulary:
+    """Maps normalized words to dense integer ids, assigned in order of first appearance.
+
+    Trie edges are keyed by these ids, so every word is stored once however many paths it occurs on, and
+    child lookups hash and compare small integers instead of strings.
+
+    Attributes:
+        words (List[str]): The words, indexed by id.
+        ids (Dict[str, int]): A dictionary mapping every word to its id.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty vocabulary."""
+        self.words: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: str) -> int:
+        """Return the id of a word, assigning the next free id on first use.
+
+        Args:
+            word (str): The word.
+
+        Returns:
+            int: The id of the word.
+        """
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = self.ids[word] = len(self.words)
+            self.words.append(word)
+        return word_id
+
+    def id_of(self, word: str) -> Optional[int]:
+        """Return the id of a word, or `None` if the vocabulary does not contain it."""
+        return self.ids.get(word)
+
+    def word(self, word_id: int) -> str:
+        """Return the word with the given id."""
+        return self.words[word_id]
+
+    def iter_words(self) -> Iterator[str]:
+        """Iterate over the words in id order."""
+        return iter(self.words)
+
+
+class SortedVocabulary:
+    """A read-only vocabulary whose ids follow the sorted order of the words.
+
+    The words starting with a prefix then have a contiguous range of ids, which `id_range` finds by binary
+    search. Snapshots and tries combined from several snapshots use sorted vocabularies.
+
+    Attributes:
+        words (Sequence[str]): The words in sorted order, indexed by id.
+    """
+    def __init__(self, words: Sequence[str]) -> None:
+        """Initialize a vocabulary over sorted words.
+
+        Args:
+            words (Sequence[str]): The words in sorted order.
+        """
+        self.words: Sequence[str] = words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def add(self, word: str) -> int:
+        raise TypeError("A sorted vocabulary is read-only")
+
+    def id_of(self, word: str) -> Optional[int]:
+        """Return the id of a word, or `None` if the vocabulary does not contain it."""
+        word_id = bisect_left(self.words, word)
+        return word_id if word_id < len(self.words) and self.words[word_id] == word else None
+
+    def word(self, word_id: int) -> str:
+        """Return the word with the given id."""
+        return self.words[word_id]
+
+    def iter_words(self) -> Iterator[str]:
+        """Iterate over the words in sorted order."""
+        return iter(self.words)
+
+    def id_range(self, prefix: str) -> Tuple[int, int]:
+        """Find the ids of the words starting with a prefix.
+
+        Args:
+            prefix (str): The prefix of the words.
+
+        Returns:
+            Tuple[int, int]: The first id and the id after the last one of the matching words.
+        """
+        low = bisect_left(self.words, prefix)
+        return low, bisect_right(self.words, prefix, low, key=lambda word: word[:len(prefix)])
@@ -1,8 +1,17 @@
+import heapq
+from itertools import islice
+from time import perf_counter
 from data_structure.node import Node
+from data_structure.popularity import Popularity
+from data_structure.vocabulary import Vocabulary
+from data_structure.postings import contains_posting, pack_posting, union_postings, unpack_posting
+from text_processor.normalization import DEFAULT_NORMALIZER, TextNormalizer
 from text_processor.string_matcher import StringMatcher
-from utils.functions import normalize_text
-from utils.consts import MAX_SUGGESTIONS, Typo
-from typing import List, Tuple
+from text_processor.typo_index import TypoIndex
+from utils.consts import (CANDIDATES_PER_EXPANSION, EDIT_BUDGET, INVALID_SCORE, MAX_EXPANSIONS, MAX_SUGGESTIONS,
+                          MAX_WORD_EDITS, TOP_COMPLETIONS_MIN_POSTINGS)
+from utils.metrics import SIZE_BUCKETS, Metrics
+from typing import Dict, List, Optional, Tuple
 
 
 class WordTrie:
@@ -12,17 +21,42 @@ class WordTrie:
         root (Node): The root node of the trie.
         max_matches (int): The maximum number of matches to return.
         matcher (StringMatcher): An instance of StringMatcher for handling typos.
+        files (List[Optional[str]]): The interned file names, indexed by file id. Removed files leave `None` behind.
+        file_ids (Dict[str, int]): A dictionary mapping file names to their interned ids.
+        vocabulary (Vocabulary): The ids of the words the edges of the trie are keyed by.
+        typo_index (TypoIndex): The deletion-neighborhood index of every word inserted into the trie.
+        generation (int): A counter bumped on every change to the trie, so cached search state can tell it is stale.
+        metrics (Optional[Metrics]): Where searches record stage timings and counters, or `None` to record nothing.
+        normalizer (TextNormalizer): The normalization policy of both the inserted sentences and the prompts.
+        popularity (Popularity): How common every indexed line is and how often it was picked, which orders
+            the matches of a prompt.
     """
-    def __init__(self, root: Node = None, max_matches: int = MAX_SUGGESTIONS):
+    def __init__(self, root: Node = None, max_matches: int = MAX_SUGGESTIONS,
+                 normalizer: TextNormalizer = DEFAULT_NORMALIZER, vocabulary: Optional[Vocabulary] = None):
         """Initialize the WordTrie with a root node and maximum number of matches.
 
         Args:
             root (Node, optional): The root node of the trie. If not provided, a new root node is created.
             max_matches (int, optional): The maximum number of matches to return. Defaults to MAX_SUGGESTIONS.
+            normalizer (TextNormalizer, optional): The normalization policy. Defaults to DEFAULT_NORMALIZER.
+            vocabulary (Optional[Vocabulary], optional): The vocabulary the word ids of `root` come from. If not
+                provided, a new empty vocabulary is created.
         """
         self.root: Node = root or Node()
+        self.vocabulary: Vocabulary = vocabulary if vocabulary is not None else Vocabulary()
         self.max_matches: int = max_matches
         self.matcher: StringMatcher = StringMatcher()
+        self.files: List[Optional[str]] = []
+        self.file_ids: Dict[str, int] = {}
+        self.typo_index: TypoIndex = TypoIndex()
+        self.generation: int = 0
+        self.metrics: Optional[Metrics] = None
+        self.normalizer: TextNormalizer = normalizer
+        self.popularity: Popularity = Popularity()
+        # The most popular matches of paths with many postings, keyed by the word ids of the path, with the
+        # popularity version they were selected at.
+        self._top_completions: Dict[Tuple[int, ...], Tuple[int, Tuple[List[int], List[int]]]] = {}
+        self._top_completions_generation: int = 0
 
     def insert_sentence(self, sentence: str, file_name: str, line_number: int) -> None:
         """Insert a sentence into the trie, associating it with a file name and line number.
@@ -32,96 +66,590 @@ class WordTrie:
             file_name (str): The name of the file where the sentence is located.
             line_number (int): The line number where the sentence is located in the file.
         """
-        words = normalize_text(sentence).split()
-        for i in range(len(words)):
-            self._insert_suffix(words[i:], file_name, line_number)
+        words, offsets = self.normalizer.split_words(sentence)
+        self.insert_words(words, offsets, file_name, line_number)
 
-    def search(self, sentence: str) -> List[Tuple[str, int]]:
+    def insert_words(self, words: List[str], offsets: List[int], file_name: str, line_number: int) -> None:
+        """Insert an already normalized sentence, as returned by `TextNormalizer.split_words`.
+
+        Args:
+            words (List[str]): The normalized words of the sentence.
+            offsets (List[int]): The character offset in the line where each word starts.
+            file_name (str): The name of the file where the sentence is located.
+            line_number (int): The line number where the sentence is located in the file.
+        """
+        key = pack_posting(self.intern_file(file_name), line_number)
+        self.generation += 1
+        id_of = self.vocabulary.id_of
+        word_ids = []
+        for word in words:
+            word_id = id_of(word)
+            if word_id is None:
+                word_id = self.vocabulary.add(word)
+                self.typo_index.add(word)
+            word_ids.append(word_id)
+        self.popularity.add_line(key, words)
+        for i in range(len(word_ids)):
+            self._insert_suffix(word_ids[i:], key, offsets[i])
+
+    def remove_file(self, file_name: str) -> None:
+        """Remove every posting of a file, and the nodes that are left without postings.
+
+        The postings of a node contain those of all its descendants, so only subtrees whose root still
+        holds keys of the file are visited. The id of the file is retired and never reused.
+
+        Args:
+            file_name (str): The name of the file to remove.
+        """
+        file_id = self.file_ids.pop(file_name, None)
+        if file_id is None:
+            return
+        self.files[file_id] = None
+        self.generation += 1
+
+        low, high = pack_posting(file_id, 0), pack_posting(file_id + 1, 0)
+        self.popularity.remove_range(low, high)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            for child in list(node.iter_children()):
+                if child.remove_postings(low, high):
+                    if child.postings:
+                        stack.append(child)
+                    else:
+                        node.remove_child(child.word_id)
+
+    def search(self, sentence: str, prefix: bool = False) -> List[Tuple[str, int]]:
         """Search for a sentence in the trie, allowing for one character typo.
 
         Args:
             sentence (str): The sentence to search for.
+            prefix (bool, optional): Whether the last word may be incomplete. It then matches every word it is a
+                prefix of, unless the sentence ends with whitespace; if no word starts with it, it is matched as a
+                whole word. Defaults to False.
+
+        Returns:
+            List[Tuple[str, int]]: A list of tuples where each tuple contains the file name and line number of matching sentences,
+                the most popular first and ordered by file and line among equally popular ones.
+        """
+        return [(file_name, line_number) for file_name, line_number, _ in self.search_spans(sentence, prefix)]
+
+    def search_spans(self, sentence: str, prefix: bool = False) -> List[Tuple[str, int, int]]:
+        """Search for a sentence in the trie like `search`, and report where each match starts in its line.
+
+        Args:
+            sentence (str): The sentence to search for.
+            prefix (bool, optional): Whether the last word may be incomplete, as in `search`. Defaults to False.
 
         Returns:
-            List[Tuple[str, int]]: A list of tuples where each tuple contains the file name and line number of matching sentences.
+            List[Tuple[str, int, int]]: A list of tuples of file name, line number and the character offset in the
+                line where the match starts, in the order of `search`.
         """
-        words = normalize_text(sentence).split()
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+        words = self.normalizer.normalize(sentence).split()
+        # The partial word is not a key of the trie, so it is left out of the walk and of the typo choice before it.
+        partial = words.pop() if prefix and words and not sentence[-1].isspace() else None
         node = self.root
-        substring = []
-        file_data_intersection = None
+        path = []
+        completions = []
+        if metrics is not None:
+            walk_start = perf_counter()
+            metrics.observe('trie.normalize_seconds', walk_start - start)
 
         for i, word in enumerate(words):
-            if word in node.children:
-                node = node.children[word]
-                substring.append(word)
-                file_data = self._get_file_data(node)
-            else:
-                close_match = None
-                for child_word, child_node in node.children.items():
-                    typo, _ = self.matcher.check_typo(word, child_word)
-                    if typo.value > Typo.MATCH.value:
-                        if (i + 1 < len(words) and words[i + 1] in child_node.children) or (i == len(words) - 1):
-                            close_match = child_node
-                            substring.append(child_word)
-                            break
-                
-                if close_match:
-                    node = close_match
-                    file_data = self._get_file_data(node)
-                else:
-                    return []
-            
-            if file_data_intersection is None:
-                file_data_intersection = file_data
-            else:
-                file_data_intersection = self._intersect_file_data(file_data_intersection, file_data)
-            
-            if not file_data_intersection:
-                return []
-            
-        return list(file_data_intersection)[:self.max_matches]
-    
-    def _get_file_data(self, node: Node) -> List[Tuple[str, int]]:
-        """Retrieve file data from a given node.
-
-        Args:
-            node (Node): The node from which to retrieve file data.
-
-        Returns:
-            List[Tuple[str, int]]: A list of tuples containing file names and line numbers associated with the node.
+            node, _ = self.step(node, word, words[i + 1] if i + 1 < len(words) else None)
+            if node is None:
+                break
+            path.append(node.word_id)
+        if partial is not None and node is not None:
+            completions = node.children_with_prefix(partial, self.vocabulary)
+            if not completions:
+                node, _ = self.step(node, partial)
+                if node is not None:
+                    path.append(node.word_id)
+
+        if metrics is not None:
+            rank_start = perf_counter()
+            metrics.observe('trie.walk_seconds', rank_start - walk_start)
+            metrics.count('trie.searches')
+        if completions:
+            keys, offsets = self.top_of_completions(tuple(path), completions)
+        elif node is None or not path:
+            if metrics is not None:
+                metrics.count('trie.misses')
+            return []
+        else:
+            # Every suffix that reaches a node also passed through its parent, so the postings of the last node
+            # are already the matches of the whole path.
+            keys, offsets = self.top_completions(node, tuple(path))
+        if metrics is not None:
+            resolve_start = perf_counter()
+            metrics.observe('trie.rank_seconds', resolve_start - rank_start)
+            if completions:
+                metrics.observe('trie.prefix_completions', len(completions), SIZE_BUCKETS)
+        spans = self.get_spans(keys, offsets)
+        if metrics is not None:
+            end = perf_counter()
+            metrics.observe('trie.resolve_seconds', end - resolve_start)
+            metrics.observe('trie.search_seconds', end - start)
+        return spans
+
+    def top_completions(self, node: Node, path: Tuple[int, ...]) -> Tuple[List[int], List[int]]:
+        """Select the most popular matches of a path, as ordered by `Popularity.top`.
+
+        The selections of nodes with at least `TOP_COMPLETIONS_MIN_POSTINGS` postings are kept, so common
+        prompts are answered without reading their postings again. A change to the trie drops all of them; a
+        click only drops those of the nodes whose postings hold the clicked line.
+
+        Args:
+            node (Node): The node reached by the path.
+            path (Tuple[int, ...]): The word ids of the path from the root to `node`.
+
+        Returns:
+            Tuple[List[int], List[int]]: Up to `max_matches` posting keys and their offsets.
+        """
+        top = self._kept_top_completions(node, path)
+        if top is None:
+            postings = node.postings
+            top = self.popularity.top(postings, node.offsets, self.max_matches)
+            if len(postings) >= TOP_COMPLETIONS_MIN_POSTINGS:
+                self._top_completions[path] = (self.popularity.version, top)
+            if self.metrics is not None:
+                self.metrics.observe('trie.postings_ranked', len(postings), SIZE_BUCKETS)
+        elif self.metrics is not None:
+            self.metrics.count('trie.top_completion_hits')
+        return top
+
+    def precompute_top_completions(self, min_postings: int = TOP_COMPLETIONS_MIN_POSTINGS) -> int:
+        """Select the most popular matches of every path with many postings ahead of the first prompt.
+
+        The postings of a node are a subset of those of its parent, so the walk stops below the first node
+        on every path that has fewer than `min_postings` of them.
+
+        Args:
+            min_postings (int, optional): The number of postings from which a node gets its selection.
+                Defaults to TOP_COMPLETIONS_MIN_POSTINGS.
+
+        Returns:
+            int: The number of nodes whose selection is kept.
+        """
+        stack = [(self.root, ())]
+        while stack:
+            node, path = stack.pop()
+            for child in node.iter_children():
+                postings = child.postings
+                if len(postings) < min_postings:
+                    continue
+                child_path = path + (child.word_id,)
+                if self._kept_top_completions(child, child_path) is None:
+                    top = self.popularity.top(postings, child.offsets, self.max_matches)
+                    self._top_completions[child_path] = (self.popularity.version, top)
+                stack.append((child, child_path))
+        return len(self._top_completions)
+
+    def record_click(self, file_name: str, line_number: int, timestamp: Optional[float] = None) -> bool:
+        """Record that a line was picked as a suggestion, to rank it higher from now on.
+
+        Args:
+            file_name (str): The name of the file of the line.
+            line_number (int): The line number within the file.
+            timestamp (Optional[float], optional): The Unix time of the click. Defaults to now.
+
+        Returns:
+            bool: Whether the file is indexed; clicks on other files are ignored.
+        """
+        file_id = self.file_ids.get(file_name)
+        if file_id is None:
+            return False
+        self.popularity.record_click(pack_posting(file_id, line_number), timestamp)
+        return True
+
+    def popularity_of(self, file_name: str, line_number: int) -> float:
+        """Return the popularity of a line, as weighed by `Popularity.weight`, or 0 if its file is not indexed."""
+        file_id = self.file_ids.get(file_name)
+        return 0.0 if file_id is None else self.popularity.weight(pack_posting(file_id, line_number))
+
+    def step(self, node: Node, word: str, next_word: Optional[str] = None) -> Tuple[Optional[Node], bool]:
+        """Follow one word of a prompt down from a node, allowing for one character typo.
+
+        An exact child wins. Otherwise the best scoring typo child is taken, skipping those without a child
+        for the next word, so the choice depends on the next word only when the word has a typo.
+
+        Args:
+            node (Node): The node reached by the previous words of the prompt.
+            word (str): The word to follow.
+            next_word (Optional[str], optional): The word after it in the prompt, or `None` for the last word.
+                Defaults to None.
+
+        Returns:
+            Tuple[Optional[Node], bool]: The child reached, or `None` if the prompt cannot match, and whether the
+                word was taken as a typo.
+        """
+        vocabulary = self.vocabulary
+        word_id = vocabulary.id_of(word)
+        child = node.get_child(word_id) if word_id is not None else None
+        if child is not None:
+            return child, False
+
+        metrics = self.metrics
+        if metrics is not None:
+            start = perf_counter()
+        found = None
+        next_word_id = vocabulary.id_of(next_word) if next_word is not None else None
+        for child in self._get_typo_children(node, word):
+            if next_word is None or (next_word_id is not None and child.get_child(next_word_id) is not None):
+                found = child
+                break
+        if metrics is not None:
+            metrics.observe('trie.typo_fallback_seconds', perf_counter() - start)
+            metrics.count('trie.typo_fallbacks')
+        return found, True
+
+    def search_ranked(self, sentence: str) -> List[Tuple[int, str, int, int]]:
+        """Search for the best scoring matches of a sentence, allowing for one character typo across the sentence.
+
+        Paths through the trie are explored best-first. The bound of a partial path is the score it would get
+        if the remaining words matched exactly, which can only drop as the path grows, so the search stops as
+        soon as `max_matches` results were found and no pending path can beat the last of them.
+
+        Args:
+            sentence (str): The sentence to search for.
+
+        Returns:
+            List[Tuple[int, str, int, int]]: Up to `max_matches` tuples of score, file name, line number and the
+                character offset in the line where the match starts, ordered by descending score, then by
+                descending popularity and then by file and line.
+        """
+        words = self.normalizer.normalize(sentence).split()
+        if not words:
+            return []
+
+        prompt = " ".join(words)
+        frontier = [(-self.matcher.calculate_score(prompt, prompt), 0, 0, self.root, (), ())]
+        counter = 1
+        results = []
+        seen = set()
+
+        while frontier:
+            negative_bound, _, depth, node, path, word_ids = heapq.heappop(frontier)
+            if len(results) == self.max_matches and -negative_bound <= results[-1][0]:
+                break
+
+            if depth == len(words):
+                for key, offset in zip(*self.top_completions(node, word_ids)):
+                    if key in seen:
+                        continue  # already reached by a better scoring path
+                    seen.add(key)
+                    file_id, line_number = unpack_posting(key)
+                    results.append((-negative_bound, self.files[file_id], line_number, offset))
+                    if len(results) == self.max_matches:
+                        break
+                continue
+
+            word = words[depth]
+            for child in self._get_close_children(node, word):
+                child_path = path + (self.vocabulary.word(child.word_id),)
+                bound = self.matcher.calculate_score(prompt, " ".join(child_path + tuple(words[depth + 1:])))
+                if bound > INVALID_SCORE:
+                    heapq.heappush(frontier, (-bound, counter, depth + 1, child, child_path,
+                                              word_ids + (child.word_id,)))
+                    counter += 1
+
+        return results
+
+    def search_edits(self, sentence: str, max_edits: int = EDIT_BUDGET, max_word_edits: int = MAX_WORD_EDITS,
+                     max_expansions: int = MAX_EXPANSIONS) -> List[Tuple[int, str, int, int]]:
+        """Search for a sentence with a budget of edits across the whole sentence, for noisy prompts.
+
+        Paths through the trie are explored best-first from a priority queue ordered by the edits spent so
+        far, deeper paths first among equals, so every match comes with the fewest edits any path to it needs
+        and a path that turns out to be a dead end is abandoned for the next best one. Each word may be
+        replaced by any indexed word within `max_word_edits` substitutions, insertions and deletions, as long
+        as the edits of all words stay within `max_edits`. At most `max_expansions` nodes are expanded, which
+        bounds the time of a query however noisy it is; every `CANDIDATES_PER_EXPANSION` strings generated to
+        find the candidates of a word of the prompt, candidate words found, or candidates checked against the
+        children of a node count as one more expansion.
+
+        Args:
+            sentence (str): The sentence to search for.
+            max_edits (int, optional): The edits allowed across the sentence. Defaults to EDIT_BUDGET.
+            max_word_edits (int, optional): The edits allowed within one word. Defaults to MAX_WORD_EDITS.
+            max_expansions (int, optional): The number of nodes expanded before the search gives up.
+                Defaults to MAX_EXPANSIONS.
+
+        Returns:
+            List[Tuple[int, str, int, int]]: Up to `max_matches` tuples of score, file name, line number and the
+                character offset in the line where the match starts, ordered by the edits they needed and then
+                as `search` orders them. The score is that of `StringMatcher.calculate_edit_score`.
+        """
+        words = self.normalizer.normalize(sentence).split()
+        if not words:
+            return []
+
+        prompt = " ".join(words)
+        candidates: Dict[Tuple[str, int], Dict[int, int]] = {}
+        frontier = [(0, 0, 0, self.root, ())]
+        counter = 1
+        expansions = 0
+        results = []
+        seen = set()
+
+        while frontier and len(results) < self.max_matches:
+            edits, negative_depth, _, node, path = heapq.heappop(frontier)
+            depth = -negative_depth
+            if depth == len(words):
+                matched = " ".join(map(self.vocabulary.word, path))
+                score = self.matcher.calculate_edit_score(prompt, matched, edits)
+                for key, offset in zip(*self.top_completions(node, path)):
+                    if key in seen:
+                        continue  # already reached by a path with fewer edits
+                    seen.add(key)
+                    file_id, line_number = unpack_posting(key)
+                    results.append((score, self.files[file_id], line_number, offset))
+                    if len(results) == self.max_matches:
+                        break
+                continue
+
+            word_budget = min(max_word_edits, max_edits - edits)
+            close = candidates.get((words[depth], word_budget))
+            cost = 1
+            while close is None:
+                # The neighbors of the word are charged before they are generated, so a long word or a large
+                # alphabet cannot outlast the cap; fewer edits within the word are tried if they do not fit.
+                cost = 1 + self.typo_index.neighborhood_size(words[depth], word_budget) // CANDIDATES_PER_EXPANSION
+                if word_budget <= 1 or expansions + cost <= max_expansions:
+                    break
+                word_budget -= 1
+                cost = 1
+                close = candidates.get((words[depth], word_budget))
+            if expansions + cost > max_expansions:
+                if self.metrics is not None:
+                    self.metrics.count('trie.edit_expansion_limits')
+                break
+            expansions += cost
+            if close is None:
+                close = candidates[words[depth], word_budget] = self._get_word_candidates(words[depth], word_budget)
+                expansions += len(close) // CANDIDATES_PER_EXPANSION
+            children, checked = self._get_candidate_children(node, close)
+            expansions += checked // CANDIDATES_PER_EXPANSION
+            for word_edits, child in children:
+                heapq.heappush(frontier, (edits + word_edits, -depth - 1, counter, child, path + (child.word_id,)))
+                counter += 1
+
+        if self.metrics is not None:
+            self.metrics.count('trie.edit_searches')
+            self.metrics.observe('trie.edit_expansions', expansions, SIZE_BUCKETS)
+        return results
+
+    def _get_word_candidates(self, word: str, max_edits: int) -> Dict[int, int]:
+        """Map the vocabulary ids of the words within an edit distance of a word to their distance.
+
+        Args:
+            word (str): The word of the prompt.
+            max_edits (int): The largest edit distance allowed.
+
+        Returns:
+            Dict[int, int]: The edit distance of every close word, by vocabulary id, closest first and then in
+                vocabulary id order.
+        """
+        if max_edits == 0:
+            word_id = self.vocabulary.id_of(word)
+            return {word_id: 0} if word_id is not None else {}
+        if max_edits == 1:
+            # The deletion neighborhood finds the words one typo away without walking the vocabulary.
+            close = [(0, word)] + [(1, candidate) for candidate in self.typo_index.candidates(word)]
+        else:
+            close = self.typo_index.candidates_within(word, max_edits)
+        id_of = self.vocabulary.id_of
+        close_ids = sorted((edits, word_id) for edits, word_id in ((edits, id_of(word)) for edits, word in close)
+                           if word_id is not None)
+        return {word_id: edits for edits, word_id in close_ids}
+
+    @staticmethod
+    def _get_candidate_children(node: Node, close: Dict[int, int]) -> Tuple[List[Tuple[int, Node]], int]:
+        """Collect the children of a node whose word is one of the candidates of a word of the prompt.
+
+        Whichever of the children and the candidates are fewer are checked against the others.
+
+        Args:
+            node (Node): The node whose children are examined.
+            close (Dict[int, int]): The edit distance of every candidate word, by vocabulary id, in the order of
+                `_get_word_candidates`.
+
+        Returns:
+            Tuple[List[Tuple[int, Node]], int]: The edit distance and the node of every matching child, closest
+                first and then in vocabulary id order, and the number of words checked.
+        """
+        few = list(islice(node.iter_children(), len(close) + 1))
+        if len(few) <= len(close):
+            children = sorted((close[child.word_id], child.word_id, child) for child in few
+                              if child.word_id in close)
+            return [(edits, child) for edits, _, child in children], len(few)
+        children = []
+        for word_id, edits in close.items():
+            child = node.get_child(word_id)
+            if child is not None:
+                children.append((edits, child))
+        return children, len(close)
+
+    def _get_close_children(self, node: Node, word: str) -> List[Node]:
+        """Collect the children of a node whose word matches the given word or is one typo away from it.
+
+        Args:
+            node (Node): The node whose children are examined.
+            word (str): The word to match.
+
+        Returns:
+            List[Node]: The matching children.
+        """
+        word_id = self.vocabulary.id_of(word)
+        exact = node.get_child(word_id) if word_id is not None else None
+        close = [exact] if exact is not None else []
+        return close + self._get_typo_children(node, word)
+
+    def _get_typo_children(self, node: Node, word: str) -> List[Node]:
+        """Collect the children of a node whose word is one typo away from the given word.
+
+        Candidates come from the typo index and are looked up by their vocabulary id, rather than found by a
+        scan over the children.
+
+        Args:
+            node (Node): The node whose children are examined.
+            word (str): The misspelled word.
+
+        Returns:
+            List[Node]: The matching children, best scoring typo first.
+        """
+        children = []
+        candidates = self.typo_index.candidates(word)
+        for candidate in candidates:
+            candidate_id = self.vocabulary.id_of(candidate)
+            child = node.get_child(candidate_id) if candidate_id is not None else None
+            if child is not None:
+                children.append(child)
+        if self.metrics is not None:
+            self.metrics.count('trie.typo_candidates_checked', len(candidates))
+            self.metrics.count('trie.typo_children_found', len(children))
+        return children
+
+    def _kept_top_completions(self, node: Node, path: Tuple[int, ...]) -> Optional[Tuple[List[int], List[int]]]:
+        """Return the kept selection of the popular matches of a path, unless a change since made it stale.
+
+        Args:
+            node (Node): The node reached by the path.
+            path (Tuple[int, ...]): The word ids of the path from the root to `node`.
+
+        Returns:
+            Optional[Tuple[List[int], List[int]]]: The kept posting keys and offsets, or `None` if there are none.
+        """
+        if self._top_completions_generation != self.generation:
+            self._top_completions.clear()
+            self._top_completions_generation = self.generation
+        entry = self._top_completions.get(path)
+        if entry is None:
+            return None
+        version, top = entry
+        if version != self.popularity.version:
+            changed = self.popularity.changed_since(version)
+            if changed is None or any(contains_posting(node.postings, key) for key in set(changed)):
+                self._top_completions.pop(path, None)    # another thread may have dropped it already
+                return None
+            self._top_completions[path] = (self.popularity.version, top)
+        return top
+
+    def top_of_completions(self, path: Tuple[int, ...], completions: List[Node]) -> Tuple[List[int], List[int]]:
+        """Select the most popular matches of a path whose last word is completed by several children.
+
+        Args:
+            path (Tuple[int, ...]): The word ids of the path to the parent of the completions.
+            completions (List[Node]): The children whose words start with the last, partial word.
+
+        Returns:
+            Tuple[List[int], List[int]]: Up to `max_matches` posting keys and their offsets.
+        """
+        if self.popularity.is_uniform():
+            # The postings of the completions are subsets of those of the path, so their union is the result.
+            return union_postings([child.postings for child in completions],
+                                  [child.offsets for child in completions], self.max_matches)
+
+        # The best matches overall are among the best ones of every completion.
+        chosen = {}
+        for child in completions:
+            for key, offset in zip(*self.top_completions(child, path + (child.word_id,))):
+                chosen[key] = min(chosen.get(key, offset), offset)
+        keys = sorted(chosen)
+        return self.popularity.top(keys, [chosen[key] for key in keys], self.max_matches)
+
+    def get_spans(self, keys: List[int], offsets: List[int]) -> List[Tuple[str, int, int]]:
+        """Resolve posting keys to file names and line numbers, keeping the offsets of the matches.
+
+        Args:
+            keys (List[int]): The posting keys to resolve.
+            offsets (List[int]): The character offsets that go with the keys.
+
+        Returns:
+            List[Tuple[str, int, int]]: A list of tuples containing file names, line numbers and offsets.
         """
         file_data = []
-        for file_name, lines in node.file_data.items():
-            for line_number in lines:
-                file_data.append((file_name, line_number))
+        for key, offset in zip(keys, offsets):
+            file_id, line_number = unpack_posting(key)
+            file_data.append((self.files[file_id], line_number, offset))
         return file_data
-    
-    def _intersect_file_data(self, current_data: List[Tuple[str, int]], new_data: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
-        """Find the intersection between two lists of file data.
+
+    def materialize(self) -> bool:
+        """Copy a read-only trie, loaded from a snapshot or combined from shards, into mutable nodes in place.
+
+        Word ids, file ids and clicks are kept, so the trie answers every prompt as before and can then take
+        inserted sentences and removed files.
+
+        Returns:
+            bool: Whether the trie was read-only and has been copied.
+        """
+        if isinstance(self.root, Node):
+            return False
+        vocabulary = Vocabulary()
+        for word in self.vocabulary.iter_words():  # in id order, so every word keeps its id
+            vocabulary.add(word)
+        root = Node()
+        stack = [(self.root, root)]
+        while stack:
+            source, target = stack.pop()
+            for key, offset in zip(source.postings, source.offsets):
+                target.add_posting(key, offset)
+            for child in source.iter_children():
+                stack.append((child, target.add_child(child.word_id)))
+        self.popularity.absorb_stored()
+        self.vocabulary, self.root = vocabulary, root
+        self.generation += 1
+        return True
+
+    def intern_file(self, file_name: str) -> int:
+        """Return the id of a file name, assigning the next free id on first use.
 
         Args:
-            current_data (List[Tuple[str, int]]): The current list of file data.
-            new_data (List[Tuple[str, int]]): The new list of file data to intersect with the current data.
+            file_name (str): The name of the file.
 
         Returns:
-            List[Tuple[str, int]]: A list of tuples representing the intersection of the two file data lists.
+            int: The interned id of the file.
         """
-        return list(set(current_data) & set(new_data))
+        file_id = self.file_ids.get(file_name)
+        if file_id is None:
+            file_id = len(self.files)
+            self.files.append(file_name)
+            self.file_ids[file_name] = file_id
+        return file_id
 
-    def _insert_suffix(self, words: List[str], file_name: str, line_number: int) -> None:
-        """Insert a suffix of words into the trie, associating it with a file name and line number.
+    def _insert_suffix(self, word_ids: List[int], key: int, offset: int) -> None:
+        """Insert a suffix of words into the trie, associating it with a posting key.
 
         Args:
-            words (List[str]): The list of words to insert into the trie.
-            file_name (str): The name of the file where the words are located.
-            line_number (int): The line number where the words are located in the file.
+            word_ids (List[int]): The vocabulary ids of the words to insert into the trie.
+            key (int): The posting key of the file and line where the words are located.
+            offset (int): The character offset in the line where the suffix starts.
         """
         node = self.root
-        for word in words:
-            if word not in node.children:
-                node.children[word] = Node(word)
-            
-            node = node.children[word]
-            if file_name not in node.file_data:
-                node.file_data[file_name] = []
-            node.file_data[file_name].append(line_number)
+        for word_id in word_ids:
+            node = node.add_child(word_id)
+            node.add_posting(key, offset)
@@ -0,0 +1,150 @@
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+from urllib.parse import quote
+from completion_server import request
+from data_structure.auto_complete_data import AutoCompleteData
+from utils.consts import MAX_SUGGESTIONS
+
+
+SHARD_DEADLINE = 0.25   # seconds to wait for the shards before answering with the ones that replied
+
+
+class ShardedCoordinator:
+    """Answers prompts by fanning them out to shard servers and merging their suggestions.
+
+    Every shard is a `completion_server` that indexes the files `utils.functions.shard_of` assigns to it.
+    A prompt is sent to all shards at once, and the best `max_matches` suggestions by score are kept from
+    the replies that arrive before the deadline. Shards that are slow, down or failing are left out of that
+    answer and counted, so one bad shard degrades the results instead of stalling them.
+
+    Attributes:
+        shards (List[Tuple[str, int]]): The host and port of every shard server.
+        max_matches (int): The maximum number of suggestions returned.
+        deadline (float): The number of seconds to wait for the shards.
+        timeouts (List[int]): For every shard, the number of prompts it did not answer in time.
+        errors (List[int]): For every shard, the number of prompts it failed to answer.
+    """
+    def __init__(self, shards: List[Tuple[str, int]], max_matches: int = MAX_SUGGESTIONS,
+                 deadline: float = SHARD_DEADLINE) -> None:
+        """Initialize a coordinator over running shard servers.
+
+        Args:
+            shards (List[Tuple[str, int]]): The host and port of every shard server.
+            max_matches (int, optional): The maximum number of suggestions returned. Defaults to MAX_SUGGESTIONS.
+            deadline (float, optional): The number of seconds to wait for the shards. Defaults to SHARD_DEADLINE.
+        """
+        self.shards: List[Tuple[str, int]] = shards
+        self.max_matches: int = max_matches
+        self.deadline: float = deadline
+        self.timeouts: List[int] = [0] * len(shards)
+        self.errors: List[int] = [0] * len(shards)
+
+    def get_suggestions(self, prompt: str, ranked: bool = False, prefix: bool = False) -> List[AutoCompleteData]:
+        """Blocking wrapper around `get_suggestions_async` for callers without an event loop."""
+        return asyncio.run(self.get_suggestions_async(prompt, ranked, prefix))
+
+    async def get_suggestions_async(self, prompt: str, ranked: bool = False,
+                                    prefix: bool = False) -> List[AutoCompleteData]:
+        """Query every shard in parallel and merge the suggestions that arrive before the deadline.
+
+        Args:
+            prompt (str): The prompt to complete.
+            ranked (bool, optional): Whether the shards run the ranked search. Defaults to False.
+            prefix (bool, optional): Whether the shards complete the last word of the prompt. Defaults to False.
+
+        Returns:
+            List[AutoCompleteData]: Up to `max_matches` suggestions, by descending score and then by file and line.
+        """
+        target = f"/suggest?q={quote(prompt)}" + ("&ranked=1" if ranked else "") + ("&prefix=1" if prefix else "")
+        tasks = [asyncio.create_task(request(host, port, target)) for host, port in self.shards]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+        for task in pending:
+            task.cancel()
+
+        suggestions = []
+        for shard, task in enumerate(tasks):
+            if task in pending:
+                self.timeouts[shard] += 1
+                continue
+            if task.exception() is not None:
+                self.errors[shard] += 1
+                continue
+            status, body = task.result()
+            if status != 200:
+                self.errors[shard] += 1
+                continue
+            suggestions.extend(AutoCompleteData(**row) for row in body)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        suggestions.sort(key=lambda suggestion: (-suggestion.score, -suggestion.popularity,
+                                                 suggestion.source_text, suggestion.offset))
+        return suggestions[:self.max_matches]
+
+
+def spawn_shards(dataset_dir: str, num_shards: int, host: str = '127.0.0.1',
+                 snapshot_dir: Optional[str] = None) -> List[Tuple[subprocess.Popen, Tuple[str, int]]]:
+    """Start one `completion_server` subprocess per shard and wait until all of them listen.
+
+    Args:
+        dataset_dir (str): The directory of the dataset.
+        num_shards (int): The number of shards.
+        host (str, optional): The address the shards listen on. Defaults to '127.0.0.1'.
+        snapshot_dir (Optional[str], optional): A directory for the snapshots of the shards. Defaults to None.
+
+    Returns:
+        List[Tuple[subprocess.Popen, Tuple[str, int]]]: The process and the address of every shard, in shard order.
+    """
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'completion_server.py')
+    processes = []
+    for shard in range(num_shards):
+        command = [sys.executable, server_path, dataset_dir, '--host', host, '--port', '0',
+                   '--shard', f'{shard}/{num_shards}']
+        if snapshot_dir is not None:
+            command += ['--snapshot', os.path.join(snapshot_dir, f'shard{shard}.snapshot')]
+        processes.append(subprocess.Popen(command, stdout=subprocess.PIPE, text=True))
+
+    shards = []
+    for process in processes:
+        banner = process.stdout.readline()
+        if not banner:
+            stop_shards(processes)
+            raise RuntimeError(f"A shard server of {dataset_dir} failed to start")
+        shards.append((process, (host, int(banner.split(':')[2].split('/')[0]))))
+    return shards
+
+
+def stop_shards(processes: List[subprocess.Popen]) -> None:
+    """Terminate shard servers and wait for them to exit."""
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Complete prompts over a dataset split into shard servers.")
+    parser.add_argument('dataset_dir', nargs='?', default='Dataset')
+    parser.add_argument('--shards', type=int, default=2)
+    parser.add_argument('--deadline', type=float, default=SHARD_DEADLINE)
+    args = parser.parse_args()
+
+    shards = spawn_shards(args.dataset_dir, args.shards)
+    coordinator = ShardedCoordinator([address for _, address in shards], deadline=args.deadline)
+    print(f"{args.shards} shards are ready. Enter a prompt per line, or 'exit'.")
+    try:
+        for line in sys.stdin:
+            if line.strip() == 'exit':
+                break
+            for suggestion in coordinator.get_suggestions(line.strip()):
+                print(f"{suggestion.score:4} {suggestion.completed_sentence}  ({suggestion.source_text}:{suggestion.offset})")
+    finally:
+        stop_shards([process for process, _ in shards])
+
+
+if __name__ == "__main__":
+    main()
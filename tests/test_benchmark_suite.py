@@ -0,0 +1,34 @@
+import random
+from benchmarks.corpus import QUERY_KINDS, generate_lines, generate_query_mix, misspell
+from benchmarks.suite import compare, run_case
+
+
+def test_query_mix_puts_typos_where_asked():
+    mix = generate_query_mix(generate_lines(50, seed=1), count=20, seed=1)
+
+    for exact, first, middle, last in zip(*(mix[kind] for kind in QUERY_KINDS)):
+        exact, first, middle, last = exact.split(), first.split(), middle.split(), last.split()
+        assert first[0] != exact[0] and first[1:] == exact[1:]
+        assert last[-1] != exact[-1] and last[:-1] == exact[:-1]
+        assert sum(word != exact_word for word, exact_word in zip(middle, exact)) == 1
+
+
+def test_misspell_always_changes_the_word():
+    rng = random.Random(0)
+    assert all(misspell("a", rng) != "a" for _ in range(50))
+
+
+def test_case_reports_every_metric_and_compare_flags_regressions():
+    config = {'lines': 40, 'files': 2, 'words_per_line': 5, 'vocabulary_size': 50, 'skew': 1.0, 'queries': 5,
+              'seed': 0}
+    result = {'cases': [run_case(config)]}
+    case = result['cases'][0]
+
+    assert case['build']['lines'] == 40
+    assert set(case['search']) == set(case['suggestions']) == set(QUERY_KINDS)
+    assert compare(result, result) == []
+
+    slower = {'cases': [dict(case, search=dict(case['search'], exact={'p50_us': case['search']['exact']['p50_us'] * 2,
+                                                                      'p99_us': case['search']['exact']['p99_us']}))]}
+    regressions = compare(result, slower)
+    assert len(regressions) == 1 and '/search/exact/p50_us' in regressions[0]
@@ -0,0 +1,227 @@
+import threading
+import time
+import pytest
+from completion_coordinator import CompletionCoordinator
+from text_processor.normalization import TextNormalizer
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    (tmp_path / 'file1.txt').write_text("Learn to code, then learn Python!\nhow to cook pasta\n", encoding='utf-8')
+    (tmp_path / 'file2.txt').write_text("How to: learn Python fast\n", encoding='utf-8')
+    coordinator = CompletionCoordinator(str(tmp_path))
+    coordinator.build_trie()
+    return coordinator
+
+
+def test_suggestions_start_at_the_matched_words(coordinator):
+    suggestions = coordinator.get_suggestions("learn python")
+
+    assert sorted(suggestion.completed_sentence for suggestion in suggestions) == ["learn Python fast", "learn Python!"]
+    assert [suggestion.offset for suggestion in suggestions] == [1, 1]
+    assert all(suggestion.score == 2 * len("learn python") for suggestion in suggestions)
+
+
+def test_suggestions_with_a_typo(coordinator):
+    suggestions = coordinator.get_suggestions("how to cok")
+
+    assert [suggestion.completed_sentence for suggestion in suggestions] == ["how to cook pasta"]
+    assert suggestions[0].score < 2 * len("how to cook")
+
+
+def test_ranked_suggestions(coordinator):
+    suggestions = coordinator.get_suggestions("how to", ranked=True)
+
+    assert sorted(suggestion.completed_sentence for suggestion in suggestions) == ["How to: learn Python fast", "how to cook pasta"]
+
+
+@pytest.mark.parametrize("prompt", ["learn python", "how to", "how to cok", "to code then", "missing"])
+def test_suffix_array_engine_matches_trie_engine(tmp_path, coordinator, prompt):
+    suffix_array_coordinator = CompletionCoordinator(coordinator.processor.dataset_directory, engine='suffix_array')
+    suffix_array_coordinator.build_trie()
+
+    assert suffix_array_coordinator.get_suggestions(prompt) == coordinator.get_suggestions(prompt)
+
+
+def test_prefix_suggestions_complete_the_last_word(coordinator):
+    suggestions = coordinator.get_suggestions("how to co", prefix=True)
+
+    assert [suggestion.completed_sentence for suggestion in suggestions] == ["how to cook pasta"]
+    assert suggestions[0].score == 2 * len("how to co")
+    assert coordinator.get_suggestions("how to co") == []
+    assert coordinator.get_suggestions("how to co ", prefix=True) == []
+    assert sorted(suggestion.completed_sentence for suggestion in coordinator.get_suggestions("learn py", prefix=True)) \
+        == ["learn Python fast", "learn Python!"]
+
+
+@pytest.mark.parametrize("prompt", ["how to co", "learn py", "l", "how to cok", "how to "])
+def test_suffix_array_engine_completes_the_last_word_like_the_trie(coordinator, prompt):
+    suffix_array_coordinator = CompletionCoordinator(coordinator.processor.dataset_directory, engine='suffix_array')
+    suffix_array_coordinator.build_trie()
+
+    assert suffix_array_coordinator.get_suggestions(prompt, prefix=True) == coordinator.get_suggestions(prompt, prefix=True)
+    assert suffix_array_coordinator.get_suggestions(prompt, prefix=True) \
+        == coordinator.get_suggestions(prompt, session=coordinator.new_session(), prefix=True)
+
+
+def test_suffix_array_engine_ranks_and_syncs(tmp_path, coordinator):
+    suffix_array_coordinator = CompletionCoordinator(str(tmp_path), engine='suffix_array')
+    suffix_array_coordinator.build_trie()
+    by_line = lambda suggestion: (suggestion.source_text, suggestion.offset)
+
+    for prompt in ["how to", "how to cok", "learn python"]:
+        assert sorted(suffix_array_coordinator.get_suggestions(prompt, ranked=True), key=by_line) == \
+            sorted(coordinator.get_suggestions(prompt, ranked=True), key=by_line)
+
+    (tmp_path / 'file1.txt').write_text("how to cook rice\n", encoding='utf-8')
+    (tmp_path / 'file2.txt').unlink()
+    suffix_array_coordinator.sync_files()
+    assert [suggestion.completed_sentence for suggestion in suffix_array_coordinator.get_suggestions("how to")] \
+        == ["how to cook rice"]
+
+
+def test_unknown_engine_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        CompletionCoordinator(str(tmp_path), engine='btree')
+
+
+def test_session_suggestions_match_stateless_suggestions(coordinator):
+    coordinator = CompletionCoordinator(coordinator.processor.dataset_directory, cache_size=0)
+    coordinator.build_trie()
+    session = coordinator.new_session()
+
+    for prompt in ["how", "how to", "how to cok", "how to cok pasta"]:
+        assert coordinator.get_suggestions(prompt, session=session) == coordinator.get_suggestions(prompt)
+
+
+def test_repeated_prompts_are_served_from_the_cache(coordinator):
+    first = coordinator.get_suggestions("Learn  PYTHON")
+    second = coordinator.get_suggestions("learn python")
+
+    assert second == first
+    assert (coordinator.cache.hits, coordinator.cache.misses) == (1, 1)
+
+
+def test_sync_invalidates_the_cache(coordinator, tmp_path):
+    assert coordinator.get_suggestions("cook pasta")[0].source_text.endswith("file1.txt")
+
+    (tmp_path / 'file1.txt').unlink()
+    coordinator.sync_files()
+
+    assert coordinator.get_suggestions("cook pasta") == []
+
+
+def test_searches_run_while_a_watcher_applies_changes(coordinator, tmp_path, monkeypatch):
+    stop, indexing, changes, errors = threading.Event(), threading.Event(), [], []
+    process_file = coordinator.processor._process_file
+
+    def slow_process_file(file_path, word_trie):
+        # Hold the watcher between dropping the old content of a file and indexing the new one.
+        indexing.set()
+        time.sleep(0.05)
+        process_file(file_path, word_trie)
+
+    def watch():
+        try:
+            coordinator.watch(interval=0.001, stop_event=stop, on_change=lambda *change: changes.append(change))
+        except Exception as error:
+            errors.append(error)
+
+    monkeypatch.setattr(coordinator.processor, '_process_file', slow_process_file)
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    try:
+        (tmp_path / 'file1.txt').write_text("Learn to code, then learn Python!\nhow to cook pasta\nhow to cook rice\n",
+                                            encoding='utf-8')
+        assert indexing.wait(5)
+        suggestions = coordinator.get_suggestions("how to cook")
+    finally:
+        stop.set()
+        watcher.join()
+
+    assert errors == [] and changes == [([], [str(tmp_path / 'file1.txt')], [])]
+    assert sorted(suggestion.completed_sentence for suggestion in suggestions) == ["how to cook pasta", "how to cook rice"]
+
+
+@pytest.mark.parametrize("ranked", [False, True])
+def test_lines_changed_on_disk_since_indexing_are_skipped(coordinator, tmp_path, ranked):
+    (tmp_path / 'file1.txt').write_text("Learn to code\n", encoding='utf-8')  # shorter, and without the match
+    assert [suggestion.source_text for suggestion in coordinator.get_suggestions("learn python", ranked=ranked)] \
+        == [str(tmp_path / 'file2.txt')]
+    assert coordinator.get_suggestions("cook pasta", ranked=ranked) == []
+
+    coordinator.cache.clear()
+    (tmp_path / 'file2.txt').unlink()
+    assert coordinator.get_suggestions("learn python", ranked=ranked) == []
+    assert coordinator.get_suggestions_batch(["learn python"]) == [[]]
+
+
+@pytest.mark.parametrize("snapshot, workers", [(True, 1), (False, 2), (True, 2)])
+def test_sync_after_a_snapshot_load_or_a_parallel_build(tmp_path, snapshot, workers):
+    dataset = tmp_path / 'Dataset'
+    dataset.mkdir()
+    (dataset / 'file1.txt').write_text("how to cook pasta\nhow to sew\n", encoding='utf-8')
+    (dataset / 'file2.txt').write_text("how to learn python\n", encoding='utf-8')
+    snapshot_path = str(tmp_path / 'trie.snapshot') if snapshot else None
+    if snapshot:
+        CompletionCoordinator(str(dataset)).build_trie(snapshot_path)
+    coordinator = CompletionCoordinator(str(dataset))
+    coordinator.build_trie(snapshot_path, workers=workers)
+    assert coordinator.sync_files() == ([], [], [])
+
+    (dataset / 'file1.txt').write_text("how to sew a button\nhow to cook rice\n", encoding='utf-8')
+    (dataset / 'file2.txt').unlink()
+    (dataset / 'file3.txt').write_text("learn python fast\n", encoding='utf-8')
+    file1, file2, file3 = (str(dataset / f'file{i}.txt') for i in range(1, 4))
+
+    assert coordinator.sync_files() == ([file3], [file1], [file2])
+    assert [suggestion.completed_sentence for suggestion in coordinator.get_suggestions("cook rice")] == ["cook rice"]
+    assert coordinator.get_suggestions("cook pasta") == []
+    assert [suggestion.source_text for suggestion in coordinator.get_suggestions("learn python")] == [file3]
+    assert [suggestion.offset for suggestion in coordinator.get_suggestions("how to")] == [1, 2]
+    assert coordinator.sync_files() == ([], [], [])
+
+
+def test_batch_suggestions_match_single_suggestions(coordinator):
+    prompts = ["learn python", "how to", "How to cok", "learn PYTHON", "how to cook", "missing", ""]
+    single = CompletionCoordinator(coordinator.processor.dataset_directory, cache_size=0)
+    single.build_trie()
+
+    assert coordinator.get_suggestions_batch(prompts) == [single.get_suggestions(prompt) for prompt in prompts]
+    assert coordinator.cache.misses == 6
+
+
+def test_batch_suggestions_use_the_cache(coordinator):
+    coordinator.get_suggestions("how to")
+
+    assert coordinator.get_suggestions_batch(["how to"]) == [coordinator.get_suggestions("how to")]
+    assert coordinator.cache.hits == 2
+
+
+def test_folding_normalizer_and_snapshots_built_with_another_policy(tmp_path):
+    dataset = tmp_path / 'Dataset'
+    dataset.mkdir()
+    (dataset / 'file1.txt').write_text("Un café crème, s'il vous plaît\n", encoding='utf-8')
+    snapshot_path = str(tmp_path / 'trie.snapshot')
+    CompletionCoordinator(str(dataset)).build_trie(snapshot_path)
+    folding = TextNormalizer(unicode_form='NFKC', strip_accents=True)
+
+    coordinator = CompletionCoordinator(str(dataset), normalizer=folding)
+    assert coordinator.build_trie(snapshot_path) is not None  # rebuilt rather than loaded
+
+    suggestions = coordinator.get_suggestions("cafe creme")
+    assert [suggestion.completed_sentence for suggestion in suggestions] == ["café crème, s'il vous plaît"]
+    assert suggestions[0].score == 2 * len("cafe creme")
+    assert coordinator.get_suggestions_batch(["Cafe creme"]) == [suggestions]
+
+
+def test_edit_budget_answers_prompts_with_several_typos(coordinator):
+    assert coordinator.get_suggestions("lern pyton") == []
+
+    budget_coordinator = CompletionCoordinator(coordinator.processor.dataset_directory, edit_budget=2)
+    budget_coordinator.build_trie()
+    suggestions = budget_coordinator.get_suggestions("lern pyton")
+    assert sorted(suggestion.completed_sentence for suggestion in suggestions) == ["learn Python fast", "learn Python!"]
+    assert all(suggestion.score < 2 * len("learn python") - 12 for suggestion in suggestions)
+    assert budget_coordinator.get_suggestions_batch(["Lern pyton"]) == [suggestions]
+    assert budget_coordinator.get_suggestions("how to cok") == coordinator.get_suggestions("how to cok")
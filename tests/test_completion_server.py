@@ -0,0 +1,182 @@
+import asyncio
+import os
+import signal
+import subprocess
+import sys
+import time
+import pytest
+from urllib.parse import quote
+from completion_coordinator import CompletionCoordinator
+from completion_server import CompletionServer, _parse_head, request
+from utils.metrics import Metrics
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    (tmp_path / 'file1.txt').write_text("how to learn python\nhow to cook pasta\n", encoding='utf-8')
+    coordinator = CompletionCoordinator(str(tmp_path))
+    coordinator.build_trie()
+    return coordinator
+
+
+def serve(server: CompletionServer, client):
+    """Run a client coroutine function against a started server, then shut the server down."""
+    async def run():
+        await server.start()
+        try:
+            return await client(server.port)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_suggestions_over_http(coordinator):
+    server = CompletionServer(coordinator, port=0)
+    status, body = serve(server, lambda port: request('127.0.0.1', port, '/suggest?q=' + quote('how to cok')))
+
+    assert status == 200
+    assert body == [{'completed_sentence': 'how to cook pasta', 'source_text': coordinator.trie.files[0],
+                     'offset': 2, 'score': coordinator.get_suggestions('how to cok')[0].score, 'popularity': 1.0}]
+
+
+def test_prefix_suggestions_over_http(coordinator):
+    server = CompletionServer(coordinator, port=0)
+
+    async def client(port):
+        return await asyncio.gather(request('127.0.0.1', port, '/suggest?q=' + quote('how to co') + '&prefix=1'),
+                                    request('127.0.0.1', port, '/suggest?q=' + quote('how to co')))
+
+    (prefix_status, prefix_body), (_, whole_body) = serve(server, client)
+
+    assert prefix_status == 200
+    assert [row['completed_sentence'] for row in prefix_body] == ['how to cook pasta']
+    assert whole_body == []
+
+
+def test_concurrent_clients_get_their_own_answers(coordinator):
+    server = CompletionServer(coordinator, port=0, max_concurrency=2)
+    prompts = ['learn python', 'cook', 'how to', 'missing'] * 10
+
+    async def client(port):
+        return await asyncio.gather(*(request('127.0.0.1', port, '/suggest?q=' + quote(prompt)) for prompt in prompts))
+
+    responses = serve(server, client)
+
+    for prompt, (status, body) in zip(prompts, responses):
+        assert status == 200
+        assert [row['completed_sentence'] for row in body] == \
+            [suggestion.completed_sentence for suggestion in coordinator.get_suggestions(prompt)]
+
+
+def test_slow_queries_time_out(coordinator):
+    class SlowCoordinator:
+        cache = coordinator.cache
+
+        def get_suggestions(self, prompt, ranked=False, prefix=False):
+            time.sleep(0.2)
+            return []
+
+    server = CompletionServer(SlowCoordinator(), port=0, timeout=0.05)
+    status, _ = serve(server, lambda port: request('127.0.0.1', port, '/suggest?q=how'))
+
+    assert status == 504
+
+
+def test_timed_out_queries_keep_their_slot_until_they_finish(coordinator):
+    class SlowCoordinator:
+        cache = coordinator.cache
+
+        def get_suggestions(self, prompt, ranked=False, prefix=False):
+            if prompt == 'slow':
+                time.sleep(0.3)
+            return []
+
+    server = CompletionServer(SlowCoordinator(), port=0, max_concurrency=1, timeout=0.1)
+
+    async def client(port):
+        slow = await request('127.0.0.1', port, '/suggest?q=slow')
+        waiting = await request('127.0.0.1', port, '/suggest?q=fast')  # the slow query still holds the only slot
+        await asyncio.sleep(0.3)
+        return slow, waiting, await request('127.0.0.1', port, '/suggest?q=fast')
+
+    (slow_status, _), (waiting_status, _), (fast_status, _) = serve(server, client)
+
+    assert (slow_status, waiting_status, fast_status) == (504, 504, 200)
+
+
+def test_failing_queries_get_an_internal_server_error(coordinator):
+    coordinator.processor.line_index.get_lines = lambda file_name, line_numbers: 1 / 0
+    server = CompletionServer(coordinator, port=0)
+
+    async def client(port):
+        return await request('127.0.0.1', port, '/suggest?q=how'), await request('127.0.0.1', port, '/health')
+
+    (status, body), (health_status, _) = serve(server, client)
+
+    assert status == 500 and body == {'error': 'internal error'}
+    assert health_status == 200
+
+
+def test_unknown_paths_and_stats(coordinator):
+    server = CompletionServer(coordinator, port=0)
+
+    async def client(port):
+        await request('127.0.0.1', port, '/suggest?q=how')
+        return await request('127.0.0.1', port, '/nowhere'), await request('127.0.0.1', port, '/stats')
+
+    (missing_status, _), (stats_status, stats) = serve(server, client)
+
+    assert missing_status == 404
+    assert stats_status == 200 and stats['misses'] == 1
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"GET /a HTTP/1.1\r\n\r\n", ('GET', '/a', True)),
+    (b"GET /a HTTP/1.1\r\nConnection: close\r\n\r\n", ('GET', '/a', False)),
+    (b"GET /a HTTP/1.0\r\n\r\n", ('GET', '/a', False)),
+    (b"GET /a HTTP/1.0\r\nConnection: keep-alive\r\n\r\n", ('GET', '/a', True)),
+    (b"garbage\r\n\r\n", (None, '', False)),
+])
+def test_parse_head(head, expected):
+    assert _parse_head(head) == expected
+
+
+def test_prefork_workers_share_one_snapshot(tmp_path):
+    dataset_dir = tmp_path / 'dataset'
+    dataset_dir.mkdir()
+    (dataset_dir / 'file1.txt').write_text("how to learn python\nhow to cook pasta\n", encoding='utf-8')
+    snapshot_path = tmp_path / 'trie.snapshot'
+    server_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'completion_server.py')
+    process = subprocess.Popen([sys.executable, server_path, str(dataset_dir), '--port', '0', '--workers', '2',
+                                '--snapshot', str(snapshot_path)], stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(process.stdout.readline().split(':')[2].split('/')[0])
+
+        async def client():
+            return await asyncio.gather(*(request('127.0.0.1', port, '/suggest?q=cook') for _ in range(20)),
+                                        request('127.0.0.1', port, '/health'))
+
+        *responses, (_, health) = asyncio.run(client())
+
+        assert snapshot_path.exists()
+        assert all(status == 200 and body[0]['completed_sentence'] == 'cook pasta' for status, body in responses)
+        assert health['pid'] != process.pid
+    finally:
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=10) == 0
+
+
+def test_metrics_endpoint(tmp_path):
+    (tmp_path / 'file1.txt').write_text("how to learn python\n", encoding='utf-8')
+    coordinator = CompletionCoordinator(str(tmp_path), metrics=Metrics())
+    coordinator.build_trie()
+    server = CompletionServer(coordinator, port=0)
+
+    async def client(port):
+        await request('127.0.0.1', port, '/suggest?q=learn')
+        return await request('127.0.0.1', port, '/metrics'), await request('127.0.0.1', port, '/metrics?format=json')
+
+    (text_status, text), (json_status, snapshot) = serve(server, client)
+
+    assert text_status == 200 and 'autocomplete_suggest_cache_misses_total 1' in text
+    assert json_status == 200 and snapshot['counters']['trie.searches'] == 1
@@ -0,0 +1,71 @@
+from completion_coordinator import CompletionCoordinator
+from data_structure.word_trie import WordTrie
+from utils.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram((1, 10, 100))
+    for value in (0.5, 1, 5, 50, 500):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5 and histogram.total == 556.5
+    assert histogram.quantile(0.5) == 10
+    assert histogram.quantile(0.99) == float('inf')
+    assert Histogram((1,)).quantile(0.5) == 0.0
+
+
+def test_prometheus_export():
+    metrics = Metrics()
+    metrics.count('trie.searches', 3)
+    metrics.observe('trie.walk_seconds', 3e-6)
+
+    text = metrics.to_prometheus()
+
+    assert "# TYPE autocomplete_trie_searches_total counter\nautocomplete_trie_searches_total 3\n" in text
+    assert 'autocomplete_trie_walk_seconds_bucket{le="2.5e-06"} 0' in text
+    assert 'autocomplete_trie_walk_seconds_bucket{le="5e-06"} 1' in text
+    assert 'autocomplete_trie_walk_seconds_bucket{le="+Inf"} 1' in text
+    assert 'autocomplete_trie_walk_seconds_count 1' in text
+
+
+def test_trie_search_records_stages():
+    trie = WordTrie()
+    trie.insert_sentence("how to learn python", "file1.txt", 1)
+    trie.insert_sentence("how to cook pasta", "file1.txt", 2)
+    trie.metrics = Metrics()
+
+    trie.search("how to cok")
+    trie.search("missing words")
+    snapshot = trie.metrics.snapshot()
+
+    assert snapshot['counters']['trie.searches'] == 2
+    assert snapshot['counters']['trie.misses'] == 1
+    assert snapshot['counters']['trie.typo_fallbacks'] == 2
+    assert snapshot['counters']['trie.typo_children_found'] == 1
+    for stage in ('normalize', 'walk', 'rank', 'resolve', 'search', 'typo_fallback'):
+        assert snapshot['histograms'][f'trie.{stage}_seconds']['count'] >= 1
+    assert snapshot['histograms']['trie.postings_ranked']['sum'] == 1
+
+
+def test_coordinator_metrics_survive_rebuilds(tmp_path):
+    (tmp_path / 'file1.txt').write_text("how to learn python\n", encoding='utf-8')
+    metrics = Metrics()
+    coordinator = CompletionCoordinator(str(tmp_path), metrics=metrics)
+    coordinator.build_trie(str(tmp_path.parent / 'trie.snapshot'))
+    coordinator.build_trie(str(tmp_path.parent / 'trie.snapshot'))
+
+    coordinator.get_suggestions("learn python")
+    coordinator.get_suggestions("learn python")
+
+    assert coordinator.trie.metrics is metrics
+    assert metrics.counters['suggest.cache_misses'] == 1 and metrics.counters['suggest.cache_hits'] == 1
+    assert metrics.counters['trie.searches'] == 1
+    assert metrics.histograms['suggest.total_seconds'].count == 2
+    for stage in ('search', 'line_fetch', 'scoring'):
+        assert metrics.histograms[f'suggest.{stage}_seconds'].count == 1
+
+
+def test_metrics_are_off_by_default(tmp_path):
+    coordinator = CompletionCoordinator(str(tmp_path))
+    assert coordinator.metrics is None and coordinator.trie.metrics is None
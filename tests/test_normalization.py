@@ -0,0 +1,67 @@
+import pytest
+from data_structure.trie_snapshot import load_snapshot, save_snapshot
+from data_structure.word_trie import WordTrie
+from text_processor.normalization import TextNormalizer
+from text_processor.text_processor import TextDatasetProcessor
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Hello, World!", "hello world"),
+    ("  how   to\tlearn\n", "how to learn"),
+    ("snake_case and 3.14", "snake_case and 314"),
+    ("--- ...", ""),
+    ("Ça va? Très bien.", "ça va très bien"),
+    ("ﬁle № 5", "ﬁle 5"),
+])
+def test_normalize(text, expected):
+    assert TextNormalizer().normalize(text) == expected
+
+
+def test_normalize_lines_matches_normalize():
+    normalizer = TextNormalizer()
+    lines = ["How to, learn!", "Déjà vu", "", "two\nlines", "  Spaces  "]
+
+    assert normalizer.normalize_lines(lines) == [normalizer.normalize(line) for line in lines]
+    assert normalizer.normalize_lines(iter(lines[:1])) == ["how to learn"]
+    assert normalizer.normalize_lines([]) == []
+
+
+def test_split_lines_matches_split_words():
+    normalizer = TextNormalizer()
+    lines = ["How to, learn!", "a - b", "Déjà vu", "x... y"]
+
+    assert normalizer.split_lines(lines) == [normalizer.split_words(line) for line in lines]
+    assert normalizer.split_words("How to, learn!") == (["how", "to", "learn"], [0, 4, 8])
+    assert normalizer.split_words("a - b") == (["a", "b"], [0, 4])
+
+
+def test_unicode_folding_policy():
+    folding = TextNormalizer(unicode_form='NFKC', strip_accents=True)
+
+    assert folding.normalize("ﬁle Café naïve") == "file cafe naive"
+    assert folding.normalize("Café") == "cafe"
+    assert TextNormalizer(strip_accents=True).normalize("Crème brûlée") == "creme brulee"
+    assert folding == TextNormalizer(unicode_form='NFKC', strip_accents=True) != TextNormalizer()
+    with pytest.raises(ValueError):
+        TextNormalizer(unicode_form='NFX')
+
+
+def test_trie_and_snapshot_keep_their_normalization_policy(tmp_path):
+    dataset = tmp_path / 'Dataset'
+    dataset.mkdir()
+    (dataset / 'file1.txt').write_text("Un café crème, s'il vous plaît\nthe ﬁnal cut\n", encoding='utf-8')
+    folding = TextNormalizer(unicode_form='NFKC', strip_accents=True)
+    word_trie = WordTrie(normalizer=folding)
+    processor = TextDatasetProcessor(dataset_directory=str(dataset))
+    processor.process_files(word_trie=word_trie)
+    file_path = str(dataset / 'file1.txt')
+
+    assert word_trie.search("cafe creme") == [(file_path, 1)]
+    assert word_trie.search("Café Crème") == [(file_path, 1)]
+    assert word_trie.search("final") == [(file_path, 2)]
+
+    snapshot_path = str(tmp_path / 'trie.snapshot')
+    save_snapshot(word_trie, processor.line_index, snapshot_path)
+    loaded_trie, _ = load_snapshot(snapshot_path)
+    assert loaded_trie.normalizer == folding
+    assert loaded_trie.search("cafe creme") == [(file_path, 1)]
@@ -0,0 +1,214 @@
+import pytest
+from completion_coordinator import CompletionCoordinator
+from data_structure.popularity import Popularity, read_click_log
+from data_structure.postings import pack_posting
+from data_structure.search_session import SearchSession
+from data_structure.trie_snapshot import load_snapshot, save_snapshot
+from data_structure.word_trie import WordTrie
+from text_processor.text_processor import TextDatasetProcessor
+from utils.metrics import Metrics
+
+
+@pytest.fixture
+def trie() -> WordTrie:
+    trie = WordTrie(max_matches=2)
+    trie.insert_sentence("how to cook rice", "file1.txt", 1)
+    trie.insert_sentence("how to learn python", "file1.txt", 2)
+    trie.insert_sentence("How to learn Python!", "file2.txt", 1)
+    trie.insert_sentence("how to sew", "file2.txt", 2)
+    return trie
+
+
+def test_frequency_counts_lines_with_the_same_text():
+    popularity = Popularity()
+    popularity.add_line(1, ["how", "to", "sew"])
+    assert popularity.is_uniform()
+
+    popularity.add_line(2, ["how", "to", "sew"])
+    popularity.add_line(3, ["how", "to"])
+    assert (popularity.frequency(1), popularity.frequency(2), popularity.frequency(3)) == (2, 2, 1)
+    assert not popularity.is_uniform()
+
+    popularity.remove_range(2, 3)
+    assert popularity.frequency(1) == 1
+    assert popularity.is_uniform()
+
+
+def test_blank_lines_are_not_counted():
+    trie = WordTrie()
+    for line_number, line in enumerate(["a b", "", "  ", "c"], 1):
+        trie.insert_sentence(line, "file1.txt", line_number)
+
+    assert trie.popularity.is_uniform()
+
+
+def test_remove_range_forgets_only_the_lines_and_clicks_in_the_range():
+    popularity = Popularity(half_life=None)
+    for file_id in range(3):
+        for line_number in (1, 2):
+            popularity.add_line(pack_posting(file_id, line_number), ["how", "to", "sew"])
+        popularity.record_click(pack_posting(file_id, 1))
+
+    popularity.remove_range(pack_posting(1, 0), pack_posting(2, 0))
+    assert popularity.frequency(pack_posting(0, 1)) == 4
+    assert popularity.frequency(pack_posting(1, 1)) == 1
+    assert popularity.clicks(pack_posting(1, 1)) == 0.0
+    assert popularity.clicks(pack_posting(2, 1)) == 1.0
+
+    popularity.remove_range(pack_posting(0, 2), pack_posting(2, 2))
+    assert popularity.frequency(pack_posting(2, 2)) == 2
+    assert popularity.clicks(pack_posting(0, 1)) == 1.0
+    assert popularity.clicks(pack_posting(2, 1)) == 0.0
+
+
+def test_clicks_decay_with_their_age():
+    popularity = Popularity(half_life=100.0, click_weight=2.0)
+    popularity.add_line(1, ["how", "to", "sew"])
+    popularity.record_click(1, timestamp=1000.0)
+    popularity.record_click(1, timestamp=1100.0)
+    popularity.record_click(1, timestamp=900.0)  # logs need not be in order
+
+    assert popularity.clicks(1, now=1100.0) == pytest.approx(0.25 + 0.5 + 1.0)
+    assert popularity.clicks(1, now=1200.0) == pytest.approx((0.25 + 0.5 + 1.0) / 2)
+    assert popularity.weight(1, now=1200.0) == pytest.approx(1 + 2 * 0.875)
+    assert Popularity(half_life=None).weight(7) == 1.0
+
+
+def test_top_orders_by_popularity_then_by_key():
+    popularity = Popularity(half_life=None)
+    for key in range(5):
+        popularity.add_line(key, ["line", str(key)])
+    popularity.add_line(5, ["line", "3"])
+    popularity.record_click(4)
+
+    assert popularity.top([0, 1, 2, 3, 4, 5], [10, 11, 12, 13, 14, 15], 4) == ([3, 4, 5, 0], [13, 14, 15, 10])
+    assert popularity.top([0, 1, 2], [10, 11, 12], 2) == ([0, 1], [10, 11])
+
+
+def test_changed_since_lists_the_clicked_lines(monkeypatch):
+    monkeypatch.setattr('data_structure.popularity.CLICK_LOG_SIZE', 4)
+    popularity = Popularity()
+    popularity.record_click(7)
+    popularity.record_click(9)
+
+    assert popularity.changed_since(0) == [7, 9]
+    assert popularity.changed_since(1) == [9]
+    assert popularity.changed_since(2) == []
+
+    popularity.remove_range(7, 8)
+    assert popularity.changed_since(2) is None
+    assert popularity.changed_since(3) == []
+
+    for key in range(3):
+        popularity.record_click(key)
+    assert popularity.changed_since(0) is None  # forgotten
+    assert popularity.changed_since(3) == [0, 1, 2]
+
+
+def test_search_puts_repeated_lines_first(trie):
+    assert trie.search("how to") == [("file1.txt", 2), ("file2.txt", 1)]
+    assert trie.search("how to l", prefix=True) == [("file1.txt", 2), ("file2.txt", 1)]
+    assert trie.search("hiw to cook") == [("file1.txt", 1)]
+    assert trie.popularity_of("file2.txt", 1) == 2.0
+    assert trie.popularity_of("missing.txt", 1) == 0.0
+
+
+def test_clicks_promote_lines(trie):
+    assert trie.record_click("file2.txt", 2)
+    assert trie.record_click("file2.txt", 2)
+    assert not trie.record_click("missing.txt", 1)
+
+    assert trie.search("how to") == [("file2.txt", 2), ("file1.txt", 2)]
+    assert trie.search("how to s", prefix=True) == [("file2.txt", 2)]
+    assert trie.search("to", prefix=True) == [("file2.txt", 2), ("file1.txt", 2)]
+    assert SearchSession(trie).update("how to") == trie.search_spans("how to")
+    assert [result[1:3] for result in trie.search_ranked("how to")] == [("file2.txt", 2), ("file1.txt", 2)]
+
+
+def test_top_completions_are_kept_for_paths_with_many_postings(trie):
+    assert trie.precompute_top_completions(min_postings=4) == 3  # "how", "how to" and "to"
+    assert trie.search("how to") == [("file1.txt", 2), ("file2.txt", 1)]
+
+    # Kept selections are dropped once the popularity or the trie changes.
+    trie.record_click("file2.txt", 2)
+    trie.record_click("file2.txt", 2)
+    assert trie.search("how to") == [("file2.txt", 2), ("file1.txt", 2)]
+    trie.insert_sentence("how to cook rice", "file3.txt", 1)
+    trie.insert_sentence("How to cook rice.", "file3.txt", 2)
+    assert trie.search("how to") == [("file1.txt", 1), ("file3.txt", 1)]
+
+
+def test_clicks_only_drop_the_kept_top_completions_holding_their_line(trie):
+    trie.precompute_top_completions(min_postings=1)
+    trie.record_click("file2.txt", 2)
+    trie.record_click("file2.txt", 2)
+    trie.metrics = Metrics()
+
+    assert trie.search("how to") == [("file2.txt", 2), ("file1.txt", 2)]
+    assert trie.metrics.counters.get('trie.top_completion_hits', 0) == 0
+    assert trie.search("learn python") == [("file1.txt", 2), ("file2.txt", 1)]
+    assert trie.metrics.counters['trie.top_completion_hits'] == 1
+
+
+def test_removing_a_file_forgets_its_lines(trie):
+    trie.record_click("file1.txt", 1)
+    trie.remove_file("file1.txt")
+
+    assert trie.popularity_of("file2.txt", 1) == 1.0
+    assert trie.popularity.is_uniform()
+
+
+def test_snapshot_keeps_popularity(tmp_path):
+    dataset = tmp_path / 'Dataset'
+    dataset.mkdir()
+    (dataset / 'file1.txt').write_text("how to cook rice\nhow to sew\n", encoding='utf-8')
+    (dataset / 'file2.txt').write_text("how to read\nHow to sew!\n", encoding='utf-8')
+    trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(dataset))
+    processor.process_files(word_trie=trie)
+    snapshot_path = str(tmp_path / 'trie.snapshot')
+    save_snapshot(trie, processor.line_index, snapshot_path)
+
+    loaded_trie, _ = load_snapshot(snapshot_path)
+    parallel_trie, _ = TextDatasetProcessor(dataset_directory=str(dataset)).process_files_parallel(workers=2)
+
+    expected = sorted([(str(dataset / 'file1.txt'), 2), (str(dataset / 'file2.txt'), 2)],
+                      key=lambda match: trie.file_ids[match[0]])
+    assert trie.search("how to")[:2] == expected
+    assert loaded_trie.search("how to")[:2] == expected
+    assert parallel_trie.search("how to")[:2] == expected
+    assert loaded_trie.popularity_of(str(dataset / 'file2.txt'), 2) == 2.0
+
+
+def test_read_click_log(tmp_path):
+    log = tmp_path / 'clicks.tsv'
+    log.write_text("# timestamp\tfile\tline\n1700000000.5\tfile1.txt\t3\n\n", encoding='utf-8')
+    assert list(read_click_log(str(log))) == [(1700000000.5, "file1.txt", 3)]
+
+    log.write_text("1700000000 file1.txt 3\n", encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(read_click_log(str(log)))
+
+
+@pytest.mark.parametrize("engine", ['trie', 'suffix_array'])
+def test_coordinator_orders_equal_scores_by_popularity(tmp_path, engine):
+    dataset = tmp_path / 'Dataset'
+    dataset.mkdir()
+    (dataset / 'file1.txt').write_text("how to cook rice\nhow to read\nhow to sew\nHow to read!\n", encoding='utf-8')
+    file1 = str(dataset / 'file1.txt')
+    log = tmp_path / 'clicks.tsv'
+    log.write_text(f"1700000000\t{file1}\t3\n1700000000\t{file1}\t3\n1700000000\t{file1}\t3\n", encoding='utf-8')
+
+    coordinator = CompletionCoordinator(str(dataset), max_matches=3, engine=engine)
+    coordinator.build_trie()
+    suggestions = coordinator.get_suggestions("how to")
+    assert [suggestion.offset for suggestion in suggestions] == [2, 4, 1]
+    assert [suggestion.popularity for suggestion in suggestions] == [2.0, 2.0, 1.0]
+
+    coordinator.trie.popularity.half_life = None
+    assert coordinator.load_click_log(str(log)) == 3
+    suggestions = coordinator.get_suggestions("how to")
+    assert [suggestion.offset for suggestion in suggestions] == [3, 2, 4]
+
+    coordinator.record_click(suggestions[2])
+    assert [suggestion.offset for suggestion in coordinator.get_suggestions("how to")] == [3, 4, 2]
@@ -0,0 +1,33 @@
+from data_structure.postings import contains_posting, pack_posting, union_postings, unpack_posting
+
+
+def test_pack_and_unpack_posting():
+    key = pack_posting(3, 42)
+
+    assert unpack_posting(key) == (3, 42)
+    assert pack_posting(2, 1000) < key < pack_posting(3, 43)
+
+
+def test_contains_posting():
+    postings = [1, 3, 5, 40]
+
+    assert contains_posting(postings, 5)
+    assert not contains_posting(postings, 4)
+    assert not contains_posting(postings, 41)
+    assert not contains_posting([], 1)
+
+
+def test_union_postings():
+    keys, offsets = union_postings([[1, 4, 8], [2, 4, 9], [3]], [[10, 40, 80], [20, 41, 90], [30]])
+
+    assert keys == [1, 2, 3, 4, 8, 9]
+    assert offsets == [10, 20, 30, 40, 80, 90]
+
+
+def test_union_postings_keeps_the_earliest_offset_of_a_shared_key():
+    assert union_postings([[4, 8], [4]], [[40, 80], [12]]) == ([4, 8], [12, 80])
+
+
+def test_union_postings_stops_at_limit():
+    assert union_postings([[1, 4, 8], [2, 4, 9]], [[0, 0, 0], [0, 0, 0]], limit=4) == ([1, 2, 4, 8], [0, 0, 0, 0])
+    assert union_postings([[1, 4, 8]], [[5, 6, 7]], limit=2) == ([1, 4], [5, 6])
@@ -0,0 +1,77 @@
+import pytest
+from data_structure.search_session import SearchSession
+from data_structure.word_trie import WordTrie
+
+
+@pytest.fixture
+def sample_trie() -> WordTrie:
+    trie = WordTrie()
+    trie.insert_sentence("this is a test", "file1.txt", 1)
+    trie.insert_sentence("this is another example", "file1.txt", 2)
+    trie.insert_sentence("learning python is fun", "file2.txt", 1)
+    trie.insert_sentence("how to cook pasta", "file3.txt", 3)
+    trie.insert_sentence("how to cool down", "file3.txt", 5)
+    trie.insert_sentence("how to learn python", "file3.txt", 4)
+    return trie
+
+
+@pytest.mark.parametrize("words", [
+    ["how", "to", "learn", "python"],
+    ["this", "is", "anothr", "example"],
+    ["how", "to", "coo", "down"],
+    ["how", "to", "coo", "pasta"],
+    ["learning", "pythn", "is"],
+    ["how", "missing", "to"],
+])
+def test_session_matches_full_search_after_every_word(sample_trie, words):
+    session = SearchSession(sample_trie)
+    prompt = ""
+    for word in words:
+        prompt += word + " "
+        assert session.extend(word + " ") == sample_trie.search_spans(prompt), prompt
+
+
+@pytest.mark.parametrize("prompts", [
+    ["h", "ho", "how", "how ", "how t", "how to ", "how to c", "how to coo", "how to cool", "how to cool d"],
+    ["th", "this is an", "this is a", "lear", "learning pythn i"],
+    ["how to x", "how to l", "how to learn "],
+])
+def test_session_completes_the_last_word_like_full_search(sample_trie, prompts):
+    session = SearchSession(sample_trie)
+    for prompt in prompts:
+        assert session.update(prompt, prefix=True) == sample_trie.search_spans(prompt, prefix=True), prompt
+
+
+def test_typo_is_resolved_again_when_the_next_word_arrives(sample_trie):
+    session = SearchSession(sample_trie)
+
+    assert session.update("how to coo") == [("file3.txt", 3, 0)]
+    assert session.update("how to coo down") == [("file3.txt", 5, 0)]
+
+
+def test_edited_prompt_reuses_only_the_shared_words(sample_trie):
+    session = SearchSession(sample_trie)
+    session.update("how to cook pasta")
+
+    assert session.update("how to learn") == [("file3.txt", 4, 0)]
+    assert session.update("this is") == [("file1.txt", 1, 0), ("file1.txt", 2, 0)]
+
+
+def test_reset_drops_the_prompt(sample_trie):
+    session = SearchSession(sample_trie)
+    session.extend("how to ")
+    session.reset()
+
+    assert session.prompt == ""
+    assert session.extend("python") == sample_trie.search_spans("python")
+
+
+def test_session_sees_changes_to_the_trie(sample_trie):
+    session = SearchSession(sample_trie)
+    assert session.update("how to learn") == [("file3.txt", 4, 0)]
+
+    sample_trie.insert_sentence("how to learn rust", "file4.txt", 1)
+    assert session.update("how to learn") == [("file3.txt", 4, 0), ("file4.txt", 1, 0)]
+
+    sample_trie.remove_file("file3.txt")
+    assert session.update("how to learn") == [("file4.txt", 1, 0)]
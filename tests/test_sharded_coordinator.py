@@ -0,0 +1,66 @@
+import asyncio
+import time
+import pytest
+from completion_coordinator import CompletionCoordinator
+from sharded_coordinator import ShardedCoordinator, spawn_shards, stop_shards
+from text_processor.text_processor import TextDatasetProcessor
+from utils.functions import shard_of
+
+
+@pytest.fixture
+def dataset_dir(tmp_path):
+    dataset = tmp_path / 'dataset'
+    dataset.mkdir()
+    for i in range(6):
+        (dataset / f'file{i}.txt').write_text(f"how to learn python {i}\nhow to cook pasta {i}\n", encoding='utf-8')
+    return str(dataset)
+
+
+@pytest.fixture
+def shards(dataset_dir):
+    processes = spawn_shards(dataset_dir, 2)
+    yield [address for _, address in processes]
+    stop_shards([process for process, _ in processes])
+
+
+def test_shards_partition_the_files(dataset_dir):
+    everything = sorted(TextDatasetProcessor(dataset_dir).list_files())
+    parts = [TextDatasetProcessor(dataset_dir, (i, 3)).list_files() for i in range(3)]
+
+    assert sorted(path for part in parts for path in part) == everything
+    assert shard_of('sub/file1.txt', 3) == shard_of('sub/file1.txt', 3)
+
+
+def test_merged_suggestions_match_a_single_index(dataset_dir, shards):
+    single = CompletionCoordinator(dataset_dir, max_matches=20)
+    single.build_trie()
+    coordinator = ShardedCoordinator(shards, max_matches=3, deadline=5)
+
+    expected = sorted(single.get_suggestions("how to lern"), key=lambda s: (-s.score, s.source_text, s.offset))[:3]
+    assert coordinator.get_suggestions("how to lern") == expected
+    by_rank = lambda s: (-s.score, s.source_text, s.offset)
+    assert coordinator.get_suggestions("how to le", prefix=True) == \
+        sorted(single.get_suggestions("how to le", prefix=True), key=by_rank)[:3]
+    assert coordinator.timeouts == [0, 0] and coordinator.errors == [0, 0]
+
+
+def test_slow_and_dead_shards_are_left_out(dataset_dir, shards):
+    async def stall(reader, writer):
+        await asyncio.sleep(10)
+
+    async def run():
+        slow_server = await asyncio.start_server(stall, '127.0.0.1', 0)
+        slow_shard = ('127.0.0.1', slow_server.sockets[0].getsockname()[1])
+        dead_shard = ('127.0.0.1', 1)
+        coordinator = ShardedCoordinator([shards[0], slow_shard, dead_shard], deadline=0.5)
+        start = time.perf_counter()
+        suggestions = await coordinator.get_suggestions_async("cook pasta")
+        elapsed = time.perf_counter() - start
+        slow_server.close()
+        return coordinator, suggestions, elapsed
+
+    coordinator, suggestions, elapsed = asyncio.run(run())
+
+    assert elapsed < 2
+    assert coordinator.timeouts == [0, 1, 0] and coordinator.errors == [0, 0, 1]
+    assert all(shard_of(suggestion.source_text.rsplit('/', 1)[1], 2) == 0 for suggestion in suggestions)
@@ -0,0 +1,69 @@
+import itertools
+import pytest
+from text_processor.string_matcher import StringMatcher
+from utils.consts import Typo
+
+
+def reference_check_typo(str_before, str_after):
+    """Check for a typo by trying every position, as a slow but obvious reference."""
+    if str_before == str_after:
+        return Typo.MATCH, None
+    if len(str_before) == len(str_after):
+        mismatches = [i for i in range(len(str_before)) if str_before[i] != str_after[i]]
+        return (Typo.SWITCH, mismatches[0]) if len(mismatches) == 1 else (Typo.INVALID, None)
+    for i in range(len(str_before)):
+        if str_before[:i] + str_before[i + 1:] == str_after:
+            return Typo.ADD, i
+    for i in range(len(str_after)):
+        if str_after[:i] + str_after[i + 1:] == str_before:
+            return Typo.MISS, i
+    return Typo.INVALID, None
+
+
+def all_strings(max_length):
+    for length in range(max_length + 1):
+        for letters in itertools.product("ab", repeat=length):
+            yield "".join(letters)
+
+
+def test_check_typo_matches_reference():
+    matcher = StringMatcher()
+    words = list(all_strings(5))
+
+    for str_before, str_after in itertools.product(words, repeat=2):
+        assert matcher.check_typo(str_before, str_after) == reference_check_typo(str_before, str_after)
+
+
+@pytest.mark.parametrize("str_before, str_after, expected", [
+    ("cook", "cook", 8),
+    ("cook", "cool", 6 - 2),
+    ("cook", "book", 6 - 5),
+    ("cookk", "cook", 8 - 4),
+    ("cook", "coook", 6 - 8),
+    ("cook", "pasta", -100),
+])
+def test_calculate_score(str_before, str_after, expected):
+    assert StringMatcher().calculate_score(str_before, str_after) == expected
+
+
+def test_calculate_edit_score_drops_with_every_edit():
+    matcher = StringMatcher()
+
+    assert matcher.calculate_edit_score("how to cook", "how to cook", 0) == 2 * len("how to cook")
+    assert matcher.calculate_edit_score("how to cok", "how to cook", 1) == matcher.calculate_score("how to cok", "how to cook")
+    scores = [matcher.calculate_edit_score("how to cok", "how to cook", edits) for edits in range(1, 5)]
+    assert scores == sorted(scores, reverse=True) and len(set(scores)) == 4
+
+
+@pytest.mark.parametrize("str_before, str_after, max_edits, expected", [
+    ("cook", "cook", 0, True),
+    ("cook", "cool", 0, False),
+    ("cook", "cool", 1, True),
+    ("lern", "learn", 1, True),
+    ("pyton", "python", 1, True),
+    ("coko", "cook", 1, False),
+    ("coko", "cook", 2, True),
+    ("cook", "pasta", 2, False),
+])
+def test_within_edits(str_before, str_after, max_edits, expected):
+    assert StringMatcher.within_edits(str_before, str_after, max_edits) is expected
@@ -0,0 +1,104 @@
+import pytest
+from data_structure.suffix_array_index import SuffixArrayIndex
+from data_structure.word_trie import WordTrie
+
+
+SENTENCES = [
+    ("this is a test", "file1.txt", 1),
+    ("this is another example", "file1.txt", 2),
+    ("learning python is fun", "file2.txt", 1),
+    ("how to cook pasta", "file3.txt", 3),
+    ("how to learn python", "file3.txt", 4),
+    ("to be or not to be", "file4.txt", 1),
+]
+
+
+@pytest.fixture
+def indexes():
+    suffix_array = SuffixArrayIndex()
+    trie = WordTrie()
+    for sentence in SENTENCES:
+        suffix_array.insert_sentence(*sentence)
+        trie.insert_sentence(*sentence)
+    return suffix_array, trie
+
+
+@pytest.mark.parametrize("prompt", ["how to", "this is", "python", "to be", "is", "hw to", "learn pythn", "nothing", ""])
+def test_search_matches_word_trie(indexes, prompt):
+    suffix_array, trie = indexes
+
+    assert suffix_array.search_spans(prompt) == trie.search_spans(prompt)
+
+
+@pytest.mark.parametrize("prompt", ["how to l", "how to", "learning pyt", "th", "t", "how to cok", "how to learn ",
+                                    "how to x", "to be or n", "hw to c", ""])
+def test_prefix_search_matches_word_trie(indexes, prompt):
+    suffix_array, trie = indexes
+
+    assert suffix_array.search_spans(prompt, prefix=True) == trie.search_spans(prompt, prefix=True)
+
+    suffix_array.record_click("file3.txt", 4)
+    trie.record_click("file3.txt", 4)
+    assert suffix_array.search_spans(prompt, prefix=True) == trie.search_spans(prompt, prefix=True)
+
+
+def test_lcp_counts_shared_leading_tokens(indexes):
+    suffix_array, _ = indexes
+    suffix_array.search("to")
+
+    for i in range(1, len(suffix_array.suffix_array)):
+        previous, current = suffix_array.suffix_array[i - 1], suffix_array.suffix_array[i]
+        shared = 0
+        while suffix_array.tokens[previous + shared] == suffix_array.tokens[current + shared] != 0:
+            shared += 1
+        assert suffix_array.lcp[i] >= shared
+
+
+def test_insert_after_search_rebuilds(indexes):
+    suffix_array, _ = indexes
+    assert suffix_array.search("new sentence") == []
+
+    suffix_array.insert_sentence("a new sentence", "file5.txt", 1)
+
+    assert suffix_array.search_spans("new sentence") == [("file5.txt", 1, 2)]
+
+
+def test_search_with_lines_inserted_out_of_order():
+    suffix_array = SuffixArrayIndex()
+    trie = WordTrie()
+    for sentence in reversed(SENTENCES):
+        suffix_array.insert_sentence(*sentence)
+        trie.insert_sentence(*sentence)
+
+    for prompt in ["how to", "this is", "to be", "is"]:
+        assert suffix_array.search_spans(prompt) == trie.search_spans(prompt)
+
+
+@pytest.mark.parametrize("prompt", ["how to", "how to cook", "hiw to", "learn pythn", "is", "hew ta cook", "nothing", ""])
+def test_search_ranked_matches_word_trie(indexes, prompt):
+    suffix_array, trie = indexes
+
+    assert sorted(suffix_array.search_ranked(prompt)) == sorted(trie.search_ranked(prompt))
+
+
+def test_search_ranked_reports_each_line_once_with_its_best_score():
+    suffix_array = SuffixArrayIndex(max_matches=2)
+    suffix_array.insert_sentence("how to cool", "file1.txt", 1)
+    suffix_array.insert_sentence("how to cook and how to cool", "file1.txt", 2)
+    suffix_array.insert_sentence("how to cook", "file1.txt", 3)
+
+    assert suffix_array.search_ranked("how to cook") == [(22, "file1.txt", 2, 0), (22, "file1.txt", 3, 0)]
+
+
+def test_remove_file_drops_its_lines(indexes):
+    suffix_array, trie = indexes
+    suffix_array.search("how to")
+
+    suffix_array.remove_file("file3.txt")
+    trie.remove_file("file3.txt")
+    suffix_array.remove_file("missing.txt")
+
+    for prompt in ["how to", "python", "to be", "is"]:
+        assert suffix_array.search_spans(prompt) == trie.search_spans(prompt)
+    suffix_array.insert_sentence("how to sew", "file3.txt", 1)
+    assert suffix_array.search_spans("how to") == [("file3.txt", 1, 0)]
@@ -1,7 +1,10 @@
+import gzip
 import pytest
 import os
 from unittest import mock
+from data_structure.line_index import LineIndex
 from data_structure.word_trie import WordTrie
+from text_processor import text_processor
 from text_processor.text_processor import TextDatasetProcessor
 
 
@@ -66,3 +69,193 @@ def test_insert_multiple_sentences(mock_open):
     ]
     assert word_trie.search('one') == [('Dataset/subfolder/file1.txt', 1)]
     assert word_trie.search('two') == [('Dataset/subfolder/file1.txt', 2)]
+
+
+def test_line_index_serves_lines_by_offset(tmp_path):
+    file_path = tmp_path / 'file1.txt'
+    file_path.write_bytes('first line\r\nsecond – line\nthird line\n'.encode('utf-8'))
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path))
+
+    processor.process_files(word_trie=word_trie)
+
+    assert processor.line_index.get_line(str(file_path), 1) == 'first line'
+    assert processor.line_index.get_line(str(file_path), 2) == 'second – line'
+    assert processor.line_index.get_line(str(file_path), 3) == 'third line'
+    assert processor.line_index.get_line(str(file_path), 4) is None
+
+
+def test_process_files_parallel_matches_sequential_build(tmp_path):
+    for i in range(4):
+        (tmp_path / f'file{i}.txt').write_text(f"how to learn python {i}\nhow to sew\nlearn to cook {i}\n", encoding='utf-8')
+    sequential_trie = WordTrie(max_matches=10)
+    sequential = TextDatasetProcessor(dataset_directory=str(tmp_path))
+    sequential_stats = sequential.process_files(word_trie=sequential_trie)
+    parallel = TextDatasetProcessor(dataset_directory=str(tmp_path))
+
+    parallel_trie, parallel_stats = parallel.process_files_parallel(workers=2, max_matches=10)
+
+    for prompt in ['how to', 'learn to cook', 'sew', 'python 3', 'hiw to', 'lern to']:
+        assert parallel_trie.search(prompt) == sequential_trie.search(prompt)
+    for prompt in ['how to le', 'learn to c', 'p']:
+        assert parallel_trie.search(prompt, prefix=True) == sequential_trie.search(prompt, prefix=True)
+    assert parallel.line_index.get_line(str(tmp_path / 'file3.txt'), 3) == 'learn to cook 3'
+    assert (parallel_stats.files, parallel_stats.lines, parallel_stats.bytes) == (4, 12, sequential_stats.bytes)
+    assert parallel_stats.workers == 2
+
+
+def test_sync_applies_added_updated_and_removed_files(tmp_path):
+    (tmp_path / 'file1.txt').write_text("how to learn python\nhow to sew\n", encoding='utf-8')
+    (tmp_path / 'file2.txt').write_text("how to cook pasta\n", encoding='utf-8')
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path))
+    processor.process_files(word_trie=word_trie)
+    file1, file2, file3 = (str(tmp_path / f'file{i}.txt') for i in range(1, 4))
+
+    (tmp_path / 'file1.txt').write_text("how to learn rust\n", encoding='utf-8')
+    os.remove(file2)
+    (tmp_path / 'file3.txt').write_text("learn to sew\n", encoding='utf-8')
+    added, updated, removed = processor.sync(word_trie=word_trie)
+
+    assert (added, updated, removed) == ([file3], [file1], [file2])
+    assert word_trie.search('how to') == [(file1, 1)]
+    assert word_trie.search('learn python') == []
+    assert word_trie.search('cook pasta') == []
+    assert word_trie.search('sew') == [(file3, 1)]
+    assert processor.line_index.get_line(file1, 1) == 'how to learn rust'
+    assert processor.sync(word_trie=word_trie) == ([], [], [])
+
+
+def test_sync_skips_unreadable_files_until_they_can_be_read(tmp_path, monkeypatch):
+    (tmp_path / 'file1.txt').write_text("how to learn python\n", encoding='utf-8')
+    (tmp_path / 'file2.txt').write_text("how to cook pasta\n", encoding='utf-8')
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path))
+    processor.process_files(word_trie=word_trie)
+    file1, file2, file3 = (str(tmp_path / f'file{i}.txt') for i in range(1, 4))
+
+    readable = text_processor.open_text
+    unreadable = {file1, file3}
+
+    def open_text(file_path, *args, **kwargs):
+        if file_path in unreadable:
+            raise PermissionError(file_path)
+        return readable(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(text_processor, 'open_text', open_text)
+    (tmp_path / 'file1.txt').write_text("how to learn rust\n", encoding='utf-8')
+    (tmp_path / 'file3.txt').write_text("learn to sew\n", encoding='utf-8')
+    file_state = TextDatasetProcessor._file_state
+    monkeypatch.setattr(TextDatasetProcessor, '_file_state',
+                        staticmethod(lambda file_path: None if file_path == file2 else file_state(file_path)))
+
+    assert processor.sync(word_trie=word_trie) == ([], [], [file2, file1])
+    assert word_trie.search('how to') == []
+    assert word_trie.search('sew') == []
+
+    unreadable.clear()
+    monkeypatch.undo()
+    added, updated, removed = processor.sync(word_trie=word_trie)
+
+    assert (sorted(added), updated, removed) == ([file1, file2, file3], [], [])
+    assert sorted(word_trie.search('how to')) == [(file1, 1), (file2, 1)]
+    assert word_trie.search('sew') == [(file3, 1)]
+
+
+def test_line_index_serves_many_lines_in_one_pass(tmp_path):
+    file_path = tmp_path / 'file1.txt'
+    file_path.write_text("first line\nsecond line\nthird line\nfourth line\n", encoding='utf-8')
+    processor = TextDatasetProcessor(str(tmp_path))
+    processor.process_files(WordTrie())
+
+    expected = {1: 'first line', 2: 'second line', 4: 'fourth line', 9: None}
+    assert processor.line_index.get_lines(str(file_path), [4, 1, 2, 9, 1]) == expected
+    assert LineIndex().get_lines(str(file_path), [4, 1, 2, 9]) == expected
+
+
+def test_process_files_reads_gzip_files(tmp_path):
+    file_path = tmp_path / 'file1.txt.gz'
+    with gzip.open(file_path, 'wt', encoding='utf-8') as file:
+        file.write("how to learn python\nhow to sew\n")
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path))
+
+    stats = processor.process_files(word_trie=word_trie)
+
+    assert word_trie.search('how to') == [(str(file_path), 1), (str(file_path), 2)]
+    assert processor.line_index.get_line(str(file_path), 2) == 'how to sew'
+    assert (stats.lines, stats.bytes) == (2, len("how to learn python\nhow to sew\n"))
+
+
+def test_compressed_files_are_decompressed_once_to_serve_lines(tmp_path, monkeypatch):
+    file_path = str(tmp_path / 'file1.txt.gz')
+    with gzip.open(file_path, 'wt', encoding='utf-8') as file:
+        file.writelines(f"line {i}\n" for i in range(1, 101))
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path))
+    processor.process_files(word_trie=WordTrie())
+    opened = []
+    open_gzip = lambda path: opened.append(path) or gzip.open(path, 'rb')
+    monkeypatch.setattr('data_structure.line_index.open_binary', open_gzip)
+    line_index = processor.line_index
+
+    assert [line_index.get_line(file_path, n) for n in (90, 3, 50)] == ['line 90', 'line 3', 'line 50']
+    assert line_index.get_lines(file_path, [100, 1, 2]) == {1: 'line 1', 2: 'line 2', 100: 'line 100'}
+    assert opened == [file_path]
+
+    copy_path = line_index._decompressed[file_path]
+    line_index.remove_file(file_path)
+    assert not os.path.exists(copy_path)
+
+
+@pytest.mark.parametrize('errors, expected', [('replace', [1, 2, 3]), ('skip', [1, 3])])
+def test_process_files_handles_invalid_utf8(tmp_path, errors, expected):
+    file_path = tmp_path / 'file1.txt'
+    file_path.write_bytes(b"how to learn\nhow \xff to sew\nhow to cook\n")
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path), errors=errors)
+
+    stats = processor.process_files(word_trie=word_trie)
+
+    assert [line for _, line in word_trie.search('how')] == expected
+    assert stats.invalid_lines == 1
+    assert processor.line_index.get_line(str(file_path), 2) == 'how � to sew'
+    assert processor.line_index.get_line(str(file_path), 3) == 'how to cook'
+
+
+def test_process_files_strict_rejects_invalid_utf8(tmp_path):
+    (tmp_path / 'file1.txt').write_bytes(b"how to learn\nhow \xff to sew\n")
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path), errors='strict')
+
+    with pytest.raises(UnicodeDecodeError):
+        processor.process_files(word_trie=WordTrie())
+    with pytest.raises(ValueError):
+        TextDatasetProcessor(dataset_directory=str(tmp_path), errors='ignore')
+
+
+def test_process_files_reports_progress(tmp_path):
+    (tmp_path / 'file1.txt').write_text("a b\nc d\ne f\n", encoding='utf-8')
+    (tmp_path / 'file2.txt').write_text("g h\ni j\nk l\n", encoding='utf-8')
+    reports = []
+    processor = TextDatasetProcessor(dataset_directory=str(tmp_path), batch_lines=2, progress=reports.append)
+
+    stats = processor.process_files(word_trie=WordTrie())
+
+    assert [(report.files, report.lines) for report in reports] == [(0, 2), (0, 3), (1, 3), (1, 5), (1, 6), (2, 6)]
+    assert (reports[-1].lines, reports[-1].bytes) == (stats.lines, stats.bytes)
+
+
+def test_process_files_parallel_records_file_states_invalid_lines_and_progress(tmp_path):
+    (tmp_path / 'file1.txt').write_bytes(b"how to learn\nhow \xff to sew\n")
+    (tmp_path / 'file2.txt').write_text("how to cook\n", encoding='utf-8')
+    reports = []
+    sequential = TextDatasetProcessor(dataset_directory=str(tmp_path))
+    sequential.process_files(word_trie=WordTrie())
+    parallel = TextDatasetProcessor(dataset_directory=str(tmp_path), progress=reports.append)
+
+    _, stats = parallel.process_files_parallel(workers=2)
+
+    assert parallel.file_states == sequential.file_states
+    assert parallel.invalid_lines == sequential.invalid_lines == {str(tmp_path / 'file1.txt'): 1}
+    assert stats.invalid_lines == 1
+    assert sorted((report.files, report.lines) for report in reports)[-1] == (2, 3)
+    assert (reports[-1].bytes, reports[-1].invalid_lines) == (stats.bytes, 1)
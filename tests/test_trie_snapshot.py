@@ -0,0 +1,129 @@
+import pytest
+from data_structure.trie_snapshot import SnapshotError, load_snapshot, save_snapshot
+from data_structure.word_trie import WordTrie
+from text_processor.text_processor import TextDatasetProcessor
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    dataset_dir = tmp_path / 'Dataset'
+    dataset_dir.mkdir()
+    (dataset_dir / 'file1.txt').write_text("how to learn python\nhow to sew\nlearn to cook\n", encoding='utf-8')
+    (dataset_dir / 'file2.txt').write_text("how to cook pasta\nthis is a test\n", encoding='utf-8')
+    return dataset_dir
+
+
+@pytest.fixture
+def built(dataset, tmp_path):
+    word_trie = WordTrie()
+    processor = TextDatasetProcessor(dataset_directory=str(dataset))
+    processor.process_files(word_trie=word_trie)
+    snapshot_path = str(tmp_path / 'trie.snapshot')
+    save_snapshot(word_trie, processor.line_index, snapshot_path)
+    return word_trie, processor, snapshot_path
+
+
+@pytest.mark.parametrize("prompt", ["how to", "to cook", "learn", "hiw to", "this is a tst", "lern", "missing"])
+def test_loaded_snapshot_searches_like_the_built_trie(built, prompt):
+    word_trie, processor, snapshot_path = built
+
+    loaded_trie, _ = load_snapshot(snapshot_path, processor.list_files())
+
+    assert loaded_trie.search(prompt) == word_trie.search(prompt)
+    assert loaded_trie.search_ranked(prompt) == word_trie.search_ranked(prompt)
+
+
+def test_loaded_snapshot_serves_lines(built):
+    _, processor, snapshot_path = built
+
+    _, line_index = load_snapshot(snapshot_path)
+
+    for file_path in processor.list_files():
+        assert line_index.get_line(file_path, 2) == processor.line_index.get_line(file_path, 2)
+
+
+def test_loaded_snapshot_is_read_only(built):
+    _, _, snapshot_path = built
+
+    loaded_trie, _ = load_snapshot(snapshot_path)
+
+    with pytest.raises(TypeError):
+        loaded_trie.insert_sentence("new line", "file3.txt", 1)
+
+
+def test_materialized_snapshot_takes_changes(built):
+    word_trie, processor, snapshot_path = built
+    loaded_trie, _ = load_snapshot(snapshot_path)
+    file1, file2 = sorted(processor.list_files())
+    loaded_trie.record_click(file2, 1)
+    loaded_trie.record_click(file2, 1)
+
+    assert loaded_trie.materialize()
+    assert not loaded_trie.materialize()
+    assert loaded_trie.search("how to") == [(file2, 1), (file1, 1), (file1, 2)]
+    assert loaded_trie.search("lern") == word_trie.search("lern")
+
+    loaded_trie.remove_file(file2)
+    loaded_trie.insert_sentence("how to sew", file2, 1)
+    assert loaded_trie.search("how to") == [(file1, 2), (file2, 1), (file1, 1)]
+    assert loaded_trie.popularity_of(file1, 2) == 2.0
+
+
+@pytest.mark.parametrize("prompt", ["how to l", "how to c", "h", "learn to co", "cook pas", "how to x", "zz"])
+def test_loaded_snapshot_completes_prefixes_like_the_built_trie(built, prompt):
+    word_trie, processor, snapshot_path = built
+
+    loaded_trie, _ = load_snapshot(snapshot_path, processor.list_files())
+
+    assert loaded_trie.search_spans(prompt, prefix=True) == word_trie.search_spans(prompt, prefix=True)
+
+def test_snapshot_is_rejected_when_a_file_changes(built, dataset):
+    _, processor, snapshot_path = built
+
+    with open(dataset / 'file2.txt', 'a', encoding='utf-8') as file:
+        file.write("one more line\n")
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path, processor.list_files())
+
+
+def test_snapshot_is_rejected_when_a_file_is_added(built, dataset):
+    _, processor, snapshot_path = built
+
+    (dataset / 'file3.txt').write_text("new file\n", encoding='utf-8')
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path, processor.list_files())
+
+
+def test_snapshot_of_a_deleted_file_is_saved_but_rejected(built, dataset):
+    word_trie, processor, snapshot_path = built
+
+    (dataset / 'file2.txt').unlink()
+    save_snapshot(word_trie, processor.line_index, snapshot_path)
+    (dataset / 'file2.txt').write_text("how to cook pasta\nthis is a test\n", encoding='utf-8')
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(snapshot_path, processor.list_files())
+    assert load_snapshot(snapshot_path)[0].search("how to cook") == word_trie.search("how to cook")
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    snapshot_path = tmp_path / 'trie.snapshot'
+    snapshot_path.write_bytes(b'not a snapshot')
+
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(snapshot_path))
+
+
+def test_snapshot_word_table_is_a_sorted_vocabulary(built):
+    word_trie, processor, snapshot_path = built
+
+    loaded_trie, _ = load_snapshot(snapshot_path)
+    vocabulary = loaded_trie.vocabulary
+
+    assert list(vocabulary.iter_words()) == sorted(word_trie.vocabulary.iter_words())
+    assert len(vocabulary) == len(word_trie.vocabulary)
+    assert vocabulary.word(vocabulary.id_of("python")) == "python"
+    low, high = vocabulary.id_range("t")
+    assert [vocabulary.word(word_id) for word_id in range(low, high)] == ["test", "this", "to"]
@@ -0,0 +1,64 @@
+import pytest
+from text_processor.string_matcher import StringMatcher
+from text_processor.typo_index import TypoIndex
+from utils.consts import Typo
+
+
+VOCABULARY = ["how", "hot", "show", "ho", "hw", "cook", "cool", "book", "coo", "cooks", "python", "pythons", "a", "i"]
+
+
+@pytest.fixture
+def typo_index() -> TypoIndex:
+    index = TypoIndex()
+    for word in VOCABULARY:
+        index.add(word)
+    return index
+
+
+@pytest.mark.parametrize("word", ["how", "hwo", "hoe", "cok", "cooky", "pyton", "b", "xyz", ""])
+def test_candidates_match_a_full_scan(typo_index, word):
+    matcher = StringMatcher()
+    expected = {candidate for candidate in VOCABULARY
+                if matcher.check_typo(word, candidate)[0] in (Typo.SWITCH, Typo.ADD, Typo.MISS)}
+
+    assert set(typo_index.candidates(word)) == expected
+
+
+def test_candidates_are_ordered_by_score(typo_index):
+    matcher = StringMatcher()
+
+    scores = [matcher.calculate_score("cook", candidate) for candidate in typo_index.candidates("cook")]
+
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_sources_are_added_on_first_lookup():
+    index = TypoIndex()
+    index.add_source(lambda: iter(["pasta"]))
+
+    assert index.words == set()
+    assert index.candidates("pastas") == ["pasta"]
+
+
+def levenshtein(a: str, b: str) -> int:
+    row = list(range(len(b) + 1))
+    for i, char in enumerate(a, 1):
+        previous, row = row, [i]
+        for j, other in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (char != other)))
+    return row[-1]
+
+
+@pytest.mark.parametrize("word", ["how", "hwo", "cok", "bok", "pyhton", "cookss", "b", "xyz", ""])
+@pytest.mark.parametrize("max_edits", [0, 1, 2, 3])
+def test_candidates_within_match_a_full_scan(typo_index, word, max_edits):
+    expected = sorted((levenshtein(word, candidate), candidate) for candidate in VOCABULARY
+                      if levenshtein(word, candidate) <= max_edits)
+
+    assert typo_index.candidates_within(word, max_edits) == expected
+
+
+def test_candidates_within_see_words_added_later(typo_index):
+    assert typo_index.candidates_within("pasat", 2) == []
+    typo_index.add("pasta")
+    assert typo_index.candidates_within("pasat", 2) == [(2, "pasta")]
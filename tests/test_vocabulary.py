@@ -0,0 +1,26 @@
+import pytest
+from data_structure.vocabulary import SortedVocabulary, Vocabulary
+
+
+def test_vocabulary_assigns_dense_ids_in_order_of_first_appearance():
+    vocabulary = Vocabulary()
+
+    assert [vocabulary.add(word) for word in ["how", "to", "how", "cook"]] == [0, 1, 0, 2]
+    assert vocabulary.id_of("cook") == 2
+    assert vocabulary.id_of("missing") is None
+    assert vocabulary.word(1) == "to"
+    assert list(vocabulary.iter_words()) == ["how", "to", "cook"]
+    assert len(vocabulary) == 3
+
+
+def test_sorted_vocabulary_finds_ids_and_prefix_ranges():
+    vocabulary = SortedVocabulary(["cook", "cookie", "cool", "how", "to"])
+
+    assert vocabulary.id_of("cool") == 2
+    assert vocabulary.id_of("coo") is None
+    assert vocabulary.id_range("coo") == (0, 3)
+    assert vocabulary.id_range("cooki") == (1, 2)
+    assert vocabulary.id_range("") == (0, 5)
+    assert vocabulary.id_range("x") == (5, 5)
+    with pytest.raises(TypeError):
+        vocabulary.add("new")
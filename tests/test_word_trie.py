@@ -94,4 +94,226 @@ def test_empty_trie_search():
     """
     trie = WordTrie()
     results = trie.search("any query")
-    assert results == [], "Expected empty list when searching in an empty trie"
\ No newline at end of file
+    assert results == [], "Expected empty list when searching in an empty trie"
+
+
+def test_repeated_phrase_is_reported_once():
+    """
+    Test that a line repeating the searched phrase yields a single result.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("to be or not to be", "file1.txt", 1)
+
+    assert trie.search("to be") == [("file1.txt", 1)]
+
+
+def test_search_ranked_prefers_exact_matches():
+    """
+    Test that ranked search returns exact matches before typo matches, regardless of insertion order.
+    """
+    trie = WordTrie(max_matches=2)
+    trie.insert_sentence("how to cool", "file1.txt", 1)
+    trie.insert_sentence("how to cook", "file1.txt", 2)
+    trie.insert_sentence("how to cook pasta", "file1.txt", 3)
+
+    results = trie.search_ranked("how to cook")
+
+    assert results == [(22, "file1.txt", 2, 0), (22, "file1.txt", 3, 0)]
+
+
+def test_search_ranked_orders_typos_by_score():
+    """
+    Test that typo matches are ordered by their score.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("how to cool", "file1.txt", 1)
+    trie.insert_sentence("hew to cook", "file2.txt", 1)
+
+    results = trie.search_ranked("how to cook")
+
+    assert [result[1:3] for result in results] == [("file1.txt", 1), ("file2.txt", 1)]
+    assert results[0][0] > results[1][0]
+
+
+def test_search_ranked_reports_each_line_once():
+    """
+    Test that a line matched through several paths is reported once, with the score of its best match.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("how to cook and how to cool", "file1.txt", 1)
+
+    assert trie.search_ranked("how to cook") == [(22, "file1.txt", 1, 0)]
+
+
+def test_search_ranked_rejects_more_than_one_typo(sample_trie):
+    """
+    Test that ranked search does not return matches with more than one typo.
+    """
+    assert sample_trie.search_ranked("hew ta cook") == []
+
+
+def test_remove_file(sample_trie):
+    """
+    Test that removing a file drops its postings and keeps the other files searchable.
+    """
+    sample_trie.remove_file("file3.txt")
+
+    assert sample_trie.search("how to") == []
+    assert sample_trie.search("learn") == []
+    assert sample_trie.search("python") == [("file2.txt", 1)]
+    assert sample_trie.root.get_child(sample_trie.vocabulary.id_of("how")) is None
+
+
+def test_search_spans_reports_match_offsets():
+    """
+    Test that search spans point at the start of the match, even when the first word repeats earlier in the line.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("To see, or not to be: that is it", "file1.txt", 1)
+
+    assert trie.search_spans("to be") == [("file1.txt", 1, 15)]
+    assert trie.search_spans("or not") == [("file1.txt", 1, 8)]
+
+
+@pytest.mark.parametrize("prompt, expected", [
+    ("how to l", [("file3.txt", 4)]),
+    ("how to", [("file3.txt", 3), ("file3.txt", 4)]),
+    ("learning pyt", [("file2.txt", 1)]),
+    ("th", [("file1.txt", 1), ("file1.txt", 2)]),
+    ("how to cok", [("file3.txt", 3)]),
+    ("how to learn ", [("file3.txt", 4)]),
+    ("how to x", []),
+])
+def test_search_completes_the_last_word_as_a_prefix(sample_trie, prompt, expected):
+    """
+    Test that prefix search completes an unfinished last word, or matches it as a typo when no word starts with it.
+    """
+    assert sample_trie.search(prompt, prefix=True) == expected
+
+
+def test_prefix_search_unions_completions_up_to_max_matches():
+    """
+    Test that the matches of every completion of the last word are combined, up to the maximum number of matches.
+    """
+    trie = WordTrie(max_matches=3)
+    trie.insert_sentence("how to install python", "file1.txt", 1)
+    trie.insert_sentence("how to instance a class", "file1.txt", 2)
+    trie.insert_sentence("how to install and instance", "file1.txt", 3)
+    trie.insert_sentence("how to inspect code", "file2.txt", 1)
+
+    assert trie.search("how to inst", prefix=True) == [("file1.txt", 1), ("file1.txt", 2), ("file1.txt", 3)]
+    assert trie.search("how to ins", prefix=True) == [("file1.txt", 1), ("file1.txt", 2), ("file1.txt", 3)]
+    assert trie.search_spans("to insp", prefix=True) == [("file2.txt", 1, 4)]
+    assert trie.search("how to inst") == []
+
+
+def test_prefix_search_sees_words_inserted_and_removed_later(sample_trie):
+    """
+    Test that prefix search reflects sentences inserted and files removed after earlier searches.
+    """
+    assert sample_trie.search("how to le", prefix=True) == [("file3.txt", 4)]
+
+    sample_trie.insert_sentence("how to lead a team", "file4.txt", 1)
+    assert sample_trie.search("how to le", prefix=True) == [("file3.txt", 4), ("file4.txt", 1)]
+
+    sample_trie.remove_file("file3.txt")
+    assert sample_trie.search("how to le", prefix=True) == [("file4.txt", 1)]
+
+
+def test_trie_edges_are_keyed_by_vocabulary_ids(sample_trie):
+    """
+    Test that trie edges are keyed by the vocabulary ids of their words, with every word stored once.
+    """
+    vocabulary = sample_trie.vocabulary
+    how = sample_trie.root.get_child(vocabulary.id_of("how"))
+
+    assert how.word_id == vocabulary.id_of("how")
+    assert vocabulary.word(how.get_child(vocabulary.id_of("to")).word_id) == "to"
+    assert len(vocabulary) == len(set("this is a test another example learning python fun how to cook pasta learn".split()))
+
+
+def test_edit_budget_search_allows_two_edits_per_word(sample_trie):
+    """
+    Test that the edit budget search allows two edits within a word, within the budget for the whole sentence.
+    """
+    assert sample_trie.search("how to lern pyton") == []
+    assert sample_trie.search_edits("how to lern pyton")[0][1:] == ("file3.txt", 4, 0)
+    assert sample_trie.search_edits("how to lrn python")[0][1:] == ("file3.txt", 4, 0)
+    assert sample_trie.search_edits("how to lrn pyton") == []
+    assert sample_trie.search_edits("how to lrn pyton", max_edits=3)[0][1:] == ("file3.txt", 4, 0)
+    assert sample_trie.search_edits("how to lrn python", max_word_edits=1) == []
+    assert sample_trie.search_edits("how to lrn python", max_edits=0) == []
+
+
+def test_edit_budget_search_orders_matches_by_edits(sample_trie):
+    """
+    Test that the edit budget search reports matches with fewer edits first.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("how to book tickets", "file1.txt", 1)
+    trie.insert_sentence("how to cook rice", "file1.txt", 2)
+    trie.insert_sentence("now to look good", "file1.txt", 3)
+
+    results = trie.search_edits("how to cook")
+    assert [result[1:3] for result in results] == [("file1.txt", 2), ("file1.txt", 1), ("file1.txt", 3)]
+    assert [result[0] for result in results] == [2 * len("how to cook"), 2 * 10 - 1, 2 * (11 - 2) - 2 * 10]
+
+    # Every line is reported once, with the fewest edits any path to it needs.
+    results = sample_trie.search_edits("is", max_edits=2)
+    assert len({result[1:3] for result in results}) == len(results)
+    assert results[0][0] == 2 * len("is")
+
+
+def test_edit_budget_search_backtracks_from_dead_ends():
+    """
+    Test that the edit budget search abandons a close word that leads nowhere for the next best one.
+    """
+    trie = WordTrie()
+    trie.insert_sentence("cat eats fish", "file1.txt", 1)
+    trie.insert_sentence("cart rides home", "file1.txt", 2)
+
+    # "cat" is the closest word to "cart", but only the path through "cart" continues with "ride".
+    assert trie.search_edits("cart ride") == [(trie.matcher.calculate_edit_score("cart ride", "cart rides", 1),
+                                              "file1.txt", 2, 0)]
+    assert trie.search_edits("cat rids hom", max_edits=3)[0][1:3] == ("file1.txt", 2)
+
+
+def test_edit_budget_search_stops_after_max_expansions(sample_trie):
+    """
+    Test that the edit budget search gives up once it has expanded the maximum number of nodes.
+    """
+    # Four nodes, plus the neighbors generated to find the candidates of every word.
+    assert sample_trie.search_edits("how to lern pyton", max_expansions=34) != []
+    assert sample_trie.search_edits("how to lern pyton", max_expansions=33) == []
+
+
+def test_edit_budget_search_counts_candidate_work_as_expansions(monkeypatch):
+    """
+    Test that generating, finding and checking candidate words counts towards the expansion cap.
+    """
+    monkeypatch.setattr('data_structure.word_trie.CANDIDATES_PER_EXPANSION', 4)
+    trie = WordTrie()
+    for line_number, letter in enumerate("abcdefghijklmnopqrstuvwxyz", 1):
+        trie.insert_sentence(f"ca{letter} eats fish", "file1.txt", line_number)
+
+    # "cat" costs 1 + 4 // 4 expansions for its neighbors, and its 26 candidates 6 more to find and 6 more to
+    # check against the root. "eats" and "fish" then cost 1 + 5 // 4 each.
+    assert trie.search_edits("cat eats fish", max_word_edits=1, max_expansions=18)[0][1:3] == ("file1.txt", 20)
+    assert trie.search_edits("cat eats fish", max_word_edits=1, max_expansions=17) == []
+
+
+def test_edit_budget_search_charges_neighbors_before_generating_them(monkeypatch):
+    """
+    Test that the edit budget search falls back to fewer edits within a word whose neighbors do not fit the cap.
+    """
+    monkeypatch.setattr('data_structure.word_trie.CANDIDATES_PER_EXPANSION', 4)
+    trie = WordTrie()
+    for line_number, letter in enumerate("abcdefghijklmnopqrstuvwxyz", 1):
+        trie.insert_sentence(f"ca{letter} eats fish", "file1.txt", line_number)
+    generation = 1 + trie.typo_index.neighborhood_size("xyz", 2) // 4
+
+    # "caz" is the only word within two edits of "xyz"; "eats" and "fish" then cost 1 + 5 // 4 each.
+    assert trie.search_edits("xyz eats fish", max_expansions=generation + 4)[0][1:3] == ("file1.txt", 26)
+    assert trie.search_edits("xyz eats fish", max_expansions=generation + 3) == []
+    assert trie.search_edits("xyz eats fish", max_expansions=generation - 1) == []
+    assert trie.search_edits("cat eats fish", max_expansions=generation - 1)[0][1:3] == ("file1.txt", 20)
@@ -0,0 +1,34 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BuildStats:
+    """Represents the throughput of an index build.
+
+    Attributes:
+        files (int): The number of files processed.
+        lines (int): The number of lines inserted.
+        bytes (int): The number of bytes read.
+        seconds (float): The wall-clock duration of the build.
+        workers (int): The number of worker processes used.
+        invalid_lines (int): The number of lines that were not valid UTF-8.
+    """
+    files: int
+    lines: int
+    bytes: int
+    seconds: float
+    workers: int = 1
+    invalid_lines: int = 0
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.files} files, {self.lines} lines, {self.bytes / 2 ** 20:.1f} MiB in {self.seconds:.2f}s "
+                f"with {self.workers} worker(s): {self.lines_per_second:,.0f} lines/s, "
+                f"{self.bytes_per_second / 2 ** 20:.1f} MiB/s")
@@ -0,0 +1,132 @@
+import gzip
+import io
+import re
+from typing import IO, Iterator, List, Optional, Tuple
+from text_processor.normalization import DEFAULT_NORMALIZER, TextNormalizer
+
+
+READ_BUFFER_SIZE: int = 1 << 20     # characters read from a file per bulk read
+BATCH_LINES: int = 1024             # lines normalized and inserted per batch
+
+ENCODING_ERRORS = ('strict', 'replace', 'skip')
+
+_INVALID_BYTES_RE = re.compile('[\udc80-\udcff]')  # bytes that were not valid UTF-8, escaped on decoding
+
+
+def open_text(file_path: str) -> IO[str]:
+    """Open a dataset file for streaming, decompressing `.gz` and `.zst` files on the fly.
+
+    Files are decoded as UTF-8 with invalid bytes escaped as lone surrogates rather than rejected, so the
+    original bytes, and with them the exact byte offsets of the lines, can always be recovered. Line endings
+    are left untranslated for the same reason.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        IO[str]: The text stream of the file.
+
+    Raises:
+        ImportError: If the file is zstd-compressed and the `zstandard` package is not installed.
+    """
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rt', encoding='utf-8', errors='surrogateescape', newline='')
+    if file_path.endswith('.zst'):
+        return io.TextIOWrapper(_open_zstd(file_path), encoding='utf-8', errors='surrogateescape', newline='')
+    return open(file_path, 'r', encoding='utf-8', errors='surrogateescape', newline='', buffering=READ_BUFFER_SIZE)
+
+
+def is_compressed(file_path: str) -> bool:
+    """Check whether a dataset file is decompressed on the fly, by its `.gz` or `.zst` extension."""
+    return file_path.endswith(('.gz', '.zst'))
+
+
+def open_binary(file_path: str) -> IO[bytes]:
+    """Open a dataset file for reading its decompressed bytes.
+
+    Compressed streams seek by decompressing from the start up to the target offset; `LineIndex` decompresses
+    such files once and serves their lines from the decompressed copy.
+
+    Args:
+        file_path (str): The path of the file.
+
+    Returns:
+        IO[bytes]: The binary stream of the (decompressed) file.
+    """
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rb')
+    if file_path.endswith('.zst'):
+        return _open_zstd(file_path)
+    return open(file_path, 'rb')
+
+
+def _open_zstd(file_path: str) -> IO[bytes]:
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError(f"Reading {file_path} needs the optional 'zstandard' package") from error
+    return zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), closefd=True)
+
+
+def read_batches(file: IO[str], batch_lines: int = BATCH_LINES) -> Iterator[List[str]]:
+    """Read a text stream in bulk and yield its lines in batches.
+
+    At most about `READ_BUFFER_SIZE` characters of the stream are held at a time, however large the file.
+
+    Args:
+        file (IO[str]): The text stream.
+        batch_lines (int, optional): The maximum number of lines per batch. Defaults to BATCH_LINES.
+
+    Returns:
+        Iterator[List[str]]: An iterator over batches of raw lines, line endings included.
+    """
+    while True:
+        lines = file.readlines(READ_BUFFER_SIZE)
+        if not lines:
+            return
+        for start in range(0, len(lines), batch_lines):
+            yield lines[start:start + batch_lines]
+
+
+def normalize_batch(lines: List[str], errors: str = 'replace', normalizer: TextNormalizer = DEFAULT_NORMALIZER
+                    ) -> Tuple[List[Optional[Tuple[List[str], List[int]]]], List[int], int]:
+    """Split a batch of raw lines into normalized words and measure their size on disk.
+
+    Args:
+        lines (List[str]): The raw lines, as read by `read_batches` from a stream opened with `open_text`.
+        errors (str, optional): What to do with a line that is not valid UTF-8: 'strict' raises, 'replace'
+            indexes it with U+FFFD in place of the invalid bytes, and 'skip' leaves it out of the index.
+            Defaults to 'replace'.
+        normalizer (TextNormalizer, optional): The normalization policy. Defaults to DEFAULT_NORMALIZER.
+
+    Returns:
+        Tuple[List[Optional[Tuple[List[str], List[int]]]], List[int], int]: For every line, its words and word
+            offsets (`None` for a skipped line); for every line, its size in bytes; and the number of invalid lines.
+
+    Raises:
+        UnicodeDecodeError: If a line is not valid UTF-8 and `errors` is 'strict'.
+    """
+    texts = []
+    sizes = []
+    invalid = 0
+    for line in lines:
+        if line.isascii():
+            sizes.append(len(line))
+            texts.append(line.strip())
+            continue
+
+        raw = line.encode('utf-8', 'surrogateescape')
+        sizes.append(len(raw))
+        if _INVALID_BYTES_RE.search(line) is None:
+            texts.append(line.strip())
+            continue
+
+        invalid += 1
+        if errors == 'strict':
+            raw.decode('utf-8')  # raises with the position of the first invalid byte
+        texts.append(None if errors == 'skip' else raw.decode('utf-8', 'replace').strip())
+
+    if invalid and errors == 'skip':
+        kept = iter(normalizer.split_lines(text for text in texts if text is not None))
+        return [None if text is None else next(kept) for text in texts], sizes, invalid
+    return normalizer.split_lines(texts), sizes, invalid
@@ -0,0 +1,143 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+UNICODE_FORMS = ('NFC', 'NFD', 'NFKC', 'NFKD')
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+WORD_TOKEN_RE = re.compile(r'\S*\w\S*')  # whitespace-delimited tokens that survive normalization
+
+# Lowercases ASCII letters and deletes ASCII punctuation in a single pass, for text that is all ASCII.
+_ASCII_TABLE: Dict[int, Optional[int]] = {code: None for code in range(128) if _PUNCTUATION_RE.match(chr(code))}
+_ASCII_TABLE.update({code: code + 32 for code in range(ord('A'), ord('Z') + 1)})
+
+
+class TextNormalizer:
+    """Normalizes text into the lowercase, punctuation-free, single-spaced form the index stores and searches.
+
+    ASCII text, the common case, is lowercased and stripped of punctuation by one `str.translate` call, and
+    `normalize_lines` and `split_lines` translate a whole batch of lines at once. Other text goes through
+    `str.lower` and a precompiled pattern. Optionally, text is first folded to a Unicode normalization form
+    and stripped of accents, so that e.g. `ﬁ`, `fi`, `café` and `cafe` match; an index and its queries must
+    be normalized with the same policy.
+
+    Attributes:
+        unicode_form (Optional[str]): The Unicode normalization form applied first, one of `UNICODE_FORMS`,
+            or `None` to leave the text as it is.
+        strip_accents (bool): Whether combining marks are removed after decomposing the text.
+    """
+    __slots__ = ('unicode_form', 'strip_accents')
+
+    def __init__(self, unicode_form: Optional[str] = None, strip_accents: bool = False) -> None:
+        """Initialize a normalizer with a folding policy.
+
+        Args:
+            unicode_form (Optional[str], optional): The Unicode normalization form, one of `UNICODE_FORMS`.
+                Defaults to None.
+            strip_accents (bool, optional): Whether to remove accents. Defaults to False.
+
+        Raises:
+            ValueError: If `unicode_form` is not a Unicode normalization form.
+        """
+        if unicode_form is not None and unicode_form not in UNICODE_FORMS:
+            raise ValueError(f"Unknown Unicode normalization form {unicode_form!r}, expected one of {UNICODE_FORMS}")
+        self.unicode_form: Optional[str] = unicode_form
+        self.strip_accents: bool = strip_accents
+
+    def policy(self) -> dict:
+        """Return the folding policy as a JSON-serializable dictionary of the constructor arguments."""
+        return {'unicode_form': self.unicode_form, 'strip_accents': self.strip_accents}
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TextNormalizer) and self.policy() == other.policy()
+
+    def __hash__(self) -> int:
+        return hash((self.unicode_form, self.strip_accents))
+
+    def __repr__(self) -> str:
+        return f"TextNormalizer(unicode_form={self.unicode_form!r}, strip_accents={self.strip_accents!r})"
+
+    def normalize(self, text: str) -> str:
+        """Normalize a text.
+
+        Args:
+            text (str): The raw text.
+
+        Returns:
+            str: The normalized text, its words separated by single spaces.
+        """
+        if text.isascii():
+            return ' '.join(text.translate(_ASCII_TABLE).split())
+        return ' '.join(_PUNCTUATION_RE.sub('', self._fold(text).lower()).split())
+
+    def normalize_lines(self, lines: Iterable[str]) -> List[str]:
+        """Normalize a batch of lines, as `normalize` does one by one.
+
+        Args:
+            lines (Iterable[str]): The raw lines.
+
+        Returns:
+            List[str]: The normalized lines.
+        """
+        return [' '.join(words) for words in self._split_batch(list(lines))]
+
+    def split_words(self, sentence: str) -> Tuple[List[str], List[int]]:
+        """Normalize a sentence into words and find the character offset in the sentence where each word starts.
+
+        Args:
+            sentence (str): The raw sentence.
+
+        Returns:
+            Tuple[List[str], List[int]]: The normalized words and the offset of the raw token each one came from.
+        """
+        return self._locate_words(sentence, self.normalize(sentence).split())
+
+    def split_lines(self, lines: Iterable[str]) -> List[Tuple[List[str], List[int]]]:
+        """Split a batch of lines into words and offsets, as `split_words` does one by one.
+
+        Args:
+            lines (Iterable[str]): The raw lines.
+
+        Returns:
+            List[Tuple[List[str], List[int]]]: The normalized words and their offsets of every line.
+        """
+        lines = list(lines)
+        return [self._locate_words(line, words) for line, words in zip(lines, self._split_batch(lines))]
+
+    def _fold(self, text: str) -> str:
+        if self.unicode_form is not None:
+            text = unicodedata.normalize(self.unicode_form, text)
+        if self.strip_accents:
+            text = unicodedata.normalize('NFC', ''.join(character for character in unicodedata.normalize('NFD', text)
+                                                        if not unicodedata.combining(character)))
+        return text
+
+    def _split_batch(self, lines: List[str]) -> List[List[str]]:
+        """Normalize a batch of lines into their words, translating all its ASCII lines with a single call."""
+        ascii_lines = [line for line in lines if line.isascii()]
+        batch = '\n'.join(ascii_lines)
+        if not ascii_lines or batch.count('\n') != len(ascii_lines) - 1:
+            return [self.normalize(line).split() for line in lines]
+        translated = batch.translate(_ASCII_TABLE).split('\n')
+        if len(ascii_lines) == len(lines):
+            return [text.split() for text in translated]
+        translated = iter(translated)
+        return [next(translated).split() if line.isascii() else self.normalize(line).split() for line in lines]
+
+    def _locate_words(self, sentence: str, words: List[str]) -> Tuple[List[str], List[int]]:
+        """Pair the normalized words of a sentence with the offsets of the raw tokens they came from."""
+        offsets = [token.start() for token in WORD_TOKEN_RE.finditer(sentence)]
+        if len(offsets) == len(words):
+            return words, offsets
+
+        # Some token normalized into several words or none at all; fall back to normalizing token by token.
+        words, offsets = [], []
+        for token in WORD_TOKEN_RE.finditer(sentence):
+            for word in self.normalize(token.group()).split():
+                words.append(word)
+                offsets.append(token.start())
+        return words, offsets
+
+
+DEFAULT_NORMALIZER = TextNormalizer()
@@ -1,4 +1,5 @@
-from utils.consts import Typo
+from functools import lru_cache
+from utils.consts import INVALID_SCORE, SCORE_CACHE_SIZE, Typo
 from typing import Tuple
 
 
@@ -49,9 +50,13 @@ class StringMatcher:
         else:
             return 2
 
-    def check_typo(self, str_before: str, str_after: str) -> Tuple[Typo, int | None]:
+    @staticmethod
+    def check_typo(str_before: str, str_after: str) -> Tuple[Typo, int | None]:
         """Check for typographical errors between two strings and determine the type of error.
 
+        The strings are compared in a single pass over their common prefix; an insertion or deletion is then
+        confirmed with one comparison of the remaining tails, so no string is built per candidate position.
+
         Args:
             str_before (str): The original string.
             str_after (str): The string to compare against the original.
@@ -61,40 +66,60 @@ class StringMatcher:
         """
         if str_before == str_after:
             return Typo.MATCH, None
-        
+
+        len_before, len_after = len(str_before), len(str_after)
+
         # Case 1: One different character (substitution)
-        if len(str_before) == len(str_after):
-            idx = 0
-            found_one = False
-            for i in range(len(str_before)):
+        if len_before == len_after:
+            idx = None
+            for i in range(len_before):
                 if str_before[i] != str_after[i]:
-                    if not found_one:
-                        found_one = True
-                        idx = i
-                    else:
+                    if idx is not None:
                         return Typo.INVALID, None
+                    idx = i
             return Typo.SWITCH, idx
 
         # Case 2: One extra character (str_before has one more char)
-        if len(str_before) == len(str_after) + 1:
-            for i in range(len(str_before)):
-                if str_before[:i] + str_before[i+1:] == str_after:
-                    return Typo.ADD, i
-            return Typo.INVALID, None
-        
+        if len_before == len_after + 1:
+            idx = StringMatcher._find_deletion(str_before, str_after)
+            return (Typo.ADD, idx) if idx is not None else (Typo.INVALID, None)
+
         # Case 3: One missing character (str_before has one less char)
-        if len(str_before) + 1 == len(str_after):
-            for i in range(len(str_after)):
-                if str_after[:i] + str_after[i+1:] == str_before:
-                    return Typo.MISS, i
-            return Typo.INVALID, None
-        
+        if len_before + 1 == len_after:
+            idx = StringMatcher._find_deletion(str_after, str_before)
+            return (Typo.MISS, idx) if idx is not None else (Typo.INVALID, None)
+
         # Otherwise, they don't differ by just one character
         return Typo.INVALID, None
 
+    @staticmethod
+    def _find_deletion(longer: str, shorter: str) -> int | None:
+        """Find the first index whose removal from `longer` gives `shorter`.
+
+        Args:
+            longer (str): The string with the extra character.
+            shorter (str): The string that is one character shorter.
+
+        Returns:
+            int | None: The first index of the extra character, or None if no single removal turns `longer` into `shorter`.
+        """
+        prefix = 0
+        while prefix < len(shorter) and longer[prefix] == shorter[prefix]:
+            prefix += 1
+        if longer[prefix + 1:] != shorter[prefix:]:
+            return None
+
+        # Removing any character of a run of equal characters gives the same string; report the first one.
+        idx = prefix
+        while idx > 0 and longer[idx - 1] == longer[prefix]:
+            idx -= 1
+        return idx
+
     def calculate_score(self, str_before: str, str_after: str) -> int:
         """Calculate the score based on the typographical error between two strings.
 
+        Scores are memoized per string pair, since the same words are scored over and over while searching.
+
         Args:
             str_before (str): The original string.
             str_after (str): The string with a typo to compare against the original.
@@ -102,13 +127,59 @@ class StringMatcher:
         Returns:
             int: The calculated score, considering exact matches, typographical errors, and penalties.
         """
-        typo, idx = self.check_typo(str_before, str_after)
-        
+        return StringMatcher._cached_score(str_before, str_after)
+
+    def calculate_edit_score(self, str_before: str, str_after: str, edits: int) -> int:
+        """Calculate the score of a match that is a known number of edits away from the original string.
+
+        Up to one edit, this is the positional score of `calculate_score`. Every edit beyond that costs a
+        character and the largest penalty of a single typo, so more edits always score lower.
+
+        Args:
+            str_before (str): The original string.
+            str_after (str): The matched string.
+            edits (int): The number of substitutions, insertions and deletions between the two strings.
+
+        Returns:
+            int: The calculated score.
+        """
+        if edits <= 1:
+            return self.calculate_score(str_before, str_after)
+        return 2 * (len(str_before) - edits) - edits * StringMatcher.penalty_for_extra_or_missing(0)
+
+    @staticmethod
+    def within_edits(str_before: str, str_after: str, max_edits: int) -> bool:
+        """Check whether two strings are at most a number of substitutions, insertions and deletions apart.
+
+        Args:
+            str_before (str): The original string.
+            str_after (str): The string to compare against the original.
+            max_edits (int): The largest number of edits allowed.
+
+        Returns:
+            bool: Whether the edit distance between the strings is at most `max_edits`.
+        """
+        if abs(len(str_before) - len(str_after)) > max_edits:
+            return False
+        row = list(range(len(str_after) + 1))
+        for i, character in enumerate(str_before, 1):
+            previous, row = row, [i]
+            for j, other in enumerate(str_after, 1):
+                row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (character != other)))
+            if min(row) > max_edits:
+                return False
+        return row[-1] <= max_edits
+
+    @staticmethod
+    @lru_cache(maxsize=SCORE_CACHE_SIZE)
+    def _cached_score(str_before: str, str_after: str) -> int:
+        typo, idx = StringMatcher.check_typo(str_before, str_after)
+
         if typo == Typo.MATCH:
             return 2 * len(str_before)
         elif typo == Typo.SWITCH:
-            return 2 * (len(str_before) - 1) - self.penalty_for_mismatch(idx)
+            return 2 * (len(str_before) - 1) - StringMatcher.penalty_for_mismatch(idx)
         elif typo == Typo.ADD or typo == Typo.MISS:
-            return 2 * (len(str_before) - 1) - self.penalty_for_extra_or_missing(idx)
+            return 2 * (len(str_before) - 1) - StringMatcher.penalty_for_extra_or_missing(idx)
         else:
-            return -100
+            return INVALID_SCORE
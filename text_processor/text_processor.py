@@ -1,22 +1,61 @@
 import os
+import shutil
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
+from data_structure.line_index import LineIndex
+from data_structure.merged_node import MergedNode
+from data_structure.trie_snapshot import load_snapshot, save_snapshot
+from data_structure.vocabulary import SortedVocabulary
 from data_structure.word_trie import WordTrie
+from text_processor.build_stats import BuildStats
+from text_processor.ingest import BATCH_LINES, ENCODING_ERRORS, normalize_batch, open_text, read_batches
+from text_processor.normalization import DEFAULT_NORMALIZER, TextNormalizer
+from utils.consts import MAX_SUGGESTIONS
+from utils.functions import shard_of
 
 
 class TextDatasetProcessor:
     """A class for processing text files in a dataset directory and inserting their content into a WordTrie.
 
     Handles traversing directories, reading files, and updating the WordTrie with the contents of each file.
+    Files are streamed through a pipeline of bulk reads, batched normalization and batched insertion (see
+    `text_processor.ingest`), so memory apart from the index stays bounded however large a file is.
+    Files ending in `.gz` or `.zst` are decompressed on the fly.
     """
-    def __init__(self, dataset_directory: str) -> None:
+    def __init__(self, dataset_directory: str, shard: Optional[Tuple[int, int]] = None, errors: str = 'replace',
+                 batch_lines: int = BATCH_LINES, progress: Optional[Callable[[BuildStats], None]] = None) -> None:
         """
         Initialize the TextDatasetProcessor with the path to the dataset directory.
 
         Args:
             dataset_directory (str): The path to the directory containing the text files to be processed.
+            shard (Optional[Tuple[int, int]], optional): The index and the number of shards, to process only
+                the files `shard_of` assigns to that shard. Defaults to None, processing every file.
+            errors (str, optional): How lines that are not valid UTF-8 are handled: 'strict' aborts the build,
+                'replace' indexes them with U+FFFD for the invalid bytes and 'skip' leaves them out of the index.
+                Defaults to 'replace'.
+            batch_lines (int, optional): The number of lines normalized and inserted per batch. Defaults to BATCH_LINES.
+            progress (Optional[Callable[[BuildStats], None]], optional): Called after every batch and every file
+                of `process_files`, and after every shard of `process_files_parallel`, with the files, lines and
+                bytes processed so far. Defaults to None.
         """
+        if errors not in ENCODING_ERRORS:
+            raise ValueError(f"Unknown encoding error handling {errors!r}, expected one of {ENCODING_ERRORS}")
         self.dataset_directory = dataset_directory
+        self.shard = shard
+        self.errors = errors
+        self.batch_lines = batch_lines
+        self.progress = progress
+        self.line_index = LineIndex()
+        self.file_states: Dict[str, Optional[Tuple[int, int]]] = {}
+        self.invalid_lines: Dict[str, int] = {}
+        self._running = BuildStats(files=0, lines=0, bytes=0, seconds=0.0)
+        self._running_start = time.perf_counter()
 
-    def process_files(self, word_trie: WordTrie) -> None:
+    def process_files(self, word_trie: WordTrie) -> BuildStats:
         """
         Traverse the dataset directory and process each text file.
 
@@ -24,20 +63,307 @@ class TextDatasetProcessor:
 
         Args:
             word_trie (WordTrie): The WordTrie instance where the content of the files will be inserted.
+
+        Returns:
+            BuildStats: The throughput of the build.
+        """
+        start = self._running_start = time.perf_counter()
+        self._running = BuildStats(files=0, lines=0, bytes=0, seconds=0.0)
+        file_paths = self.list_files()
+        for file_path in file_paths:
+            self._process_file(file_path, word_trie)
+            self._report_progress(files=1)
+        return self._build_stats(file_paths, time.perf_counter() - start)
+
+    def process_files_parallel(self, workers: int, max_matches: int = MAX_SUGGESTIONS,
+                               normalizer: TextNormalizer = DEFAULT_NORMALIZER) -> Tuple[WordTrie, BuildStats]:
+        """
+        Build the index of the dataset with a pool of worker processes.
+
+        The files are split into contiguous shards of similar size and file ids are assigned up front, so the
+        ids of every shard ascend from one shard to the next. Each worker builds a partial trie for its shard and
+        hands it back as a snapshot file, and the partial tries are combined without copying under a
+        `MergedNode` root. The sorted vocabularies of the shards are merged into one, and the word ids of every
+        shard are translated into it. The line texts of all shards are counted together for their popularity.
+        The file states and invalid line counts of the workers are merged as `process_files` records them, and
+        progress is reported as each shard completes. Save the result with `save_snapshot` to turn it into a
+        single flat index.
+
+        Args:
+            workers (int): The number of worker processes.
+            max_matches (int, optional): The maximum number of matches the trie returns. Defaults to MAX_SUGGESTIONS.
+            normalizer (TextNormalizer, optional): The normalization policy of the trie. Defaults to DEFAULT_NORMALIZER.
+
+        Returns:
+            Tuple[WordTrie, BuildStats]: The read-only combined trie and the throughput of the build.
+        """
+        start = self._running_start = time.perf_counter()
+        self._running = BuildStats(files=0, lines=0, bytes=0, seconds=0.0)
+        file_paths = self.list_files()
+        shards = self._split_shards(file_paths, workers)
+        work_directory = tempfile.mkdtemp(prefix='word_trie_')
+        try:
+            with ProcessPoolExecutor(max_workers=max(len(shards), 1)) as executor:
+                snapshot_paths = [os.path.join(work_directory, f'shard{i}.snapshot') for i in range(len(shards))]
+                futures = [executor.submit(_build_shard, self.dataset_directory, file_paths, shard, snapshot_path,
+                                           self.errors, normalizer)
+                           for shard, snapshot_path in zip(shards, snapshot_paths)]
+                for future in as_completed(futures):
+                    file_states, invalid_lines, shard_stats = future.result()
+                    self.file_states.update(file_states)
+                    self.invalid_lines.update(invalid_lines)
+                    self._report_progress(files=shard_stats.files, lines=shard_stats.lines, size=shard_stats.bytes,
+                                          invalid_lines=shard_stats.invalid_lines)
+            shard_tries = []
+            for snapshot_path in snapshot_paths:
+                shard_trie, shard_line_index = load_snapshot(snapshot_path)
+                shard_tries.append(shard_trie)
+                self.line_index.offsets.update(shard_line_index.offsets)
+            vocabulary = SortedVocabulary(sorted(set().union(*(shard_trie.vocabulary.iter_words()
+                                                             for shard_trie in shard_tries))))
+            for shard_trie in shard_tries:
+                shard_trie.root.snapshot.remap_word_ids(
+                    [vocabulary.id_of(word) for word in shard_trie.vocabulary.iter_words()])
+        finally:
+            # The snapshots stay readable through their memory maps once the files are gone.
+            shutil.rmtree(work_directory, ignore_errors=True)
+
+        root = MergedNode([shard_trie.root for shard_trie in shard_tries]) if shard_tries else None
+        word_trie = WordTrie(root=root, max_matches=max_matches, normalizer=normalizer, vocabulary=vocabulary)
+        for file_path in file_paths:
+            word_trie.intern_file(file_path)
+        word_trie.typo_index.add_source(vocabulary.iter_words)
+        for shard_trie in shard_tries:
+            snapshot = shard_trie.root.snapshot
+            word_trie.popularity.add_stored(snapshot.line_keys, snapshot.line_hashes)
+
+        stats = self._build_stats(file_paths, time.perf_counter() - start)
+        stats.workers = len(shards)
+        return word_trie, stats
+
+    def list_files(self) -> List[str]:
+        """
+        List the paths of all files in the dataset directory tree, or of those in this processor's shard.
+
+        Returns:
+            List[str]: The paths of the files, in the order they are processed.
+        """
+        file_paths = [os.path.join(root, file) for root, _, files in os.walk(self.dataset_directory) for file in files]
+        if self.shard is None:
+            return file_paths
+        index, num_shards = self.shard
+        return [file_path for file_path in file_paths
+                if shard_of(os.path.relpath(file_path, self.dataset_directory), num_shards) == index]
+
+    def add_file(self, file_path: str, word_trie: WordTrie) -> None:
+        """
+        Index a file that is not in the WordTrie yet.
+
+        Args:
+            file_path (str): The path of the new file.
+            word_trie (WordTrie): The WordTrie instance where the content of the file will be inserted.
+        """
+        self._process_file(file_path, word_trie)
+
+    def update_file(self, file_path: str, word_trie: WordTrie) -> None:
+        """
+        Re-index a file whose content changed.
+
+        Args:
+            file_path (str): The path of the changed file.
+            word_trie (WordTrie): The WordTrie instance holding the previous content of the file.
+        """
+        word_trie.remove_file(file_path)
+        self._process_file(file_path, word_trie)
+
+    def remove_file(self, file_path: str, word_trie: WordTrie) -> None:
+        """
+        Drop a file from the WordTrie and the line index.
+
+        Args:
+            file_path (str): The path of the removed file.
+            word_trie (WordTrie): The WordTrie instance holding the content of the file.
         """
-        for root, _, files in os.walk(self.dataset_directory):
-            for file in files:
-                self._process_file(os.path.join(root, file), word_trie)
+        word_trie.remove_file(file_path)
+        self.line_index.remove_file(file_path)
+        self.file_states.pop(file_path, None)
+        self.invalid_lines.pop(file_path, None)
+
+    def sync(self, word_trie: WordTrie) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Bring the WordTrie up to date with the dataset directory, touching only files that changed.
+
+        Files are compared by size and modification time with the state recorded when they were last indexed.
+        A file that cannot be read, whether while listing it or while indexing it, counts as removed until a
+        later sync can read it again. A read-only trie, as loaded from a snapshot or combined by
+        `process_files_parallel`, is materialized into mutable nodes before the first change is applied.
+
+        Args:
+            word_trie (WordTrie): The WordTrie instance built from this dataset.
+
+        Returns:
+            Tuple[List[str], List[str], List[str]]: The added, updated and removed file paths.
+        """
+        current = {}
+        for file_path in self.list_files():
+            state = self._file_state(file_path)
+            if state is not None:
+                current[file_path] = state
+        added = [file_path for file_path in current if file_path not in self.file_states]
+        updated = [file_path for file_path, state in current.items()
+                   if file_path in self.file_states and state != self.file_states[file_path]]
+        removed = [file_path for file_path in self.file_states if file_path not in current]
+        if added or updated or removed:
+            word_trie.materialize()
+
+        for file_path in removed:
+            self.remove_file(file_path, word_trie)
+        failed = [file_path for file_path in updated if not self._try_index(self.update_file, file_path, word_trie)]
+        removed += failed
+        updated = [file_path for file_path in updated if file_path not in failed]
+        added = [file_path for file_path in added if self._try_index(self.add_file, file_path, word_trie)]
+        return added, updated, removed
+
+    def _try_index(self, index: Callable[[str, WordTrie], None], file_path: str, word_trie: WordTrie) -> bool:
+        """
+        Add or re-index a file, dropping whatever was indexed of it if it cannot be read to the end.
+
+        Returns:
+            bool: Whether the file was indexed; if not, it is not tracked, so the next sync tries it again.
+        """
+        try:
+            index(file_path, word_trie)
+        except OSError:
+            self.remove_file(file_path, word_trie)
+            return False
+        return True
+
+    @staticmethod
+    def _file_state(file_path: str) -> Optional[Tuple[int, int]]:
+        """
+        Return the size and modification time of a file, or `None` if it cannot be read.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _split_shards(file_paths: List[str], workers: int) -> List[List[str]]:
+        """
+        Split the files into at most `workers` contiguous shards of similar total size.
+
+        Args:
+            file_paths (List[str]): The files to split.
+            workers (int): The maximum number of shards.
+
+        Returns:
+            List[List[str]]: The non-empty shards, in file order.
+        """
+        sizes = [os.path.getsize(file_path) for file_path in file_paths]
+        target = sum(sizes) / max(workers, 1)
+        shards = [[]]
+        shard_size = 0  # the total size of all shards so far
+        for file_path, size in zip(file_paths, sizes):
+            if shards[-1] and shard_size >= target * len(shards) and len(shards) < workers:
+                shards.append([])
+            shards[-1].append(file_path)
+            shard_size += size
+        return [shard for shard in shards if shard]
+
+    def _build_stats(self, file_paths: List[str], seconds: float) -> BuildStats:
+        lines = total_bytes = 0
+        for file_path in file_paths:
+            offsets = self.line_index.offsets.get(file_path)
+            if offsets is not None:
+                lines += len(offsets) - 1
+                total_bytes += offsets[-1]
+        invalid_lines = sum(self.invalid_lines.get(file_path, 0) for file_path in file_paths)
+        return BuildStats(files=len(file_paths), lines=lines, bytes=total_bytes, seconds=seconds,
+                          invalid_lines=invalid_lines)
+
+    def _report_progress(self, files: int = 0, lines: int = 0, size: int = 0, invalid_lines: int = 0) -> None:
+        if self.progress is None:
+            return
+        running = self._running
+        running.files += files
+        running.lines += lines
+        running.bytes += size
+        running.invalid_lines += invalid_lines
+        running.seconds = time.perf_counter() - self._running_start
+        self.progress(BuildStats(running.files, running.lines, running.bytes, running.seconds,
+                                 invalid_lines=running.invalid_lines))
 
     def _process_file(self, file_path: str, word_trie: WordTrie) -> None:
         """
-        Read a single text file and insert its contents into the WordTrie.
+        Stream a single text file into the WordTrie.
+
+        The file is read in bulk, and its lines are normalized and inserted a batch at a time. The byte offset
+        of every line is recorded in the line index along the way; line endings and invalid bytes are kept
+        as they are on disk so the offsets match the file.
 
         Args:
             file_path (str): The path to the text file to be processed.
             word_trie (WordTrie): The WordTrie instance where the content of the file will be inserted.
+
+        Raises:
+            UnicodeDecodeError: If a line is not valid UTF-8 and the processor was created with errors='strict'.
         """
-        with open(file_path, 'r', encoding='utf-8') as file:
-            for line_number, line in enumerate(file, start=1):
-                word_trie.insert_sentence(line.strip(), file_path, line_number)
+        self.file_states[file_path] = self._file_state(file_path)
+        offsets = array('Q', [0])
+        position = 0
+        line_number = 0
+        invalid_lines = 0
+        with open_text(file_path) as file:
+            for batch in read_batches(file, self.batch_lines):
+                try:
+                    rows, sizes, invalid = normalize_batch(batch, self.errors, word_trie.normalizer)
+                except UnicodeDecodeError as error:
+                    error.add_note(f"in {file_path} after line {line_number}")
+                    raise
+                batch_start = position
+                for row, size in zip(rows, sizes):
+                    line_number += 1
+                    position += size
+                    offsets.append(position)
+                    if row is not None:
+                        word_trie.insert_words(row[0], row[1], file_path, line_number)
+                invalid_lines += invalid
+                self._report_progress(lines=len(rows), size=position - batch_start, invalid_lines=invalid)
+        self.line_index.add_file(file_path, offsets)
+        if invalid_lines:
+            self.invalid_lines[file_path] = invalid_lines
+        else:
+            self.invalid_lines.pop(file_path, None)
+
+
+def _build_shard(dataset_directory: str, file_paths: List[str], shard: List[str], snapshot_path: str,
+                 errors: str = 'replace', normalizer: TextNormalizer = DEFAULT_NORMALIZER
+                 ) -> Tuple[Dict[str, Optional[Tuple[int, int]]], Dict[str, int], BuildStats]:
+    """Build the partial trie of one shard in a worker process and save it as a snapshot.
 
+    Every dataset file is interned up front so file ids match across shards.
+
+    Args:
+        dataset_directory (str): The path of the dataset directory.
+        file_paths (List[str]): All dataset files, in file id order.
+        shard (List[str]): The files of this shard.
+        snapshot_path (str): The path the partial trie is saved to.
+        errors (str, optional): How lines that are not valid UTF-8 are handled. Defaults to 'replace'.
+        normalizer (TextNormalizer, optional): The normalization policy. Defaults to DEFAULT_NORMALIZER.
+
+    Returns:
+        Tuple[Dict[str, Optional[Tuple[int, int]]], Dict[str, int], BuildStats]: The state of every file of the
+            shard and the number of invalid lines of those that have any, as `TextDatasetProcessor` records them,
+            and the throughput of the shard.
+    """
+    start = time.perf_counter()
+    word_trie = WordTrie(normalizer=normalizer)
+    for file_path in file_paths:
+        word_trie.intern_file(file_path)
+    processor = TextDatasetProcessor(dataset_directory, errors=errors)
+    for file_path in shard:
+        processor._process_file(file_path, word_trie)
+    save_snapshot(word_trie, processor.line_index, snapshot_path)
+    return processor.file_states, processor.invalid_lines, processor._build_stats(shard, time.perf_counter() - start)
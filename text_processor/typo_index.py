@@ -0,0 +1,210 @@
+import sys
+import threading
+from bisect import bisect_left
+from text_processor.string_matcher import StringMatcher
+from utils.consts import Typo
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class TypoIndex:
+    """A deletion-neighborhood index of a vocabulary for finding the words one typo away from a word.
+
+    Every word is stored under itself and under each of its single-character deletions. Two words are one
+    substitution, insertion or deletion apart exactly when one of them, or one of their deletions, equals one of
+    the other's, so the candidates of a word are found with a handful of dictionary lookups instead of a scan
+    over the vocabulary. Words two typos away are one typo away from a string one typo away from the word,
+    so `candidates_within` finds them with the same lookups from every such string; words further away are
+    found by walking the sorted vocabulary as an implicit character trie.
+
+    Attributes:
+        words (Set[str]): The indexed words.
+        alphabet (Set[str]): The characters of the indexed words.
+        deletions (Dict[str, Set[str]]): A dictionary mapping each word and each of its deletions to the words
+            they were derived from.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty typo index."""
+        self.words: Set[str] = set()
+        self.alphabet: Set[str] = set()
+        self.deletions: Dict[str, Set[str]] = {}
+        self.matcher: StringMatcher = StringMatcher()
+        self._sources: List[Callable[[], Iterable[str]]] = []
+        self._sources_lock: threading.Lock = threading.Lock()
+        self._sorted_words: Optional[List[str]] = None
+
+    def add_source(self, source: Callable[[], Iterable[str]]) -> None:
+        """Register the vocabulary of a prebuilt index, to be added on the first lookup.
+
+        Deferring the work keeps loading a prebuilt index cheap when no query ever needs a typo lookup.
+
+        Args:
+            source (Callable[[], Iterable[str]]): A function returning the words to add.
+        """
+        self._sources.append(source)
+
+    def add(self, word: str) -> None:
+        """Add a word to the index.
+
+        Args:
+            word (str): The word to add.
+        """
+        if word in self.words:
+            return
+        self.words.add(word)
+        self.alphabet.update(word)
+        self._sorted_words = None
+        for variant in self._variants(word):
+            bucket = self.deletions.get(variant)
+            if bucket is None:
+                self.deletions[variant] = {word}
+            else:
+                bucket.add(word)
+
+    def candidates(self, word: str) -> List[str]:
+        """Find the indexed words that are exactly one typo away from a word.
+
+        Args:
+            word (str): The (possibly misspelled) word.
+
+        Returns:
+            List[str]: The words within one substitution, insertion or deletion, best scoring first.
+        """
+        self._load_sources()
+        found = set()
+        for variant in self._variants(word):
+            found.update(self.deletions.get(variant, ()))
+
+        scored = []
+        for candidate in found:
+            typo, _ = self.matcher.check_typo(word, candidate)
+            if typo.value > Typo.MATCH.value:
+                scored.append((-self.matcher.calculate_score(word, candidate), candidate))
+        return [candidate for _, candidate in sorted(scored)]
+
+    def candidates_within(self, word: str, max_edits: int) -> List[Tuple[int, str]]:
+        """Find the indexed words within a number of substitutions, insertions and deletions of a word.
+
+        Up to two edits, the deletion index is looked up from the word and from every string one edit away
+        from it, so the work depends on the length of the word and the size of the alphabet but not on the
+        size of the vocabulary. Beyond that, the sorted vocabulary is walked as a character trie: words sharing
+        a prefix with the previous one reuse its rows of the edit distance table, and once every entry of a row
+        exceeds `max_edits`, all words starting with that prefix are skipped with one binary search.
+
+        Args:
+            word (str): The (possibly misspelled) word.
+            max_edits (int): The largest edit distance to report.
+
+        Returns:
+            List[Tuple[int, str]]: The edit distance and the word of every match, closest first, the word itself
+                included if it is indexed.
+        """
+        self._load_sources()
+        if max_edits <= 2:
+            return self._neighbors_within(word, max_edits)
+
+        words = self._sorted_words
+        if words is None:
+            words = self._sorted_words = sorted(self.words)
+
+        found = []
+        rows = [list(range(len(word) + 1))]    # rows[k] holds the distances from word prefixes to text[:k]
+        text = ""
+        i = 0
+        while i < len(words):
+            candidate = words[i]
+            common = 0
+            limit = min(len(rows) - 1, len(candidate))
+            while common < limit and text[common] == candidate[common]:
+                common += 1
+            del rows[common + 1:]
+            text = candidate
+            for k in range(common, len(candidate)):
+                previous = rows[-1]
+                character = candidate[k]
+                row = [previous[0] + 1]
+                for j in range(1, len(word) + 1):
+                    row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (word[j - 1] != character)))
+                rows.append(row)
+                if min(row) > max_edits:
+                    successor = _successor(candidate[:k + 1])
+                    i = len(words) if successor is None else bisect_left(words, successor, i + 1)
+                    break
+            else:
+                if rows[-1][-1] <= max_edits:
+                    found.append((rows[-1][-1], candidate))
+                i += 1
+        found.sort()
+        return found
+
+    def neighborhood_size(self, word: str, max_edits: int) -> int:
+        """Return how many strings `candidates_within` generates to find the words close to a word.
+
+        Args:
+            word (str): The (possibly misspelled) word.
+            max_edits (int): The largest edit distance to report.
+
+        Returns:
+            int: The number of strings looked up in the deletion index, or the size of the vocabulary when
+                it is walked instead.
+        """
+        self._load_sources()
+        length = len(word)
+        if max_edits <= 1:
+            return length + 1
+        if max_edits == 2:
+            return length + 1 + length * length + len(self.alphabet) * 2 * (length + 1) ** 2
+        return len(self.words)
+
+    def _neighbors_within(self, word: str, max_edits: int) -> List[Tuple[int, str]]:
+        """Find the indexed words within at most two edits of a word through the deletion index."""
+        keys = self._variants(word)
+        if max_edits == 2:
+            # An edit introducing a character no indexed word has can never lead to one, so only the
+            # characters of the alphabet are inserted or substituted.
+            for i in range(len(word) + 1):
+                head, tail = word[:i], word[i:]
+                for character in self.alphabet:
+                    keys |= self._variants(head + character + tail)
+                    if tail:
+                        keys |= self._variants(head + character + tail[1:])
+                if tail:
+                    keys |= self._variants(head + tail[1:])
+
+        found = set()
+        for key in keys:
+            found.update(self.deletions.get(key, ()))
+        close = []
+        for candidate in found:
+            if candidate == word:
+                close.append((0, candidate))
+            elif self.matcher.check_typo(word, candidate)[0] != Typo.INVALID:
+                if max_edits >= 1:
+                    close.append((1, candidate))
+            elif max_edits == 2 and self.matcher.within_edits(word, candidate, 2):
+                close.append((2, candidate))
+        close.sort()
+        return close
+
+    def _load_sources(self) -> None:
+        """Add the words of the registered sources, once."""
+        if self._sources:
+            with self._sources_lock:  # concurrent searches must not see a half-loaded vocabulary
+                while self._sources:
+                    for indexed_word in self._sources[-1]():
+                        self.add(indexed_word)
+                    self._sources.pop()
+
+    @staticmethod
+    def _variants(word: str) -> Set[str]:
+        """Return a word together with all of its single-character deletions."""
+        variants = {word}
+        for i in range(len(word)):
+            variants.add(word[:i] + word[i + 1:])
+        return variants
+
+
+def _successor(prefix: str) -> Optional[str]:
+    """Return the smallest string greater than every string starting with a prefix, or `None` if there is none."""
+    while prefix and ord(prefix[-1]) == sys.maxunicode:
+        prefix = prefix[:-1]
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else None
@@ -3,6 +3,7 @@ from completion_coordinator import CompletionCoordinator
 
 END_PROMPT = "#"
 END_PROGRAM = "exit"
+SNAPSHOT_PATH = "trie.snapshot"
 
 
 def display_suggestions(suggestions: list) -> None:
@@ -17,20 +18,25 @@ def display_suggestions(suggestions: list) -> None:
 
 class MainMenu:
 
-    def __init__(self, dataset_dir: str):
+    def __init__(self, dataset_dir: str, snapshot_path: str = None):
         self.coordinator = CompletionCoordinator(dataset_dir)
+        self.snapshot_path = snapshot_path
         self.current_prompt = ""
+        self.session = None
 
     def boot_system(self) -> None:
-        """Boot the system by building the trie."""
+        """Boot the system by loading the trie snapshot, or building the trie if the snapshot is missing or stale."""
         print("System is booting. Please wait...\n")
-        self.coordinator.build_trie()
+        self.coordinator.build_trie(self.snapshot_path)
+        self.session = self.coordinator.new_session()
         print("System is ready! Start entering your prompt. Press Enter for suggestions or '#' to reset.\n")
 
     def handle_suggestions(self) -> None:
         """Handle auto-complete suggestions."""
         if self.current_prompt.strip():
-            suggestions = self.coordinator.get_suggestions(self.current_prompt.strip())
+            # The last word typed is completed; an entry ending in a space asks for whole words only.
+            suggestions = self.coordinator.get_suggestions(self.current_prompt[:-1].lstrip(), session=self.session,
+                                                           prefix=True)
             display_suggestions([s.completed_sentence for s in suggestions])  # Display only the sentence part
         else:
             print("No prompt entered yet.")
@@ -46,6 +52,8 @@ class MainMenu:
 
             if added.strip() == END_PROMPT:
                 self.current_prompt = ""
+                if self.session is not None:
+                    self.session.reset()
                 print("\nPrompt reset. Start typing a new prompt.\n")
 
             elif added.strip() == END_PROGRAM:
@@ -59,5 +67,5 @@ class MainMenu:
 
 if __name__ == "__main__":
     dataset_directory = "Dataset"
-    menu = MainMenu(dataset_directory)
+    menu = MainMenu(dataset_directory, SNAPSHOT_PATH)
     menu.run()
\ No newline at end of file
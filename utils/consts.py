@@ -3,10 +3,27 @@ from enum import Enum
 
 MAX_SUGGESTIONS: int = 5
 
+INVALID_SCORE: int = -100
+
+SCORE_CACHE_SIZE: int = 1 << 16
+
+RESULT_CACHE_SIZE: int = 4096
+
+CLICK_HALF_LIFE: float = 7 * 24 * 3600.0   # seconds after which a click counts half as much
+
+TOP_COMPLETIONS_MIN_POSTINGS: int = 64    # nodes with this many postings keep their top completions precomputed
+
+CLICK_LOG_SIZE: int = 1024  # recent popularity changes kept top completions are checked against
+
+EDIT_BUDGET: int = 2        # edits allowed across a whole prompt by the edit budget search
+MAX_WORD_EDITS: int = 2     # edits allowed within a single word by the edit budget search
+MAX_EXPANSIONS: int = 256   # trie nodes the edit budget search expands before giving up
+CANDIDATES_PER_EXPANSION: int = 64  # strings or words the edit budget search handles for the cost of one expansion
+
 
 class Typo(Enum):
     INVALID = -1
     MATCH = 0
     SWITCH = 1
     ADD = 2
-    MISS = 3
\ No newline at end of file
+    MISS = 3
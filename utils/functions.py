@@ -1,14 +1,29 @@
-import re
-from text_processor.string_matcher import StringMatcher
-from typing import Optional, Tuple
-from utils.consts import Typo
+import hashlib
+import os
+from text_processor.normalization import DEFAULT_NORMALIZER, WORD_TOKEN_RE, TextNormalizer
 
 
-def normalize_text(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^\w\s]', '', text)  # punctuation
-    text = re.sub(r'\s+', ' ', text)     # extra spaces
-    return text.strip()
+def normalize_text(text: str, normalizer: TextNormalizer = DEFAULT_NORMALIZER) -> str:
+    return normalizer.normalize(text)
+
+
+def find_span_end(line: str, start: int, word_count: int, normalizer: TextNormalizer = DEFAULT_NORMALIZER) -> int:
+    """Find where a span of normalized words that starts at a given offset ends in the raw line.
+
+    Args:
+        line (str): The raw line.
+        start (int): The offset where the span starts.
+        word_count (int): The number of normalized words in the span.
+        normalizer (TextNormalizer, optional): The normalization policy. Defaults to DEFAULT_NORMALIZER.
+
+    Returns:
+        int: The offset right after the last raw token of the span, or the line length if the line is shorter.
+    """
+    for token in WORD_TOKEN_RE.finditer(line, start):
+        word_count -= len(normalizer.normalize(token.group()).split())
+        if word_count <= 0:
+            return token.end()
+    return len(line)
 
 
 def get_line_at_index(file_path, n):
@@ -16,39 +31,19 @@ def get_line_at_index(file_path, n):
         for current_index, line in enumerate(file, start=1):
             if current_index == n:
                 return line.strip()
-            
-
-def find_match_indices_by_words(line: str, prompt: str) -> Optional[Tuple[int, int]]:
-    matcher = StringMatcher()
-    line_words = line.split()
-    prompt_words = prompt.split()
-    
-    for i in range(len(line_words) - len(prompt_words) + 1):
-        match_found = True
-        typo_used = False
-
-        for j in range(len(prompt_words)):
-            word_in_line = line_words[i + j]
-            word_in_prompt = prompt_words[j]
-
-            typo_type, _ = matcher.check_typo(word_in_line, word_in_prompt)
-
-            if typo_type == Typo.INVALID:
-                match_found = False
-                break
-            elif typo_type != Typo.MATCH:
-                if typo_used:
-                    match_found = False
-                    break
-                typo_used = True
-        
-        if match_found:
-            start_word_index = i
-            end_word_index = i + len(prompt_words) - 1
-
-            start_char_index = line.index(line_words[start_word_index])
-            end_char_index = line.index(line_words[end_word_index]) + len(line_words[end_word_index]) - 1
-
-            return start_char_index, end_char_index
-
-    return None
+
+
+def shard_of(file_path: str, num_shards: int) -> int:
+    """Assign a dataset file to one of `num_shards` shards by a hash of its path.
+
+    The hash is stable across processes and platforms, so every shard server assigns files the same way.
+
+    Args:
+        file_path (str): The path of the file relative to the dataset directory.
+        num_shards (int): The number of shards.
+
+    Returns:
+        int: The index of the shard holding the file.
+    """
+    digest = hashlib.blake2b(file_path.replace(os.sep, '/').encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % num_shards
@@ -0,0 +1,145 @@
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+
+# Upper bounds of the latency buckets in seconds, from 1us to 1s in steps of roughly x2.5.
+LATENCY_BUCKETS: Sequence[float] = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                                    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+# Upper bounds of the buckets for sizes, such as the number of postings ranked.
+SIZE_BUCKETS: Sequence[float] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000,
+                                 50000, 100000)
+
+
+class Histogram:
+    """A cumulative histogram with fixed bucket bounds, as exported to Prometheus.
+
+    Attributes:
+        bounds (Sequence[float]): The upper bounds of the buckets, ascending. An implicit last bucket is unbounded.
+        counts (List[int]): The number of observations in every bucket, the unbounded one last.
+        total (float): The sum of all observations.
+        count (int): The number of observations.
+    """
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds: Sequence[float] = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.total: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Args:
+            fraction (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The upper bound of the bucket, `inf` for the unbounded bucket, or 0 without observations.
+        """
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Counters and histograms collected on the suggestion path.
+
+    Instrumented objects hold an optional `Metrics` and skip all bookkeeping when it is `None`, so metrics
+    cost nothing unless enabled. All methods are safe to call from several threads.
+
+    Attributes:
+        counters (Dict[str, int]): The counters by name.
+        histograms (Dict[str, Histogram]): The histograms by name.
+    """
+    def __init__(self) -> None:
+        """Initialize an empty set of metrics."""
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add to a counter, creating it at zero first.
+
+        Args:
+            name (str): The name of the counter.
+            value (int, optional): The amount to add. Defaults to 1.
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float, bounds: Sequence[float] = LATENCY_BUCKETS) -> None:
+        """Record an observation in a histogram, creating it with the given bucket bounds first.
+
+        Args:
+            name (str): The name of the histogram; names ending in `_seconds` hold durations.
+            value (float): The observed value.
+            bounds (Sequence[float], optional): The bucket bounds of a new histogram. Defaults to LATENCY_BUCKETS.
+        """
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(bounds)
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        """Drop every counter and histogram."""
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        """Return the metrics as a JSON-serializable dictionary.
+
+        Returns:
+            dict: The counters, and for every histogram its count, sum and estimated p50 and p99.
+        """
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {name: {'count': histogram.count, 'sum': histogram.total,
+                                      'p50': histogram.quantile(0.5), 'p99': histogram.quantile(0.99)}
+                               for name, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self, prefix: str = 'autocomplete_') -> str:
+        """Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix (str, optional): The prefix of every metric name. Defaults to 'autocomplete_'.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = prefix + _sanitize(name) + '_total'
+                lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+            for name, histogram in sorted(self.histograms.items()):
+                metric = prefix + _sanitize(name)
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum {histogram.total:g}")
+                lines.append(f"{metric}_count {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _sanitize(name: str) -> str:
+    return ''.join(character if character.isalnum() or character == '_' else '_' for character in name)